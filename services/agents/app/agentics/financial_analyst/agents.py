@@ -0,0 +1,26 @@
+from app.agentics.base_agent import BaseAgent
+from app.tools.rag_tools import RAGTool
+from app.tools.finance_tools import PortfolioAnalyticsTool
+from app.tools.market_tools import StockAnalysisTool
+from app.tools.search_tools import BraveSearchTool
+from app.tools.crawler_tools import WebCrawlerTool
+
+class FinancialAnalystAgents(BaseAgent):
+    def __init__(self):
+        super().__init__(llm_type="gemini")
+        # Indicators and risk figures are read from the local market store,
+        # so the analyst interprets numbers instead of estimating them. Search and
+        # the page reader cover news and company announcements.
+        self.tools = [RAGTool(namespace="financial_analyst"), StockAnalysisTool(), PortfolioAnalyticsTool(),
+                      BraveSearchTool(), WebCrawlerTool()]
+    
+    def create_market_analyst_agent(self):
+        return self.create_agent(
+            role="Stock Market Analyst",
+            goal="""Phân tích cổ phiếu và quỹ trên thị trường chứng khoán Việt Nam dựa trên dữ liệu giá và chỉ báo kỹ thuật.
+            **BẮT BUỘC** dùng số liệu từ công cụ và trả lời **HOÀN TOÀN BẰNG TIẾNG VIỆT** với văn phong chuyên nghiệp, dễ hiểu.""",
+            backstory="""Bạn là chuyên viên phân tích chứng khoán nhiều năm kinh nghiệm tại Việt Nam, thành thạo phân tích kỹ thuật (SMA, EMA, MACD, RSI) và quản trị rủi ro.
+            Bạn trình bày xu hướng, động lượng và mức độ biến động một cách khách quan, chỉ ra cả tín hiệu tích cực lẫn rủi ro.
+            Bạn **LUÔN LUÔN** giao tiếp bằng tiếng Việt và nhắc người dùng rằng phân tích không phải là khuyến nghị mua bán.""",
+            tools=self.tools
+        )
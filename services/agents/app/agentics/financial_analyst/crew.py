@@ -0,0 +1,28 @@
+from crewai import Crew, Process
+from app.agentics.registry import registry
+from app.utils.memory_context import get_session_context
+from app.utils.progress import crew_step_callback
+from .agents import FinancialAnalystAgents
+from .tasks import FinancialAnalystTasks
+
+class FinancialAnalystCrew:
+    def __init__(self):
+        self.agents = registry.shared("financial_analyst.agents", FinancialAnalystAgents)
+        self.tasks = registry.shared("financial_analyst.tasks", FinancialAnalystTasks)
+    
+    def _build_analysis_crew(self):
+        analyst_agent = self.agents.create_market_analyst_agent()
+        analysis_task = self.tasks.create_market_analysis_task(analyst_agent)
+        
+        return Crew(
+            agents=[analyst_agent],
+            tasks=[analysis_task],
+            process=Process.sequential,
+            verbose=True,
+            step_callback=crew_step_callback
+        )
+    
+    def analyze_market(self, user_input, chat_id=None):
+        crew = registry.per_thread("financial_analyst.analysis_crew", self._build_analysis_crew)
+        history = get_session_context(user_input, chat_id, namespace="financial_analyst")
+        return crew.kickoff(inputs={"user_query": user_input, "history": history or "(none)"})
@@ -0,0 +1,20 @@
+from crewai import Task
+
+class FinancialAnalystTasks:
+    def create_market_analysis_task(self, agent):
+        # Filled in at kickoff with {user_query} and {history}, like the financial manager tasks.
+        return Task(
+            description="""Analyze the stocks or funds the user asks about.
+            The user's request is: '{user_query}'
+            
+            Earlier conversation with this user (may be empty): {history}
+            
+            Identify the ticker codes in the request. Use the 'Stock Technical Snapshot' tool for price action
+            and indicators, and the 'Portfolio Analytics' tool when the user compares several symbols or asks
+            about risk, drawdown or correlation. For recent news, use 'Brave Search' and read the most relevant
+            results with the 'Web Crawler'. Quote the tools' figures; never invent prices or indicator values.
+            If a symbol has no local data, say so plainly.
+            The final output MUST be in natural, conversational Vietnamese.""",
+            agent=agent,
+            expected_output="A technical analysis in Vietnamese markdown covering trend, momentum and volatility for each symbol, the key levels and signals from the tools, the main risks, and a reminder that this is not a buy/sell recommendation."
+        )
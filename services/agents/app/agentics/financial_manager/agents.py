@@ -1,13 +1,15 @@
 from app.agentics.base_agent import BaseAgent
+from app.tools.rag_tools import RAGTool
+from app.tools.finance_tools import DebtPayoffTool, SavingsProjectionTool
 # from tools.search_tools import BraveSearchTool
-# from tools.rag_tools import FinancialRAGTool
 
 class FinancialManagerAgents(BaseAgent):
     def __init__(self):
         super().__init__(llm_type="gemini")
-        # For now, we provide an empty list of tools.
-        # You can add tools like BraveSearchTool or FinancialRAGTool here later.
-        self.tools = []
+        # Conversation memory lookups for the current user, plus exact calculators
+        # so plans don't rely on the LLM's arithmetic.
+        # You can add tools like BraveSearchTool here later.
+        self.tools = [RAGTool(namespace="financial_manager"), DebtPayoffTool(), SavingsProjectionTool()]
     
     def create_budget_agent(self):
         return self.create_agent(
@@ -1,24 +1,47 @@
 from crewai import Crew, Process
+from app.agentics.registry import registry
+from app.utils.memory_context import get_session_context
+from app.utils.progress import crew_step_callback
 from .agents import FinancialManagerAgents
 from .tasks import FinancialManagerTasks
 
 class FinancialManagerCrew:
     def __init__(self):
-        self.agents = FinancialManagerAgents()
-        self.tasks = FinancialManagerTasks()
+        # Agent factories are built once per process; creating this class is cheap.
+        self.agents = registry.shared("financial_manager.agents", FinancialManagerAgents)
+        self.tasks = registry.shared("financial_manager.tasks", FinancialManagerTasks)
     
-    def manage_budget(self, user_input):
-        # The context is now derived from the user_input within the task
+    def _build_budget_crew(self):
         budget_agent = self.agents.create_budget_agent()
-        # The context for the task will be the user_input itself.
-        budget_task = self.tasks.create_budget_task(budget_agent, user_input)
+        budget_task = self.tasks.create_budget_task(budget_agent)
         
-        crew = Crew(
+        return Crew(
             agents=[budget_agent],
             tasks=[budget_task],
             process=Process.sequential,
-            verbose=True
+            verbose=True,
+            step_callback=crew_step_callback
         )
+    
+    def _build_debt_crew(self):
+        debt_agent = self.agents.create_debt_agent()
+        debt_task = self.tasks.create_debt_payoff_task(debt_agent)
         
-        # The input for kickoff is now just the user query.
-        return crew.kickoff()
\ No newline at end of file
+        return Crew(
+            agents=[debt_agent],
+            tasks=[debt_task],
+            process=Process.sequential,
+            verbose=True,
+            step_callback=crew_step_callback
+        )
+    
+    def manage_budget(self, user_input, chat_id=None):
+        # The agent, task and crew are reused; only the request text and history change.
+        crew = registry.per_thread("financial_manager.budget_crew", self._build_budget_crew)
+        history = get_session_context(user_input, chat_id, namespace="financial_manager")
+        return crew.kickoff(inputs={"user_query": user_input, "history": history or "(none)"})
+    
+    def manage_debt(self, user_input, chat_id=None):
+        crew = registry.per_thread("financial_manager.debt_crew", self._build_debt_crew)
+        history = get_session_context(user_input, chat_id, namespace="financial_manager")
+        return crew.kickoff(inputs={"user_query": user_input, "history": history or "(none)"})
@@ -1,23 +1,39 @@
 from crewai import Task
 
 class FinancialManagerTasks:
-    def create_budget_task(self, agent, user_query):
+    def create_budget_task(self, agent):
+        # The request text and retrieved history are filled in at kickoff through
+        # inputs={"user_query": ..., "history": ...} so the same task (and crew)
+        # can be reused across requests.
         return Task(
-            description=f"""Analyze the user's detailed request and create a personalized budget plan.
+            description="""Analyze the user's detailed request and create a personalized budget plan.
             The user's request is: '{user_query}'
             
+            Earlier conversation with this user (may be empty): {history}
+            
             Break down the user's income, fixed expenses, and savings goals.
             Provide a clear, actionable spending plan for variable categories like food and entertainment.
+            Use the 'Savings Projection Calculator' for savings growth and the 'Debt Payoff Simulator' for any
+            debt figures instead of doing the arithmetic yourself.
             The final output MUST be in natural, conversational Vietnamese.""",
             agent=agent,
             expected_output="A detailed, personalized budget plan in Vietnamese, presented in a clear markdown format. The plan should include specific monetary allocations for spending categories and actionable recommendations."
         )
     
-    def create_debt_payoff_task(self, agent, context):
+    def create_debt_payoff_task(self, agent, context=None):
+        # Like the budget task, filled in at kickoff with {user_query} and {history}.
         return Task(
-            description="""Create a debt payoff strategy for user with debts: {debts}, 
-            interest rates: {interest_rates}, and available monthly payment: {monthly_payment}""",
+            description="""Create a debt payoff strategy for the user.
+            The user's request is: '{user_query}'
+            
+            Earlier conversation with this user (may be empty): {history}
+            
+            Extract every debt (name, balance, annual interest rate, minimum payment if given) and the amount
+            the user can pay each month. Use the 'Debt Payoff Simulator' tool to compare avalanche and snowball
+            (and any order or extra payment the user mentions); never compute interest or timelines yourself.
+            If a balance, rate or monthly amount is missing, say which one and use a clearly stated assumption.
+            The final output MUST be in natural, conversational Vietnamese.""",
             agent=agent,
-            expected_output="A prioritized debt payoff plan with timeline and interest savings",
-            context=context
-        )
\ No newline at end of file
+            expected_output="A prioritized debt payoff plan in Vietnamese markdown with the recommended strategy, months to debt-free, total interest and interest saved, taken from the simulator's results.",
+            context=context or []
+        )
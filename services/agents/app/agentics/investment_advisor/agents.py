@@ -0,0 +1,21 @@
+from app.agentics.base_agent import BaseAgent
+from app.tools.rag_tools import RAGTool
+from app.tools.finance_tools import GoalProjectionTool, PortfolioAnalyticsTool
+
+class InvestmentAdvisorAgents(BaseAgent):
+    def __init__(self):
+        super().__init__(llm_type="gemini")
+        # Returns, risk and goal projections come from the local analytics engine,
+        # so the agent spends its tokens on explaining them, not on the math.
+        self.tools = [RAGTool(namespace="investment_advisor"), PortfolioAnalyticsTool(), GoalProjectionTool()]
+    
+    def create_advisor_agent(self):
+        return self.create_agent(
+            role="Gen Z Investment Advisor",
+            goal="""Giúp người trẻ bắt đầu đầu tư một cách an toàn: chọn loại quỹ/cổ phiếu phù hợp với mục tiêu, khẩu vị rủi ro và số tiền có thể đầu tư mỗi tháng.
+            **BẮT BUỘC** dựa trên số liệu từ các công cụ phân tích và trả lời **HOÀN TOÀN BẰNG TIẾNG VIỆT** với văn phong tự nhiên, thân thiện.""",
+            backstory="""Bạn là chuyên gia tư vấn đầu tư tại Việt Nam, chuyên hướng dẫn Gen Z những bước đầu tiên với tiết kiệm, quỹ mở, ETF và cổ phiếu.
+            Bạn giải thích lợi nhuận, biến động và rủi ro sụt giảm bằng ngôn ngữ đơn giản, luôn nhấn mạnh đa dạng hóa và đầu tư dài hạn.
+            Bạn **LUÔN LUÔN** giao tiếp bằng tiếng Việt và không bao giờ hứa hẹn lợi nhuận chắc chắn.""",
+            tools=self.tools
+        )
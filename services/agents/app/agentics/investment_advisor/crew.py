@@ -0,0 +1,28 @@
+from crewai import Crew, Process
+from app.agentics.registry import registry
+from app.utils.memory_context import get_session_context
+from app.utils.progress import crew_step_callback
+from .agents import InvestmentAdvisorAgents
+from .tasks import InvestmentAdvisorTasks
+
+class InvestmentAdvisorCrew:
+    def __init__(self):
+        self.agents = registry.shared("investment_advisor.agents", InvestmentAdvisorAgents)
+        self.tasks = registry.shared("investment_advisor.tasks", InvestmentAdvisorTasks)
+    
+    def _build_advice_crew(self):
+        advisor_agent = self.agents.create_advisor_agent()
+        advice_task = self.tasks.create_advice_task(advisor_agent)
+        
+        return Crew(
+            agents=[advisor_agent],
+            tasks=[advice_task],
+            process=Process.sequential,
+            verbose=True,
+            step_callback=crew_step_callback
+        )
+    
+    def provide_advice(self, user_input, chat_id=None):
+        crew = registry.per_thread("investment_advisor.advice_crew", self._build_advice_crew)
+        history = get_session_context(user_input, chat_id, namespace="investment_advisor")
+        return crew.kickoff(inputs={"user_query": user_input, "history": history or "(none)"})
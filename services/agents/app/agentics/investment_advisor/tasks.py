@@ -0,0 +1,20 @@
+from crewai import Task
+
+class InvestmentAdvisorTasks:
+    def create_advice_task(self, agent):
+        # Filled in at kickoff with {user_query} and {history}, like the financial manager tasks.
+        return Task(
+            description="""Give the user beginner-friendly investment advice.
+            The user's request is: '{user_query}'
+            
+            Earlier conversation with this user (may be empty): {history}
+            
+            Identify the user's goal, horizon, monthly amount and risk tolerance.
+            Use the 'Portfolio Analytics' tool for any stocks or funds the user mentions, and the
+            'Investment Goal Projection' tool to show how a monthly plan could grow and how likely the goal is.
+            Quote the tools' figures; never compute returns, volatility or projections yourself.
+            If data for a symbol is unavailable, say so and fall back to a plan type projection.
+            The final output MUST be in natural, conversational Vietnamese.""",
+            agent=agent,
+            expected_output="Investment advice in Vietnamese markdown with a suggested allocation, the expected range of outcomes and chance of reaching the goal from the tools, the main risks, and concrete next steps."
+        )
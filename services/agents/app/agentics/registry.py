@@ -0,0 +1,47 @@
+"""Long-lived registry for persona agents and crews.
+
+Building a crew for every message re-runs the ``BaseAgent`` environment
+mapping and constructs fresh CrewAI ``Agent``/``Crew`` objects. The registry
+keeps them for the life of the process so a request only pays for its inputs.
+
+CrewAI mutates agents and crews while a kickoff runs (executor, task outputs,
+usage metrics), so those objects are cached per worker thread. Plain factories
+such as ``FinancialManagerAgents`` hold no run state and are shared process-wide.
+"""
+import threading
+
+
+class AgentRegistry:
+    def __init__(self):
+        self._shared = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def shared(self, key, factory):
+        """Return the process-wide object for ``key``, building it once."""
+        obj = self._shared.get(key)
+        if obj is None:
+            with self._lock:
+                obj = self._shared.get(key)
+                if obj is None:
+                    obj = factory()
+                    self._shared[key] = obj
+        return obj
+
+    def per_thread(self, key, factory):
+        """Return the calling thread's object for ``key``, building it once per thread."""
+        items = getattr(self._local, "items", None)
+        if items is None:
+            items = self._local.items = {}
+        obj = items.get(key)
+        if obj is None:
+            obj = items[key] = factory()
+        return obj
+
+    def clear(self):
+        with self._lock:
+            self._shared.clear()
+        self._local = threading.local()
+
+
+registry = AgentRegistry()
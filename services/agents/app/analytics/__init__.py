@@ -0,0 +1 @@
+# Numerical finance engines used by agent tools
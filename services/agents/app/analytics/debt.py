@@ -0,0 +1,204 @@
+"""Vectorized debt-payoff and savings simulations.
+
+``simulate_payoff`` steps month by month, but every step updates all
+scenarios and all debts at once as (scenarios x debts) NumPy arrays, so
+hundreds of strategy/extra-payment combinations cost about as much as one.
+
+Each month, per scenario:
+1. interest accrues on every open balance;
+2. every open debt receives its minimum payment (capped at its balance);
+3. the rest of the monthly budget goes to debts in priority order. With the
+   balances laid out in priority order, debt k receives
+   ``clip(extra - cumsum(balances before k), 0, balance_k)``, one cumsum for
+   the whole allocation. Minimums freed by paid-off debts roll into ``extra``
+   automatically because the budget stays fixed.
+
+Strategies: "avalanche" (highest rate first), "snowball" (smallest balance
+first), "custom" (caller-given priority) and "minimum" (minimums only, the
+baseline for interest savings). Priorities are fixed from the starting
+balances.
+"""
+import numpy as np
+
+STRATEGIES = ("avalanche", "snowball", "custom", "minimum")
+
+# Balances below this are treated as paid off (currency units)
+_EPSILON = 0.5
+
+
+class Debt:
+    def __init__(self, name: str, balance: float, annual_rate: float, min_payment: float = None):
+        """``annual_rate`` is a fraction (0.18 for 18%/year).
+
+        Without ``min_payment``, the minimum is the first month's interest plus
+        1% of the balance, a common credit-card rule.
+        """
+        self.name = name
+        self.balance = float(balance)
+        self.annual_rate = float(annual_rate)
+        if min_payment is None:
+            min_payment = self.balance * (self.annual_rate / 12 + 0.01)
+        self.min_payment = float(min_payment)
+
+
+def _priority(debts, strategy: str, custom_priority=None):
+    """Debt indices in payment order for one strategy."""
+    if strategy == "avalanche":
+        return sorted(range(len(debts)), key=lambda i: (-debts[i].annual_rate, debts[i].balance))
+    if strategy == "snowball":
+        return sorted(range(len(debts)), key=lambda i: (debts[i].balance, -debts[i].annual_rate))
+    if strategy == "custom":
+        names = [d.name for d in debts]
+        order = [names.index(name) for name in (custom_priority or []) if name in names]
+        return order + [i for i in range(len(debts)) if i not in order]
+    if strategy == "minimum":
+        return list(range(len(debts)))
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def simulate_payoff(balances, annual_rates, min_payments, budgets, orders, extra_enabled=None, max_months: int = 600):
+    """Simulate S scenarios over D debts.
+
+    Args:
+        balances, annual_rates, min_payments: shape (D,) or (S, D).
+        budgets: shape (S,), total paid per month in each scenario.
+        orders: shape (S, D), debt indices in priority order per scenario.
+        extra_enabled: shape (S,) bool; False pays minimums only.
+
+    Returns a dict of arrays: ``months`` (S,) months until debt-free (-1 if
+    not within ``max_months``), ``total_interest`` and ``total_paid`` (S,),
+    ``payoff_month`` (S, D) (-1 if never), and ``timeline`` (S, months+1)
+    total remaining balance at the start of each month.
+    """
+    orders = np.asarray(orders, dtype=np.int64)
+    n_scenarios, n_debts = orders.shape
+    balance = np.broadcast_to(np.asarray(balances, dtype=np.float64), (n_scenarios, n_debts)).copy()
+    monthly_rate = np.broadcast_to(np.asarray(annual_rates, dtype=np.float64) / 12, (n_scenarios, n_debts))
+    minimum = np.broadcast_to(np.asarray(min_payments, dtype=np.float64), (n_scenarios, n_debts))
+    budgets = np.asarray(budgets, dtype=np.float64)
+    extra_enabled = np.ones(n_scenarios, dtype=bool) if extra_enabled is None else np.asarray(extra_enabled, dtype=bool)
+    rows = np.arange(n_scenarios)[:, None]
+
+    total_interest = np.zeros(n_scenarios)
+    total_paid = np.zeros(n_scenarios)
+    payoff_month = np.full((n_scenarios, n_debts), -1, dtype=np.int64)
+    timeline = [balance.sum(axis=1)]
+
+    for month in range(1, max_months + 1):
+        open_debts = balance > _EPSILON
+        if not open_debts.any():
+            break
+        interest = np.where(open_debts, balance * monthly_rate, 0.0)
+        balance += interest
+        total_interest += interest.sum(axis=1)
+
+        pay = np.minimum(np.where(open_debts, minimum, 0.0), balance)
+        # minimums are paid even when they exceed the budget; only the rest is extra
+        extra = np.where(extra_enabled, np.maximum(budgets - pay.sum(axis=1), 0.0), 0.0)
+        remaining = balance - pay
+        ordered = remaining[rows, orders]
+        before = np.cumsum(ordered, axis=1) - ordered
+        alloc = np.clip(extra[:, None] - before, 0.0, ordered)
+        pay[rows, orders] += alloc
+
+        balance -= pay
+        total_paid += pay.sum(axis=1)
+        newly_paid = open_debts & (balance <= _EPSILON)
+        payoff_month[newly_paid] = month
+        balance[balance <= _EPSILON] = 0.0
+        timeline.append(balance.sum(axis=1))
+
+    done = (balance <= _EPSILON).all(axis=1)
+    months = np.where(done, payoff_month.max(axis=1, initial=0), -1)
+    return {
+        "months": months,
+        "total_interest": total_interest,
+        "total_paid": total_paid,
+        "payoff_month": payoff_month,
+        "timeline": np.stack(timeline, axis=1),
+    }
+
+
+def compare_strategies(debts, monthly_payment: float, strategies=("avalanche", "snowball"), extra_payments=(0.0,),
+                       custom_priority=None, max_months: int = 600):
+    """Run every (strategy, extra payment) combination plus a minimum-only baseline.
+
+    Returns one summary dict per scenario, baseline first, each with the
+    interest saved relative to the baseline. ``interest_saved`` is None when
+    the baseline or the scenario itself isn't paid off within ``max_months``:
+    interest cut off at the horizon is not a total and can't be compared.
+
+    Minimums are always paid, so when ``monthly_payment`` is below their sum
+    the scenario actually pays the minimums; ``monthly_payment`` in the
+    summary is that amount and ``budget_below_minimums`` flags the case.
+    """
+    if not debts:
+        raise ValueError("At least one debt is required")
+    strategies = [s for s in strategies if s != "minimum"]
+    scenarios = [("minimum", 0.0)] + [(s, float(x)) for s in strategies for x in extra_payments]
+    orders = [_priority(debts, s, custom_priority) for s, _ in scenarios]
+    budgets = [monthly_payment + x for _, x in scenarios]
+    extra_enabled = [s != "minimum" for s, _ in scenarios]
+
+    result = simulate_payoff(
+        [d.balance for d in debts], [d.annual_rate for d in debts], [d.min_payment for d in debts],
+        budgets, orders, extra_enabled, max_months=max_months,
+    )
+    baseline_interest = result["total_interest"][0]
+    baseline_paid_off = result["months"][0] >= 0
+    minimums = float(sum(d.min_payment for d in debts))
+    summaries = []
+    for i, (strategy, extra) in enumerate(scenarios):
+        payoff = result["payoff_month"][i]
+        months = int(result["months"][i])
+        below_minimums = strategy != "minimum" and budgets[i] < minimums
+        summaries.append({
+            "strategy": strategy,
+            "extra_payment": extra,
+            "monthly_payment": budgets[i] if strategy != "minimum" and not below_minimums else minimums,
+            "budget_below_minimums": below_minimums,
+            "months": months if months >= 0 else None,
+            "total_interest": float(result["total_interest"][i]),
+            "total_paid": float(result["total_paid"][i]),
+            "interest_saved": float(baseline_interest - result["total_interest"][i])
+            if baseline_paid_off and months >= 0 else None,
+            "payoff_order": [
+                {"name": debts[j].name, "month": int(payoff[j]) if payoff[j] >= 0 else None}
+                for j in sorted(range(len(debts)), key=lambda j: (payoff[j] < 0, payoff[j]))
+            ],
+            "timeline": result["timeline"][i].tolist(),
+        })
+    return summaries
+
+
+def project_savings(monthly_income: float, monthly_expenses: float, savings_rates, annual_return: float = 0.0,
+                    months: int = 12, starting_balance: float = 0.0, goal: float = None):
+    """Project savings for several savings rates at once.
+
+    Each month ``rate * (income - expenses)`` is saved and the balance earns
+    ``annual_return / 12``. Returns per-rate monthly contribution, final
+    balance, and the month the goal is reached (None if not within ``months``).
+    """
+    rates = np.asarray(savings_rates, dtype=np.float64)
+    surplus = max(monthly_income - monthly_expenses, 0.0)
+    contribution = rates * surplus
+    growth = 1 + annual_return / 12
+    # balance after m months, for every rate and month in one shot
+    m = np.arange(1, months + 1)[None, :]
+    if growth == 1:
+        balances = starting_balance + contribution[:, None] * m
+    else:
+        balances = starting_balance * growth ** m + contribution[:, None] * (growth ** m - 1) / (growth - 1)
+    out = []
+    for i, rate in enumerate(rates):
+        reached = None
+        if goal is not None:
+            hit = np.nonzero(balances[i] >= goal)[0]
+            reached = int(hit[0]) + 1 if hit.size else None
+        out.append({
+            "savings_rate": float(rate),
+            "monthly_contribution": float(contribution[i]),
+            "final_balance": float(balances[i, -1]) if months else float(starting_balance),
+            "goal_month": reached,
+        })
+    return out
@@ -0,0 +1,315 @@
+"""Append-only columnar store for daily bars and technical indicators.
+
+Every symbol has its own directory under MARKET_STORE_DIR:
+
+- one raw little-endian column file per field (``date.bin`` holds int64 days
+  since the epoch; every other column is float64);
+- ``state.json``, which holds the committed row count and the running state
+  of every indicator.
+
+Readers memory-map the columns up to the committed row count, so they never
+copy the history and never see a half-written append.
+
+Indicators are updated bar by bar from the saved state, so appending a bar
+costs O(1) no matter how long the history is:
+
+- SMA20 and SMA50 use running sums.
+- EMA12 and EMA26 are exponential moving averages.
+- MACD is EMA12 minus EMA26, with a 9-bar signal line.
+- RSI14 uses Wilder's smoothing.
+- VOL20 is the annualized volatility of the last 20 log returns, from a
+  running sum and sum of squares.
+
+Ingest from the command line (a CSV needs ``date`` and ``close`` columns;
+``open/high/low/volume`` are optional):
+
+    python -m app.analytics.market_store ingest FPT fpt.csv
+
+There must be only one writer per store; any number of readers is fine.
+"""
+import csv
+import json
+import math
+import os
+import threading
+from collections import deque
+import numpy as np
+from app.config import settings
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+INDICATOR_COLUMNS = ("sma20", "sma50", "ema12", "ema26", "macd", "macd_signal", "rsi14", "vol20")
+COLUMNS = ("date",) + PRICE_COLUMNS + INDICATOR_COLUMNS
+TRADING_DAYS = 252
+
+_SMA_WINDOWS = (20, 50)
+_VOL_WINDOW = 20
+_RSI_PERIOD = 14
+
+
+def _dtype(column: str):
+    return np.dtype("<i8") if column == "date" else np.dtype("<f8")
+
+
+def to_day(value) -> int:
+    """'2024-05-31' (or a datetime64) -> days since 1970-01-01."""
+    return int(np.datetime64(str(value)[:10], "D").astype(np.int64))
+
+
+def day_str(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+def _ema(previous, value, period):
+    if previous is None:
+        return value
+    alpha = 2.0 / (period + 1)
+    return previous + alpha * (value - previous)
+
+
+class IndicatorState:
+    """Running indicator state for one symbol; ``update`` consumes one close."""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.closes = deque(data.get("closes", []), maxlen=max(_SMA_WINDOWS))
+        self.sums = {int(k): v for k, v in data.get("sums", {}).items()} or {w: 0.0 for w in _SMA_WINDOWS}
+        self.log_returns = deque(data.get("log_returns", []), maxlen=_VOL_WINDOW)
+        self.ret_sum = data.get("ret_sum", 0.0)
+        self.ret_sumsq = data.get("ret_sumsq", 0.0)
+        self.ema12 = data.get("ema12")
+        self.ema26 = data.get("ema26")
+        self.signal = data.get("signal")
+        self.gains = data.get("gains", 0)
+        self.avg_gain = data.get("avg_gain", 0.0)
+        self.avg_loss = data.get("avg_loss", 0.0)
+
+    def to_dict(self):
+        return {
+            "closes": list(self.closes), "sums": self.sums, "log_returns": list(self.log_returns),
+            "ret_sum": self.ret_sum, "ret_sumsq": self.ret_sumsq, "ema12": self.ema12, "ema26": self.ema26,
+            "signal": self.signal, "gains": self.gains, "avg_gain": self.avg_gain, "avg_loss": self.avg_loss,
+        }
+
+    def update(self, close: float):
+        """Advance the state by one close and return the indicator row."""
+        previous = self.closes[-1] if self.closes else None
+        row = {}
+
+        # SMAs: add the new close, drop the one leaving each window
+        for window in _SMA_WINDOWS:
+            self.sums[window] += close
+            if len(self.closes) >= window:
+                self.sums[window] -= self.closes[-window]
+        self.closes.append(close)
+        for window in _SMA_WINDOWS:
+            row[f"sma{window}"] = self.sums[window] / window if len(self.closes) >= window else math.nan
+
+        self.ema12 = _ema(self.ema12, close, 12)
+        self.ema26 = _ema(self.ema26, close, 26)
+        macd = self.ema12 - self.ema26
+        self.signal = _ema(self.signal, macd, 9)
+        row.update(ema12=self.ema12, ema26=self.ema26, macd=macd, macd_signal=self.signal)
+
+        row["rsi14"] = math.nan
+        row["vol20"] = math.nan
+        if previous is not None:
+            change = close - previous
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            self.gains += 1
+            if self.gains <= _RSI_PERIOD:
+                # simple average over the first period, Wilder smoothing afterwards
+                self.avg_gain += gain / _RSI_PERIOD
+                self.avg_loss += loss / _RSI_PERIOD
+            else:
+                self.avg_gain = (self.avg_gain * (_RSI_PERIOD - 1) + gain) / _RSI_PERIOD
+                self.avg_loss = (self.avg_loss * (_RSI_PERIOD - 1) + loss) / _RSI_PERIOD
+            if self.gains >= _RSI_PERIOD:
+                total = self.avg_gain + self.avg_loss
+                row["rsi14"] = 100.0 * self.avg_gain / total if total > 0 else 50.0
+
+            r = math.log(close / previous) if previous > 0 and close > 0 else 0.0
+            if len(self.log_returns) == _VOL_WINDOW:
+                old = self.log_returns[0]
+                self.ret_sum -= old
+                self.ret_sumsq -= old * old
+            self.log_returns.append(r)
+            self.ret_sum += r
+            self.ret_sumsq += r * r
+            if len(self.log_returns) == _VOL_WINDOW:
+                n = _VOL_WINDOW
+                variance = max(self.ret_sumsq - self.ret_sum * self.ret_sum / n, 0.0) / (n - 1)
+                row["vol20"] = math.sqrt(variance * TRADING_DAYS)
+        return row
+
+
+class MarketStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        # symbol -> ((mtime_ns, size), state); state.json is re-read only when it changes
+        self._states = {}
+
+    def _dir(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol.upper())
+
+    def _state_path(self, symbol: str) -> str:
+        return os.path.join(self._dir(symbol), "state.json")
+
+    def state(self, symbol: str):
+        """Committed state for ``symbol``, or None if it has no data."""
+        path = self._state_path(symbol)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        version = (st.st_mtime_ns, st.st_size)
+        cached = self._states.get(symbol.upper())
+        if cached and cached[0] == version:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        self._states[symbol.upper()] = (version, state)
+        return state
+
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(self._state_path(name)))
+
+    def has(self, symbol: str) -> bool:
+        state = self.state(symbol)
+        return bool(state and state["rows"])
+
+    # -- writes ----------------------------------------------------------------
+
+    def append(self, symbol: str, bars) -> int:
+        """Append bars (dicts with ``date`` and ``close``; ``open/high/low/volume`` optional).
+
+        Bars at or before the last stored date are skipped, so re-ingesting an
+        overlapping file is harmless. Returns the number of rows added.
+        """
+        symbol = symbol.upper()
+        with self._lock:
+            state = self.state(symbol) or {"rows": 0, "last_date": None, "indicators": {}}
+            indicators = IndicatorState(state["indicators"])
+            last_date = state["last_date"]
+            columns = {c: [] for c in COLUMNS}
+            for bar in sorted(bars, key=lambda b: to_day(b["date"])):
+                day = to_day(bar["date"])
+                if last_date is not None and day <= last_date:
+                    continue
+                close = float(bar["close"])
+                columns["date"].append(day)
+                for c in ("open", "high", "low"):
+                    value = bar.get(c)
+                    columns[c].append(float(value) if value not in (None, "") else close)
+                columns["close"].append(close)
+                volume = bar.get("volume")
+                columns["volume"].append(float(volume) if volume not in (None, "") else 0.0)
+                for c, value in indicators.update(close).items():
+                    columns[c].append(value)
+                last_date = day
+            added = len(columns["date"])
+            if not added:
+                return 0
+
+            directory = self._dir(symbol)
+            os.makedirs(directory, exist_ok=True)
+            rows = state["rows"]
+            for c in COLUMNS:
+                path = os.path.join(directory, f"{c}.bin")
+                dtype = _dtype(c)
+                with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+                    # drop anything past the committed rows left by an interrupted append
+                    f.seek(rows * dtype.itemsize)
+                    f.truncate()
+                    f.write(np.asarray(columns[c], dtype=dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # the state file is the commit point
+            new_state = {"rows": rows + added, "last_date": last_date, "indicators": indicators.to_dict()}
+            tmp = self._state_path(symbol) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(new_state, f)
+            os.replace(tmp, self._state_path(symbol))
+            self._states.pop(symbol, None)
+            return added
+
+    def ingest_csv(self, symbol: str, path: str) -> int:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            bars = []
+            for row in reader:
+                row = {k.lower().strip(): (v or "").strip() for k, v in row.items() if k}
+                date = row.get("date") or row.get("time")
+                close = row.get("close") or row.get("adj_close") or row.get("price")
+                if date and close:
+                    bars.append({**row, "date": date, "close": close})
+        return self.append(symbol, bars)
+
+    # -- reads -----------------------------------------------------------------
+
+    def read(self, symbol: str, columns=("date", "close"), last: int = None):
+        """Memory-mapped views of ``columns``, optionally only the ``last`` rows."""
+        state = self.state(symbol)
+        rows = state["rows"] if state else 0
+        start = max(rows - last, 0) if last else 0
+        out = {}
+        for c in columns:
+            dtype = _dtype(c)
+            if rows - start <= 0:
+                out[c] = np.empty(0, dtype=dtype)
+                continue
+            out[c] = np.memmap(os.path.join(self._dir(symbol), f"{c}.bin"), dtype=dtype, mode="r",
+                               offset=start * dtype.itemsize, shape=(rows - start,))
+        return out
+
+    def snapshot(self, symbol: str):
+        """Latest bar, indicators, recent changes and the 52-week range, or None."""
+        if not self.has(symbol):
+            return None
+        data = self.read(symbol, ("date", "close") + INDICATOR_COLUMNS, last=TRADING_DAYS + 1)
+        closes = data["close"]
+        latest = float(closes[-1])
+
+        def change(days):
+            return latest / float(closes[-1 - days]) - 1.0 if len(closes) > days else None
+
+        year = closes[-TRADING_DAYS:]
+        return {
+            "symbol": symbol.upper(),
+            "date": day_str(data["date"][-1]),
+            "rows": self.state(symbol)["rows"],
+            "close": latest,
+            "change_1d": change(1),
+            "change_5d": change(5),
+            "change_20d": change(20),
+            "high_52w": float(year.max()),
+            "low_52w": float(year.min()),
+            "previous_macd": float(data["macd"][-2]) if len(closes) > 1 else None,
+            "previous_signal": float(data["macd_signal"][-2]) if len(closes) > 1 else None,
+            **{c: float(data[c][-1]) for c in INDICATOR_COLUMNS},
+        }
+
+
+market_store = MarketStore(settings.MARKET_STORE_DIR)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local market-data store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help="append bars from a CSV file")
+    ingest.add_argument("symbol")
+    ingest.add_argument("csv_path")
+    sub.add_parser("list", help="list stored symbols")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        added = market_store.ingest_csv(args.symbol, args.csv_path)
+        print(f"{args.symbol.upper()}: {added} new bars, {market_store.state(args.symbol)['rows']} total")
+    else:
+        for name in market_store.symbols():
+            print(name, market_store.state(name)["rows"])
@@ -0,0 +1,182 @@
+"""Vectorized portfolio analytics over local price data.
+
+Prices are a (T, N) array of closes: T dates, N symbols. Every metric is
+computed for all symbols at once:
+
+- ``simple_returns``: period-over-period returns.
+- ``annualized_stats``: mean return, volatility and Sharpe ratio.
+- ``max_drawdown``: the largest peak-to-trough loss.
+- ``correlation``: the correlation matrix.
+
+``portfolio_stats`` combines these for a weighted basket. ``monte_carlo_goal``
+projects a savings or fund plan with monthly contributions under geometric
+Brownian motion. All paths advance together, one month per step.
+
+``load_prices`` takes each symbol's closes from the columnar market store
+(``app.analytics.market_store``) when it has them, and otherwise from a
+``<SYMBOL>.csv`` file (``date,close`` with a header) in MARKET_DATA_DIR. It then
+aligns the symbols on their common dates. No data ships with the service;
+ingest price histories into the store or drop CSV files into that directory.
+"""
+import csv
+import os
+import numpy as np
+from app.config import settings
+from app.analytics.market_store import market_store
+
+TRADING_DAYS = 252
+
+# Long-run (annual return, annual volatility) assumptions for common Gen-Z plans,
+# used when the user names a plan type instead of symbols with local price data.
+PLAN_PRESETS = {
+    "savings": (0.05, 0.005),       # term deposits
+    "bond_fund": (0.065, 0.03),
+    "balanced_fund": (0.09, 0.12),
+    "equity_fund": (0.12, 0.20),
+}
+
+
+def _read_csv(path: str):
+    """Sorted (dates, closes) from a CSV; bad rows are skipped and a repeated date keeps its last close."""
+    by_date = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields = {name.lower().strip(): name for name in reader.fieldnames or []}
+        date_col = fields.get("date") or fields.get("time")
+        close_col = fields.get("close") or fields.get("adj_close") or fields.get("price")
+        if not date_col or not close_col:
+            raise ValueError(f"{path}: expected 'date' and 'close' columns")
+        for row in reader:
+            # parse both before keeping either, so dates and closes stay aligned
+            try:
+                day = np.datetime64((row[date_col] or "").strip()[:10], "D")
+                close = float(row[close_col])
+            except (TypeError, ValueError):
+                continue
+            if np.isnat(day):
+                # an empty date parses as NaT
+                continue
+            by_date[str(day)] = close
+    dates = sorted(by_date)
+    return np.asarray(dates), np.asarray([by_date[d] for d in dates], dtype=np.float64)
+
+
+def load_prices(symbols, data_dir: str = None):
+    """Return (dates, symbols_found, prices) aligned on the dates all symbols share.
+
+    Symbols with no data are skipped; raises LookupError if none are found.
+    """
+    data_dir = data_dir or settings.MARKET_DATA_DIR
+    series = {}
+    for symbol in symbols:
+        path = os.path.join(data_dir, f"{symbol.upper()}.csv")
+        if market_store.has(symbol):
+            columns = market_store.read(symbol, ("date", "close"))
+            series[symbol.upper()] = (columns["date"].astype("datetime64[D]").astype(str), np.asarray(columns["close"]))
+        elif os.path.exists(path):
+            series[symbol.upper()] = _read_csv(path)
+    if not series:
+        raise LookupError(f"No price data for {', '.join(symbols)} in {data_dir}")
+    common = None
+    for dates, _ in series.values():
+        common = dates if common is None else np.intersect1d(common, dates)
+    found = list(series)
+    prices = np.column_stack([closes[np.isin(dates, common)] for dates, closes in series.values()])
+    return common, found, prices
+
+
+def simple_returns(prices):
+    prices = np.asarray(prices, dtype=np.float64)
+    return prices[1:] / prices[:-1] - 1.0
+
+
+def annualized_stats(returns, periods_per_year: int = TRADING_DAYS, risk_free: float = 0.0):
+    """Annualized mean return, volatility and Sharpe ratio per column."""
+    returns = np.asarray(returns, dtype=np.float64)
+    mean = returns.mean(axis=0) * periods_per_year
+    vol = returns.std(axis=0, ddof=1) * np.sqrt(periods_per_year) if len(returns) > 1 else np.zeros(returns.shape[1:])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(vol > 0, (mean - risk_free) / vol, np.nan)
+    return mean, vol, sharpe
+
+
+def max_drawdown(prices):
+    """Largest peak-to-trough decline per column, as a negative fraction."""
+    prices = np.asarray(prices, dtype=np.float64)
+    peaks = np.maximum.accumulate(prices, axis=0)
+    return (prices / peaks - 1.0).min(axis=0)
+
+
+def correlation(returns):
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.shape[1] == 1:
+        return np.ones((1, 1))
+    return np.corrcoef(returns, rowvar=False)
+
+
+def portfolio_stats(prices, weights=None, periods_per_year: int = TRADING_DAYS):
+    """Per-symbol and weighted-portfolio statistics for a (T, N) price array."""
+    prices = np.asarray(prices, dtype=np.float64)
+    n = prices.shape[1]
+    weights = np.full(n, 1.0 / n) if weights is None else np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    rets = simple_returns(prices)
+    mean, vol, sharpe = annualized_stats(rets, periods_per_year)
+    # daily-rebalanced basket
+    basket_returns = rets @ weights
+    basket_prices = np.concatenate([[1.0], np.cumprod(1.0 + basket_returns)])
+    p_mean, p_vol, p_sharpe = annualized_stats(basket_returns[:, None], periods_per_year)
+    return {
+        "annual_return": mean,
+        "annual_volatility": vol,
+        "sharpe": sharpe,
+        "max_drawdown": max_drawdown(prices),
+        "correlation": correlation(rets),
+        "weights": weights,
+        "portfolio": {
+            "annual_return": float(p_mean[0]),
+            "annual_volatility": float(p_vol[0]),
+            "sharpe": float(p_sharpe[0]),
+            "max_drawdown": float(max_drawdown(basket_prices[:, None])[0]),
+        },
+    }
+
+
+def monte_carlo_goal(monthly_contribution: float, months: int, annual_return: float, annual_volatility: float,
+                     goal: float = None, initial: float = 0.0, paths: int = None, seed: int = None):
+    """Project a plan that invests ``monthly_contribution`` at the end of every month.
+
+    Monthly growth factors are lognormal with the given annual drift and
+    volatility. Returns the percentiles of the final balance, the total paid
+    in, and, with a ``goal``, the probability of reaching it by the end and
+    the median month it is first reached.
+    """
+    paths = paths or settings.MONTE_CARLO_PATHS
+    months = max(1, int(months))
+    rng = np.random.default_rng(seed)
+    dt = 1.0 / 12
+    # lognormal monthly growth with E[growth] = (1 + annual_return) ** dt
+    drift = (np.log1p(max(annual_return, -0.99)) - 0.5 * annual_volatility ** 2) * dt
+    shock = annual_volatility * np.sqrt(dt)
+    balance = np.full(paths, float(initial))
+    first_hit = np.full(paths, -1, dtype=np.int64)
+    for month in range(months):
+        growth = np.exp(drift + shock * rng.standard_normal(paths))
+        balance = balance * growth + monthly_contribution
+        if goal is not None:
+            first_hit[(first_hit < 0) & (balance >= goal)] = month + 1
+    p10, p50, p90 = np.percentile(balance, [10, 50, 90])
+    result = {
+        "paths": paths,
+        "months": months,
+        "contributed": float(initial + monthly_contribution * months),
+        "p10": float(p10),
+        "median": float(p50),
+        "p90": float(p90),
+    }
+    if goal is not None:
+        hits = first_hit[first_hit > 0]
+        result["goal"] = float(goal)
+        result["probability"] = float((first_hit > 0).mean())
+        result["median_goal_month"] = int(np.median(hits)) if hits.size else None
+    return result
@@ -19,9 +19,105 @@ class Settings:
     # Prefer a widely available, stable model id for both LangChain and LiteLLM
     GEMINI_MODEL = "gemini-1.5-flash"
     FINANCE_MODEL = "deepseek-ai/DeepSeek-V2-Lite"
+    # Identifies the ProtonX embedding model in cache keys; bump it when the model changes.
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "protonx-default")
+
+    # Local state (caches, local indexes) lives under this directory
+    DATA_DIR = os.getenv("DATA_DIR", str(Path(__file__).parent.parent / "data"))
     
     # CrewAI configurations
     VERBOSE = True
     MAX_ITERATIONS = 3
 
+    # Concurrency configurations
+    # Number of crew runs executed in parallel per process, and how many extra
+    # requests may wait for a free worker before the service reports saturation.
+    CREW_WORKERS = int(os.getenv("CREW_WORKERS", "4"))
+    CREW_QUEUE_DEPTH = int(os.getenv("CREW_QUEUE_DEPTH", "16"))
+
+    # Intent classification
+    # Keyword scores at or above this confidence skip the LLM round trip.
+    INTENT_RULE_CONFIDENCE = float(os.getenv("INTENT_RULE_CONFIDENCE", "0.75"))
+    # ...and the winning intent needs at least this score (one strong keyword is 3.0).
+    INTENT_RULE_MIN_SCORE = float(os.getenv("INTENT_RULE_MIN_SCORE", "3.0"))
+    INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "5000"))
+    INTENT_CACHE_TTL = int(os.getenv("INTENT_CACHE_TTL", "3600"))
+
+    # Conversation memory writes
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+    UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+    # "background" queues history writes so replies never wait on them; "sync" writes inline.
+    HISTORY_WRITE_MODE = os.getenv("HISTORY_WRITE_MODE", "background")
+    # Pending background writes kept at most (further ones are dropped and counted), and
+    # how often a failed batch is retried before its records are dropped.
+    HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "1000"))
+    HISTORY_WRITE_RETRIES = int(os.getenv("HISTORY_WRITE_RETRIES", "2"))
+
+    # Embedding cache: in-memory LRU in front of a size-bounded SQLite file
+    EMBED_CACHE_MEMORY_SIZE = int(os.getenv("EMBED_CACHE_MEMORY_SIZE", "4096"))
+    EMBED_CACHE_DISK_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_DISK_MAX_ENTRIES", "200000"))
+    EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(DATA_DIR, "embedding_cache.sqlite3"))
+
+    # Conversation memory backends
+    # "pinecone" (default) or "local" for the in-process NumPy index under LOCAL_VECTOR_DIR
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+    LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(DATA_DIR, "vectors"))
+    # "protonx" (default) or "hashing" for a network-free embedding used in offline runs
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "protonx")
+    HASH_EMBEDDING_DIM = int(os.getenv("HASH_EMBEDDING_DIM", "384"))
+
+    # Retrieved conversation context injected into agent prompts
+    RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+    RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "600"))
+    # Retrieved context is reused per (chat_id, namespace) for this many seconds
+    RAG_SESSION_TTL = int(os.getenv("RAG_SESSION_TTL", "1800"))
+    RAG_SESSION_CACHE_SIZE = int(os.getenv("RAG_SESSION_CACHE_SIZE", "10000"))
+
+    # Request coalescing and answer reuse
+    # Concurrent identical (agent, chat, normalized query) requests share one crew run.
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Opt-in: answer from an earlier, semantically equivalent query of the same chat (cosine >= threshold).
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+    SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+
+    # Investment analytics: <SYMBOL>.csv price histories (date,close) and simulation size
+    MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", os.path.join(DATA_DIR, "market"))
+    MONTE_CARLO_PATHS = int(os.getenv("MONTE_CARLO_PATHS", "10000"))
+    # Columnar daily bars and indicators (app.analytics.market_store); preferred over the CSVs
+    MARKET_STORE_DIR = os.getenv("MARKET_STORE_DIR", os.path.join(DATA_DIR, "market_store"))
+
+    # Web search (Brave); point BRAVE_SEARCH_URL at a local fake server for tests
+    BRAVE_SEARCH_URL = os.getenv("BRAVE_SEARCH_URL", "https://api.search.brave.com/res/v1/web/search")
+    SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))
+    SEARCH_RESULT_COUNT = int(os.getenv("SEARCH_RESULT_COUNT", "5"))
+    SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "200"))
+    SEARCH_MAX_PARALLEL = int(os.getenv("SEARCH_MAX_PARALLEL", "4"))
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "900"))
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+
+    # Web page reader: extracted pages are cached on disk and revalidated with ETag/Last-Modified
+    CRAWL_CACHE_DIR = os.getenv("CRAWL_CACHE_DIR", os.path.join(DATA_DIR, "crawl_cache"))
+    CRAWL_CACHE_TTL = int(os.getenv("CRAWL_CACHE_TTL", "3600"))
+    # requests in flight across the whole process
+    CRAWL_MAX_CONCURRENCY = int(os.getenv("CRAWL_MAX_CONCURRENCY", "8"))
+    # politeness: concurrent requests and minimum seconds between request starts per domain
+    CRAWL_PER_DOMAIN = int(os.getenv("CRAWL_PER_DOMAIN", "2"))
+    CRAWL_DOMAIN_DELAY = float(os.getenv("CRAWL_DOMAIN_DELAY", "0.25"))
+    CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", "15"))
+    CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", "2000000"))
+    CRAWL_MAX_URLS = int(os.getenv("CRAWL_MAX_URLS", "8"))
+    CRAWL_MAX_REDIRECTS = int(os.getenv("CRAWL_MAX_REDIRECTS", "5"))
+    # Private, loopback and link-local hosts are refused unless this is set (local fixtures only)
+    CRAWL_ALLOW_PRIVATE = os.getenv("CRAWL_ALLOW_PRIVATE", "false").lower() in ("1", "true", "yes")
+    CRAWL_PAGE_TOKEN_BUDGET = int(os.getenv("CRAWL_PAGE_TOKEN_BUDGET", "800"))
+    CRAWL_USER_AGENT = os.getenv("CRAWL_USER_AGENT", "FinManagementAgent/1.0 (+page reader)")
+
+    # Stage timings are appended as JSON lines here; empty (the default) disables tracing.
+    # The file is rotated at TRACE_MAX_BYTES, keeping TRACE_BACKUPS older files.
+    TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+    TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+    TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "3"))
+
 settings = Settings()
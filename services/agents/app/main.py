@@ -1,39 +1,151 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.utils.dispatcher import dispatcher
+from app.utils.worker_pool import crew_pool, PoolSaturatedError
+from app.utils.intent_classifier import get_intent_stats
+from app.utils.pinecone import history_writer, vector_store
+from app.utils.embedding_cache import embedding_cache
+from app.utils.memory_context import get_retrieval_stats
+from app.utils.semantic_cache import semantic_cache
+from app.utils.single_flight import single_flight
+from app.utils import tracing
+import asyncio
+import json
 import uvicorn
 import re
+import uuid
 
 app = FastAPI(title="AI Agent Service")
 
+# Seconds between SSE keep-alive comments while a crew is silent
+STREAM_KEEPALIVE_SECONDS = 10
+
 class QueryRequest(BaseModel):
     user_id: str
     query: str
 
+@app.on_event("startup")
+async def startup():
+    crew_pool.start()
+    # Open the Pinecone index in the background; a failure here is not fatal.
+    vector_store.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    crew_pool.shutdown()
+    # Give queued conversation-memory writes a chance to land before exit.
+    history_writer.flush(timeout=10)
+    tracing.shutdown()
+
+@app.middleware("http")
+async def correlation_middleware(request: Request, call_next):
+    """Adopt the caller's X-Correlation-Id (or start a new one) for logs and spans."""
+    cid = request.headers.get(tracing.CORRELATION_HEADER) or str(uuid.uuid4())
+    token = tracing.correlation_id.set(cid)
+    try:
+        with tracing.span("http_request", path=request.url.path):
+            response = await call_next(request)
+        response.headers[tracing.CORRELATION_HEADER] = cid
+        return response
+    finally:
+        tracing.correlation_id.reset(token)
+
+@app.get("/api/stats")
+async def stats():
+    return {
+        "worker_pool": crew_pool.stats(),
+        "intent": get_intent_stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "retrieval": get_retrieval_stats(),
+        "single_flight": single_flight.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "history_writer": history_writer.stats(),
+    }
+
+def _command_agent_key(query: str):
+    """Map a leading /command in the query to an agent key, if it names one."""
+    command_match = re.match(r'/(\w+)', query)
+    if command_match:
+        command = command_match.group(1)
+        if command in ["financial_manager", "investment_advisor", "financial_analyst"]:
+            return command
+    return None
+
+def _saturated(e: PoolSaturatedError) -> HTTPException:
+    print(f"Rejecting request, worker pool saturated: {e}")
+    return HTTPException(status_code=503, detail="Agent service is busy, please retry later.", headers={"Retry-After": "5"})
+
 @app.post("/api/respond")
 async def process_query(request: QueryRequest):
     """
     Main endpoint to receive queries from the messaging service.
     It determines the agent key from the query command and dispatches it.
+    The crew run happens on the bounded worker pool so the event loop stays free.
     """
 
     # Check for command-based routing first
-    command_match = re.match(r'/(\w+)', request.query)
-    agent_key = None
-    if command_match:
-        command = command_match.group(1)
-        # Map command to agent_key
-        if command in ["financial_manager", "investment_advisor", "financial_analyst"]:
-            agent_key = command
+    agent_key = _command_agent_key(request.query)
 
     try:
         # Dispatcher handles both command-based and LLM-based routing
-        response = dispatcher(query=request.query, user_id=request.user_id, agent_key=agent_key)
+        response = await crew_pool.run(dispatcher, query=request.query, user_id=request.user_id, agent_key=agent_key)
         return {"reply": response}
+    except PoolSaturatedError as e:
+        raise _saturated(e)
     except Exception as e:
         # Log the exception for debugging
         print(f"Error during dispatch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+@app.post("/api/respond/stream")
+async def process_query_stream(request: QueryRequest):
+    """
+    Server-sent-events variant of /api/respond.
+
+    Emits `progress` events ({"text": ...}) while the crew works and ends with
+    either `result` ({"reply": ...}, same shape as /api/respond) or `error`.
+    """
+    agent_key = _command_agent_key(request.query)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_progress(text: str):
+        # Called from the worker thread
+        loop.call_soon_threadsafe(events.put_nowait, text)
+
+    try:
+        future = crew_pool.submit(dispatcher, query=request.query, user_id=request.user_id,
+                                  agent_key=agent_key, on_progress=on_progress)
+    except PoolSaturatedError as e:
+        raise _saturated(e)
+
+    async def event_stream():
+        yield _sse("progress", {"text": "Đã nhận yêu cầu"})
+        while not future.done():
+            getter = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({getter, future}, timeout=STREAM_KEEPALIVE_SECONDS,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield _sse("progress", {"text": getter.result()})
+                continue
+            getter.cancel()
+            if not done:
+                yield ": keep-alive\n\n"
+        while not events.empty():
+            yield _sse("progress", {"text": events.get_nowait()})
+        try:
+            yield _sse("result", {"reply": future.result()})
+        except Exception as e:
+            print(f"Error during dispatch: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,27 +1,432 @@
-# from crewai.tools import BaseTool
-# from typing import Type
-# from pydantic import BaseModel, Field
-# from crawl4ai import Crawler, BrowserConfig, CrawlerRunConfig
-
-# class WebCrawlerInput(BaseModel):
-#     url: str = Field(..., description="URL to crawl and extract content from")
-
-# class WebCrawlerTool(BaseTool):
-#     name: str = "Web Crawler"
-#     description: str = "Crawl and extract content from web pages"
-#     args_schema: Type[BaseModel] = WebCrawlerInput
-
-#     def _run(self, url: str) -> str:
-#         browser_config = BrowserConfig(
-#             headless=True,
-#             verbose=False
-#         )
-        
-#         crawler = Crawler(browser_config=browser_config)
-#         config = CrawlerRunConfig(
-#             word_count_threshold=10,
-#             include_raw_html=False
-#         )
-        
-#         result = crawler.run(url=url, config=config)
-#         return result.html
\ No newline at end of file
+"""
+Web page reader tool for agents.
+Only public http(s) addresses are fetched. The check happens when the
+connection is opened and the socket goes to the address that was checked, so
+a host can't pass with a public address and then be connected to a private
+one (DNS rebinding). Redirect hops open their own connections and are checked
+the same way.
+
+Pages are fetched concurrently with httpx on one crawler event loop shared by
+the whole process. Its global limit bounds the total number of requests in
+flight, and each domain gets a small concurrency limit and a minimum delay
+between requests, whichever thread or crew asked for the page.
+
+Extracted pages are kept on disk under CRAWL_CACHE_DIR:
+- within CRAWL_CACHE_TTL the cached copy is used with no request;
+- after that, the page is revalidated with If-None-Match / If-Modified-Since,
+  and a 304 reuses the stored text.
+
+The main content comes out of a single html.parser pass. It skips scripts,
+navigation and other page chrome, prefers <article>/<main> when present, and
+is trimmed to a per-page token budget.
+"""
+from crewai.tools import BaseTool
+from typing import List, Optional, Type
+from pydantic import BaseModel, Field
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+from app.config import settings
+import asyncio
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import socket
+import threading
+import time
+import httpcore
+import httpx
+
+_RE_SPACES = re.compile(r"\s+")
+
+# Subtrees that never hold the main content
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "form", "nav", "header",
+              "footer", "aside", "button", "select"}
+# Tags that end a block of text
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th", "br",
+               "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt", "figcaption"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_CONTENT_TAGS = ("article", "main")
+# blocks shorter than this are usually menus, buttons or bylines
+_MIN_BLOCK_CHARS = 30
+
+
+class _ContentParser(HTMLParser):
+    """Collects the title and text blocks, separately for <article>/<main> subtrees."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks = []
+        self.content_blocks = []
+        self._in_title = False
+        self._skip_depth = 0
+        self._content_depth = 0
+        self._stack = []
+        self._buffer = []
+
+    def _flush(self):
+        text = _RE_SPACES.sub(" ", "".join(self._buffer)).strip()
+        self._buffer = []
+        if not text:
+            return
+        self.blocks.append(text)
+        if self._content_depth:
+            self.content_blocks.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                self._flush()
+            return
+        self._stack.append(tag)
+        if tag == "title":
+            self._in_title = True
+        elif tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif not self._skip_depth:
+            if tag in _BLOCK_TAGS:
+                self._flush()
+            if tag in _CONTENT_TAGS:
+                self._content_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag not in self._stack:
+            return
+        # close anything left open inside this element (HTML in the wild is not always balanced)
+        while self._stack:
+            open_tag = self._stack.pop()
+            if open_tag == "title":
+                self._in_title = False
+            elif open_tag in _SKIP_TAGS:
+                self._skip_depth -= 1
+            elif not self._skip_depth:
+                if open_tag in _BLOCK_TAGS:
+                    self._flush()
+                if open_tag in _CONTENT_TAGS:
+                    self._content_depth -= 1
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self._buffer.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_main_content(html_text: str, token_budget: int = None):
+    """Return (title, text): the page's main text trimmed to ``token_budget`` tokens."""
+    token_budget = token_budget or settings.CRAWL_PAGE_TOKEN_BUDGET
+    parser = _ContentParser()
+    parser.feed(html_text)
+    parser.close()
+    content = sum(len(b) for b in parser.content_blocks)
+    blocks = parser.content_blocks if content >= 200 else parser.blocks
+    blocks = [b for b in blocks if len(b) >= _MIN_BLOCK_CHARS] or blocks
+
+    # about four characters per token, the same estimate as the memory context budget
+    limit = token_budget * 4
+    kept, used = [], 0
+    for block in blocks:
+        if used + len(block) > limit:
+            if limit - used > 40:
+                kept.append(block[:limit - used].rstrip() + "…")
+            break
+        kept.append(block)
+        used += len(block) + 1
+    return _RE_SPACES.sub(" ", parser.title).strip(), "\n".join(kept)
+
+
+class PageCache:
+    """Extracted pages on disk, one JSON file per URL, with their validators."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str):
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, entry: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+page_cache = PageCache(settings.CRAWL_CACHE_DIR)
+
+
+def check_url(url: str) -> None:
+    """Raise ValueError unless ``url`` is an http(s) URL with a host."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError(f"not an http(s) URL: {url}")
+    parsed.port  # raises ValueError when out of range
+
+
+async def resolve_public_address(host: str, port: int) -> str:
+    """Resolve ``host`` and return an address to connect to; raise ValueError unless all are public.
+
+    Blocks loopback, private, link-local (including the 169.254.169.254 cloud
+    metadata endpoint), carrier-grade NAT, multicast and reserved ranges, so
+    model-supplied URLs can't reach internal services.
+    """
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"cannot resolve {host}: {e}")
+    if not infos:
+        raise ValueError(f"cannot resolve {host}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"{host} resolves to a non-public address ({address})")
+    return infos[0][4][0]
+
+
+class _PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """Opens TCP connections only to vetted public addresses.
+
+    The URL keeps its hostname, so the Host header, SNI, certificate checks and
+    connection pooling all still work per hostname; only the socket target is
+    pinned to the address that passed the check.
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            address = await resolve_public_address(host, port)
+        except ValueError as e:
+            raise httpcore.ConnectError(str(e))
+        return await self._backend.connect_tcp(address, port, timeout=timeout, local_address=local_address,
+                                               socket_options=socket_options)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError("unix sockets are not allowed")
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+class _PublicAddressTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, limits: httpx.Limits):
+        super().__init__(limits=limits, trust_env=False)
+        # the pool httpx would build, but connecting through the address check
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(trust_env=False),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=_PublicAddressBackend(),
+        )
+
+
+class _DomainState:
+    """Per-domain concurrency limit and the start time reserved for its next request."""
+    __slots__ = ("limit", "next_slot", "active")
+
+    def __init__(self):
+        self.limit = asyncio.Semaphore(max(1, settings.CRAWL_PER_DOMAIN))
+        self.next_slot = 0.0
+        self.active = 0
+
+
+# Domains remembered for politeness; idle ones are pruned past this many
+_MAX_DOMAINS = 1024
+
+# Process-wide crawl state. It is only touched from the crawler loop's thread,
+# so it needs no locks.
+_domains = {}
+_global_limit = asyncio.Semaphore(max(1, settings.CRAWL_MAX_CONCURRENCY))
+_client = None
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _crawler_loop() -> asyncio.AbstractEventLoop:
+    """The process's crawler event loop, started on first use in a daemon thread."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="crawler", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        limits = httpx.Limits(max_connections=settings.CRAWL_MAX_CONCURRENCY,
+                              max_keepalive_connections=settings.CRAWL_MAX_CONCURRENCY)
+        # redirects are followed by hand so every hop goes through the checks; proxies from
+        # the environment are ignored for the same reason
+        transport = None if settings.CRAWL_ALLOW_PRIVATE else _PublicAddressTransport(limits)
+        _client = httpx.AsyncClient(timeout=settings.CRAWL_TIMEOUT, limits=limits, transport=transport,
+                                    follow_redirects=False, trust_env=False,
+                                    headers={"User-Agent": settings.CRAWL_USER_AGENT})
+    return _client
+
+
+def _domain(domain: str) -> _DomainState:
+    state = _domains.get(domain)
+    if state is None:
+        if len(_domains) >= _MAX_DOMAINS:
+            now = time.monotonic()
+            for name in [d for d, st in _domains.items() if not st.active and st.next_slot <= now]:
+                del _domains[name]
+        state = _domains[domain] = _DomainState()
+    return state
+
+
+async def _polite_wait(state: _DomainState) -> None:
+    """Reserve the domain's next request slot and sleep until it comes up."""
+    now = time.monotonic()
+    slot = max(now, state.next_slot)
+    state.next_slot = slot + settings.CRAWL_DOMAIN_DELAY
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+
+class Crawler:
+    def __init__(self, cache: PageCache = None):
+        self.cache = cache or page_cache
+        self.stats = {"fetched": 0, "fresh_cache": 0, "revalidated": 0, "errors": 0}
+
+    async def _fetch(self, client, url, token_budget):
+        cached = self.cache.get(url)
+        if cached and time.time() - cached["fetched_at"] < settings.CRAWL_CACHE_TTL:
+            self.stats["fresh_cache"] += 1
+            return cached
+
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        target = url
+        for _ in range(settings.CRAWL_MAX_REDIRECTS + 1):
+            # redirects may point anywhere; the transport checks the address of every hop
+            check_url(target)
+            domain = _domain(urlparse(target).netloc.lower())
+            domain.active += 1
+            try:
+                async with domain.limit:
+                    # wait for the domain's slot before taking a global one, so a slow
+                    # domain doesn't hold capacity other domains could use
+                    await _polite_wait(domain)
+                    async with _global_limit:
+                        async with client.stream("GET", target, headers=headers) as response:
+                            if response.is_redirect:
+                                location = response.headers.get("location")
+                                if not location:
+                                    raise ValueError(f"redirect without a location from {target}")
+                                target = urljoin(target, location)
+                                continue
+                            if response.status_code == 304 and cached:
+                                cached["fetched_at"] = time.time()
+                                self.cache.put(url, cached)
+                                self.stats["revalidated"] += 1
+                                return cached
+                            response.raise_for_status()
+                            content_type = response.headers.get("content-type", "")
+                            if "html" not in content_type and "text" not in content_type:
+                                raise ValueError(f"unsupported content type {content_type or 'unknown'}")
+                            body = bytearray()
+                            async for chunk in response.aiter_bytes():
+                                body.extend(chunk)
+                                if len(body) >= settings.CRAWL_MAX_BYTES:
+                                    break
+                            encoding = response.encoding or "utf-8"
+            finally:
+                domain.active -= 1
+            break
+        else:
+            raise ValueError(f"too many redirects from {url}")
+
+        title, text = extract_main_content(bytes(body).decode(encoding, errors="replace"), token_budget)
+        entry = {
+            "url": url,
+            "title": title,
+            "text": text,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fetched_at": time.time(),
+        }
+        self.cache.put(url, entry)
+        self.stats["fetched"] += 1
+        return entry
+
+    async def _crawl(self, urls: List[str], token_budget: int = None):
+        client = _get_client()
+
+        async def run(url):
+            try:
+                return await self._fetch(client, url, token_budget)
+            except (httpx.HTTPError, httpx.InvalidURL, ValueError, UnicodeError) as e:
+                self.stats["errors"] += 1
+                return f"could not read page: {e}"
+
+        return await asyncio.gather(*(run(url) for url in urls))
+
+    async def crawl(self, urls: List[str], token_budget: int = None):
+        """Fetch ``urls`` concurrently; returns one entry dict (or error string) per URL, in order.
+
+        The work runs on the shared crawler loop, so the limits hold across callers.
+        """
+        loop = _crawler_loop()
+        future = asyncio.run_coroutine_threadsafe(self._crawl(urls, token_budget), loop)
+        return await asyncio.wrap_future(future)
+
+    def crawl_sync(self, urls: List[str], token_budget: int = None):
+        # tools run on crew worker threads, which have no event loop of their own
+        return asyncio.run_coroutine_threadsafe(self._crawl(urls, token_budget), _crawler_loop()).result()
+
+
+class WebCrawlerInput(BaseModel):
+    url: Optional[str] = Field(None, description="URL to crawl and extract content from")
+    urls: Optional[List[str]] = Field(None, description="Several URLs to read at once, e.g. from search results")
+
+class WebCrawlerTool(BaseTool):
+    name: str = "Web Crawler"
+    description: str = (
+        "Reads web pages and returns their title and main text, trimmed to a compact size. "
+        "Pass several URLs at once to read them in parallel."
+    )
+    args_schema: Type[BaseModel] = WebCrawlerInput
+
+    def _run(self, url: Optional[str] = None, urls: Optional[List[str]] = None) -> str:
+        targets = list(dict.fromkeys(u.strip() for u in ([url] if url else []) + list(urls or []) if u and u.strip()))
+        targets = [u for u in targets if urlparse(u).scheme in ("http", "https")][:settings.CRAWL_MAX_URLS]
+        if not targets:
+            return "No valid http(s) URL given."
+        pages = Crawler().crawl_sync(targets)
+        blocks = []
+        for target, page in zip(targets, pages):
+            if isinstance(page, str):
+                blocks.append(f"{target}: {page}")
+            else:
+                blocks.append(f"## {page['title'] or target} ({target})\n{page['text'] or '(no readable text)'}")
+        return "\n\n".join(blocks)
@@ -0,0 +1,223 @@
+"""
+Deterministic finance calculators for agents.
+The LLM extracts the numbers from the conversation and calls these tools;
+the arithmetic itself runs in the NumPy engines under app.analytics, so plans
+quote exact timelines and interest instead of estimates.
+"""
+from crewai.tools import BaseTool
+from typing import List, Optional, Type
+from pydantic import BaseModel, Field
+from app.analytics.debt import Debt, STRATEGIES, compare_strategies, project_savings
+from app.analytics.portfolio import PLAN_PRESETS, load_prices, monte_carlo_goal, portfolio_stats
+
+
+def _money(value: float) -> str:
+    return f"{value:,.0f}"
+
+
+class DebtInput(BaseModel):
+    name: str = Field(..., description="Short label for the debt, e.g. 'thẻ tín dụng'.")
+    balance: float = Field(..., description="Outstanding balance.")
+    annual_rate: float = Field(..., description="Annual interest rate in percent, e.g. 18 for 18%/year.")
+    min_payment: Optional[float] = Field(None, description="Required minimum monthly payment, if known.")
+
+
+class DebtPayoffInput(BaseModel):
+    debts: List[DebtInput] = Field(..., description="All of the user's debts.")
+    monthly_payment: float = Field(..., description="Total amount the user can put toward debts each month.")
+    strategies: Optional[List[str]] = Field(None, description="Any of 'avalanche', 'snowball', 'custom'. Defaults to avalanche and snowball.")
+    extra_payments: Optional[List[float]] = Field(None, description="Extra monthly amounts to compare, e.g. [0, 1000000, 2000000].")
+    custom_priority: Optional[List[str]] = Field(None, description="Debt names in the order the user wants to pay them (for 'custom').")
+
+
+class DebtPayoffTool(BaseTool):
+    name: str = "Debt Payoff Simulator"
+    description: str = (
+        "Simulates month-by-month repayment of several debts and compares strategies "
+        "(avalanche, snowball, custom order) and extra monthly payments against paying only the minimums. "
+        "Returns months to debt-free, total interest, interest saved and the order debts are paid off."
+    )
+    args_schema: Type[BaseModel] = DebtPayoffInput
+
+    def _run(self, debts, monthly_payment: float, strategies=None, extra_payments=None, custom_priority=None) -> str:
+        parsed = [d if isinstance(d, DebtInput) else DebtInput(**d) for d in debts]
+        engine_debts = [Debt(d.name, d.balance, d.annual_rate / 100, d.min_payment) for d in parsed]
+        strategies = [s for s in (strategies or ["avalanche", "snowball"]) if s in STRATEGIES]
+        if custom_priority and "custom" not in strategies:
+            strategies.append("custom")
+        try:
+            results = compare_strategies(
+                engine_debts, monthly_payment,
+                strategies=strategies or ["avalanche"],
+                extra_payments=extra_payments or [0.0],
+                custom_priority=custom_priority,
+            )
+        except ValueError as e:
+            return f"Could not simulate: {e}"
+
+        minimums = sum(d.min_payment for d in engine_debts)
+        lines = [f"Monthly minimums total {_money(minimums)}."]
+        if monthly_payment < minimums:
+            lines.append(
+                f"Budget below required minimums: {_money(monthly_payment)}/month does not cover them, "
+                f"so the minimums ({_money(minimums)}/month) are what gets paid."
+            )
+        if results[0]["months"] is None:
+            lines.append("Baseline never pays off: paying only the minimums doesn't clear the debt within 50 years, "
+                         "so there is no interest-saved figure.")
+        for r in results:
+            label = r["strategy"] if not r["extra_payment"] else f"{r['strategy']} +{_money(r['extra_payment'])}/month"
+            if r["months"] is None:
+                lines.append(f"- {label}: paying {_money(r['monthly_payment'])}/month, "
+                             f"not paid off within 50 years (payment too low for the interest).")
+                continue
+            order = ", ".join(f"{p['name']} (month {p['month']})" for p in r["payoff_order"])
+            saved = f", saved {_money(r['interest_saved'])} vs minimums" if r["interest_saved"] is not None else ""
+            lines.append(
+                f"- {label}: paying {_money(r['monthly_payment'])}/month, debt-free in {r['months']} months; "
+                f"interest {_money(r['total_interest'])}{saved}; payoff order: {order}."
+            )
+        return "\n".join(lines)
+
+
+class SavingsProjectionInput(BaseModel):
+    monthly_income: float = Field(..., description="Monthly net income.")
+    monthly_expenses: float = Field(..., description="Monthly spending on needs and wants.")
+    savings_rates: Optional[List[float]] = Field(None, description="Shares of the surplus to save, in percent, e.g. [20, 50, 100].")
+    annual_return: float = Field(0.0, description="Expected annual return on savings in percent.")
+    months: int = Field(12, description="Projection horizon in months.")
+    goal: Optional[float] = Field(None, description="Savings goal, to report when it is reached.")
+
+
+class SavingsProjectionTool(BaseTool):
+    name: str = "Savings Projection Calculator"
+    description: str = (
+        "Projects how savings grow over time for several savings rates at once, "
+        "including when a savings goal is reached."
+    )
+    args_schema: Type[BaseModel] = SavingsProjectionInput
+
+    def _run(self, monthly_income: float, monthly_expenses: float, savings_rates=None, annual_return: float = 0.0,
+             months: int = 12, goal: Optional[float] = None) -> str:
+        rates = [r / 100 for r in (savings_rates or [20, 50, 100])]
+        results = project_savings(monthly_income, monthly_expenses, rates, annual_return / 100, max(1, months), goal=goal)
+        lines = [f"Monthly surplus {_money(max(monthly_income - monthly_expenses, 0))}."]
+        for r in results:
+            reached = ""
+            if goal is not None:
+                reached = f"; goal reached in month {r['goal_month']}" if r["goal_month"] else "; goal not reached in this horizon"
+            lines.append(
+                f"- save {r['savings_rate'] * 100:.0f}% of surplus ({_money(r['monthly_contribution'])}/month): "
+                f"{_money(r['final_balance'])} after {months} months{reached}."
+            )
+        return "\n".join(lines)
+
+
+def _pct(value: float) -> str:
+    return f"{value * 100:.1f}%"
+
+
+def _basket(symbols: List[str], weights: Optional[List[float]]):
+    """Load aligned prices for ``symbols`` and match ``weights`` to the ones found."""
+    dates, found, prices = load_prices(symbols)
+    if len(prices) < 3:
+        raise LookupError(f"Not enough overlapping price history for {', '.join(found)}")
+    if weights and len(weights) == len(symbols):
+        by_symbol = {s.upper(): w for s, w in zip(symbols, weights)}
+        weights = [by_symbol[s] for s in found]
+    else:
+        weights = None
+    return dates, found, portfolio_stats(prices, weights)
+
+
+class PortfolioAnalyticsInput(BaseModel):
+    symbols: List[str] = Field(..., description="Ticker or fund codes, e.g. ['VNM', 'FPT', 'E1VFVN30'].")
+    weights: Optional[List[float]] = Field(None, description="Portfolio weights in the same order as symbols; equal weights if omitted.")
+
+
+class PortfolioAnalyticsTool(BaseTool):
+    name: str = "Portfolio Analytics"
+    description: str = (
+        "Computes annual return, volatility, Sharpe ratio, maximum drawdown and the correlation matrix "
+        "for a list of stocks or funds from local price history, plus the same figures for the weighted portfolio."
+    )
+    args_schema: Type[BaseModel] = PortfolioAnalyticsInput
+
+    def _run(self, symbols, weights=None) -> str:
+        try:
+            dates, found, stats = _basket(symbols, weights)
+        except (LookupError, ValueError) as e:
+            return f"No analytics available: {e}"
+
+        lines = [f"Price history {dates[0]} to {dates[-1]} ({len(dates)} days)."]
+        for i, symbol in enumerate(found):
+            lines.append(
+                f"- {symbol} (weight {_pct(stats['weights'][i])}): return {_pct(stats['annual_return'][i])}/year, "
+                f"volatility {_pct(stats['annual_volatility'][i])}, Sharpe {stats['sharpe'][i]:.2f}, "
+                f"max drawdown {_pct(stats['max_drawdown'][i])}."
+            )
+        p = stats["portfolio"]
+        lines.append(
+            f"Portfolio: return {_pct(p['annual_return'])}/year, volatility {_pct(p['annual_volatility'])}, "
+            f"Sharpe {p['sharpe']:.2f}, max drawdown {_pct(p['max_drawdown'])}."
+        )
+        if len(found) > 1:
+            corr = stats["correlation"]
+            pairs = [f"{found[i]}/{found[j]} {corr[i, j]:.2f}" for i in range(len(found)) for j in range(i + 1, len(found))]
+            lines.append("Correlations: " + ", ".join(pairs) + ".")
+        missing = [s for s in symbols if s.upper() not in found]
+        if missing:
+            lines.append(f"No local data for: {', '.join(missing)}.")
+        return "\n".join(lines)
+
+
+class GoalProjectionInput(BaseModel):
+    monthly_contribution: float = Field(..., description="Amount invested every month.")
+    years: float = Field(..., description="Investment horizon in years.")
+    goal: Optional[float] = Field(None, description="Target amount, to report the chance of reaching it.")
+    initial: float = Field(0.0, description="Amount already invested.")
+    plan: Optional[str] = Field(None, description="One of 'savings', 'bond_fund', 'balanced_fund', 'equity_fund'.")
+    symbols: Optional[List[str]] = Field(None, description="Stocks or funds to estimate return and volatility from local price history.")
+    weights: Optional[List[float]] = Field(None, description="Weights for symbols; equal weights if omitted.")
+    annual_return: Optional[float] = Field(None, description="Expected annual return in percent, if the user gives one.")
+    annual_volatility: Optional[float] = Field(None, description="Expected annual volatility in percent, if the user gives one.")
+
+
+class GoalProjectionTool(BaseTool):
+    name: str = "Investment Goal Projection"
+    description: str = (
+        "Runs a Monte Carlo simulation of a monthly savings or investment plan and returns the pessimistic, "
+        "median and optimistic final balance, and the probability and expected month of reaching a goal. "
+        "Return and volatility come from the user's figures, local price history for the given symbols, "
+        "or the assumptions for a plan type."
+    )
+    args_schema: Type[BaseModel] = GoalProjectionInput
+
+    def _run(self, monthly_contribution: float, years: float, goal: Optional[float] = None, initial: float = 0.0,
+             plan: Optional[str] = None, symbols=None, weights=None, annual_return: Optional[float] = None,
+             annual_volatility: Optional[float] = None) -> str:
+        if annual_return is not None:
+            mu, sigma = annual_return / 100, (annual_volatility or 0.0) / 100
+            source = "the user's figures"
+        elif symbols:
+            try:
+                _, found, stats = _basket(symbols, weights)
+            except (LookupError, ValueError) as e:
+                return f"Could not project: {e}"
+            mu, sigma = stats["portfolio"]["annual_return"], stats["portfolio"]["annual_volatility"]
+            source = f"price history of {', '.join(found)}"
+        else:
+            plan = plan if plan in PLAN_PRESETS else "balanced_fund"
+            mu, sigma = PLAN_PRESETS[plan]
+            source = f"assumed long-run figures for a {plan.replace('_', ' ')}"
+
+        r = monte_carlo_goal(monthly_contribution, round(years * 12), mu, sigma, goal=goal, initial=initial)
+        lines = [
+            f"Assuming {_pct(mu)}/year return and {_pct(sigma)} volatility ({source}), {r['paths']:,} simulations.",
+            f"After {r['months']} months, paid in {_money(r['contributed'])}: "
+            f"pessimistic (10%) {_money(r['p10'])}, median {_money(r['median'])}, optimistic (90%) {_money(r['p90'])}.",
+        ]
+        if goal is not None:
+            reached = f", typically in month {r['median_goal_month']}" if r["median_goal_month"] else ""
+            lines.append(f"Chance of reaching {_money(goal)}: {_pct(r['probability'])}{reached}.")
+        return "\n".join(lines)
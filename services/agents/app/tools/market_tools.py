@@ -0,0 +1,69 @@
+"""
+Technical snapshot tool for the financial analyst.
+Prices and indicators come straight from the local columnar market store,
+which keeps SMA/EMA/MACD/RSI/volatility up to date on ingestion, so a
+"phân tích cổ phiếu X" request costs a few memory-mapped reads.
+"""
+from crewai.tools import BaseTool
+from typing import List, Type
+from pydantic import BaseModel, Field
+from app.analytics.market_store import market_store
+
+
+def _pct(value) -> str:
+    return "n/a" if value is None else f"{value * 100:+.2f}%"
+
+
+def _num(value) -> str:
+    return "n/a" if value is None or value != value else f"{value:,.2f}"
+
+
+def describe_symbol(symbol: str) -> str:
+    """Compact technical summary of ``symbol`` from the store."""
+    snap = market_store.snapshot(symbol)
+    if snap is None:
+        return f"{symbol.upper()}: no local price data."
+
+    close = snap["close"]
+    signals = []
+    for key in ("sma20", "sma50"):
+        if snap[key] == snap[key]:
+            signals.append(f"{'above' if close >= snap[key] else 'below'} {key.upper()}")
+    rsi = snap["rsi14"]
+    if rsi == rsi:
+        signals.append("RSI overbought" if rsi >= 70 else "RSI oversold" if rsi <= 30 else "RSI neutral")
+    macd, signal = snap["macd"], snap["macd_signal"]
+    prev_macd, prev_signal = snap["previous_macd"], snap["previous_signal"]
+    if prev_macd is not None and (prev_macd - prev_signal) * (macd - signal) < 0:
+        signals.append("MACD bullish crossover" if macd > signal else "MACD bearish crossover")
+    else:
+        signals.append("MACD above signal" if macd > signal else "MACD below signal")
+
+    return "\n".join([
+        f"{snap['symbol']} close {_num(close)} on {snap['date']} ({snap['rows']} sessions stored).",
+        f"Change: 1 day {_pct(snap['change_1d'])}, 5 days {_pct(snap['change_5d'])}, 20 days {_pct(snap['change_20d'])}; "
+        f"52-week range {_num(snap['low_52w'])} - {_num(snap['high_52w'])}.",
+        f"SMA20 {_num(snap['sma20'])}, SMA50 {_num(snap['sma50'])}, EMA12 {_num(snap['ema12'])}, EMA26 {_num(snap['ema26'])}.",
+        f"MACD {_num(macd)}, signal {_num(signal)}, histogram {_num(macd - signal)}; RSI14 {_num(rsi)}; "
+        f"20-day volatility {_num(snap['vol20'] * 100)}%/year.",
+        f"Signals: {', '.join(signals)}.",
+    ])
+
+
+class StockAnalysisInput(BaseModel):
+    symbols: List[str] = Field(..., description="Ticker codes to analyze, e.g. ['FPT'] or ['VNM', 'HPG'].")
+
+
+class StockAnalysisTool(BaseTool):
+    name: str = "Stock Technical Snapshot"
+    description: str = (
+        "Returns the latest close, recent price changes, 52-week range and technical indicators "
+        "(SMA20/50, EMA12/26, MACD, RSI14, 20-day volatility) with their signals for Vietnamese stocks and funds "
+        "from local market data."
+    )
+    args_schema: Type[BaseModel] = StockAnalysisInput
+
+    def _run(self, symbols) -> str:
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        return "\n\n".join(describe_symbol(s.strip()) for s in symbols if s.strip()) or "No symbols given."
@@ -1,25 +1,30 @@
 """
-This tool is a placeholder for a more complex RAG (Retrieval-Augmented Generation) implementation.
-It simulates retrieving relevant information from a vector database (like Pinecone)
-to provide context for the LLM.
+Conversation-memory retrieval tool for agents.
+It searches the current user's earlier conversation in the vector store
+(Pinecone or the local backend) for the agent's own query, skipping what the
+prompt's session history already contains.
 """
 from crewai.tools import BaseTool
-from typing import Type
+from typing import Type, Optional
 from pydantic import BaseModel, Field
-from app.utils.pinecone import rag_query
+from app.utils.memory_context import search_memory, current_chat_id
 
 class RAGInput(BaseModel):
-    query: str = Field(..., description="The query to search for in the vector database.")
-    user_id: str = Field(..., description="The user's ID to filter the search.")
-    agent_context: str = Field(..., description="The agent's context to search within.")
+    query: str = Field(..., description="What to look for in the user's earlier conversation.")
+    agent_context: Optional[str] = Field(None, description="The agent's memory namespace to search within. Defaults to the agent's own.")
 
 class RAGTool(BaseTool):
     name: str = "RAG Tool"
-    description: str = "Retrieves relevant information from a vector database to provide context."
+    description: str = "Retrieves the current user's earlier conversation with the assistant to provide context."
     args_schema: Type[BaseModel] = RAGInput
+    namespace: str = "financial_manager"
 
-    def _run(self, query: str, user_id: str, agent_context: str) -> str:
+    def _run(self, query: str, agent_context: Optional[str] = None) -> str:
         """
-        Uses the rag_query function from pinecone.py to retrieve information.
+        Searches the memory of the chat being served for ``query``.
         """
-        return rag_query(query=query, agent_context=agent_context, user_id=user_id)
+        chat_id = current_chat_id.get()
+        if not chat_id:
+            return "No conversation history is available for this request."
+        context = search_memory(query=query, chat_id=chat_id, namespace=agent_context or self.namespace)
+        return context or "Nothing beyond the conversation history already provided."
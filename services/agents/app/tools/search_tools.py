@@ -1,35 +1,146 @@
+"""
+Web search tool backed by the Brave Search API.
+Requests go through one pooled HTTP session with a timeout and retries on
+429/5xx. Several queries run in parallel, and results are cached per
+normalized query for SEARCH_CACHE_TTL seconds. Each hit is reduced to
+title, snippet and URL so search output stays small in the prompt.
+"""
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Optional, Type
 from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.config import settings
+import html
+import re
+import threading
+import unicodedata
 import requests
-import json
+
+_RE_TAGS = re.compile(r"<[^>]+>")
+_RE_SPACES = re.compile(r"\s+")
+
+_cache = TTLCache(maxsize=settings.SEARCH_CACHE_SIZE, ttl=settings.SEARCH_CACHE_TTL)
+_cache_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=max(1, settings.SEARCH_MAX_PARALLEL), thread_name_prefix="search")
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                retries = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(4, settings.SEARCH_MAX_PARALLEL * 2), max_retries=retries)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip"})
+                _session = session
+    return _session
+
+
+def normalize_search_query(query: str) -> str:
+    """Case- and whitespace-insensitive cache key (accents are kept: they change the meaning)."""
+    return _RE_SPACES.sub(" ", unicodedata.normalize("NFC", query or "")).strip().lower()
+
+
+def _clean(text: str, limit: int) -> str:
+    text = _RE_SPACES.sub(" ", html.unescape(_RE_TAGS.sub("", text or ""))).strip()
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def compact_results(results, limit: int):
+    """Keep title, snippet and URL of the first ``limit`` web results."""
+    compact = []
+    for item in results[:limit]:
+        compact.append({
+            "title": _clean(item.get("title", ""), 120),
+            "snippet": _clean(item.get("description", ""), settings.SEARCH_SNIPPET_CHARS),
+            "url": item.get("url", ""),
+        })
+    return compact
+
+
+def search(query: str, count: int = None):
+    """Compact results for ``query``, served from the cache when possible."""
+    count = count or settings.SEARCH_RESULT_COUNT
+    key = (normalize_search_query(query), count)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = _get_session().get(
+        settings.BRAVE_SEARCH_URL,
+        headers={"X-Subscription-Token": settings.BRAVE_API_KEY},
+        params={"q": query, "count": count},
+        timeout=settings.SEARCH_TIMEOUT,
+    )
+    response.raise_for_status()
+    results = compact_results(response.json().get("web", {}).get("results", []), count)
+    with _cache_lock:
+        _cache[key] = results
+    return results
+
+
+def search_many(queries: List[str], count: int = None):
+    """Run several searches in parallel; returns (query, results or error message) pairs in order."""
+    # queries differing only in case or spacing share one request
+    unique, seen = [], set()
+    for q in queries:
+        key = normalize_search_query(q)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(q)
+
+    def run(query):
+        try:
+            return search(query, count)
+        except (requests.RequestException, ValueError) as e:
+            return f"search failed: {e}"
+
+    if len(unique) == 1:
+        return [(unique[0], run(unique[0]))]
+    return list(zip(unique, _executor.map(run, unique)))
+
+
+def format_results(pairs) -> str:
+    blocks = []
+    for query, results in pairs:
+        if isinstance(results, str):
+            blocks.append(f"Search '{query}': {results}")
+            continue
+        if not results:
+            blocks.append(f"Search '{query}': no results.")
+            continue
+        lines = [f"Search '{query}':"]
+        for i, r in enumerate(results, 1):
+            lines.append(f"{i}. {r['title']} - {r['snippet']} ({r['url']})")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
 
 class BraveSearchInput(BaseModel):
-    query: str = Field(..., description="Search query to look up")
+    query: Optional[str] = Field(None, description="Search query to look up")
+    queries: Optional[List[str]] = Field(None, description="Several search queries to run at once")
 
 class BraveSearchTool(BaseTool):
     name: str = "Brave Search"
-    description: str = "Search the web for current information using Brave Search API"
+    description: str = (
+        "Search the web for current information using Brave Search API. "
+        "Pass several queries at once to search them in parallel. Returns title, snippet and URL per result."
+    )
     args_schema: Type[BaseModel] = BraveSearchInput
 
-    def _run(self, query: str) -> str:
-        api_key = self.config.get("brave_api_key")
-        headers = {
-            "Accept": "application/json",
-            "Accept-Encoding": "gzip",
-            "X-Subscription-Token": api_key
-        }
-        
-        params = {
-            "q": query,
-            "count": 10
-        }
-        
-        response = requests.get(
-            "https://api.search.brave.com/res/v1/web/search",
-            headers=headers,
-            params=params
-        )
-        
-        results = response.json()
-        return json.dumps(results.get('web', {}).get('results', []))
\ No newline at end of file
+    def _run(self, query: Optional[str] = None, queries: Optional[List[str]] = None) -> str:
+        if not settings.BRAVE_API_KEY:
+            return "Web search is not configured (BRAVE_API_KEY is missing)."
+        all_queries = ([query] if query else []) + list(queries or [])
+        if not all_queries:
+            return "No search query given."
+        return format_results(search_many(all_queries))
@@ -0,0 +1,114 @@
+"""Micro-benchmark: per-request crew construction, before and after the agent registry.
+
+"before" rebuilds what every message used to build: ``FinancialManagerAgents``
+(with the ``BaseAgent`` environment mapping and the tool objects), the budget
+agent, its task and the crew. "after" goes through ``FinancialManagerCrew``,
+which takes the factories from the registry and reuses the thread's crew, so
+only the kickoff inputs change.
+
+``Crew.kickoff`` and the memory lookup are stubbed out, so the numbers are
+construction cost only, with no LLM or network. When crewai (or the vector
+store clients) are not installed, pydantic stand-ins are used for them; those
+are cheaper than the real CrewAI classes, so the real saving is larger:
+
+    python -m app.utils.crew_benchmark --requests 2000
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import sys
+import time
+import types
+from pydantic import BaseModel, ConfigDict
+
+
+class _StandIn(BaseModel):
+    # validates its fields like the CrewAI models it replaces, but does nothing else
+    model_config = ConfigDict(extra="allow", arbitrary_types_allowed=True)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(**kwargs)
+
+    def kickoff(self, inputs=None):
+        return "ok"
+
+
+def _install_stand_ins():
+    """Register stand-in modules for whichever heavy dependencies are missing; returns their names."""
+    stand_ins = {
+        "crewai": {"Agent": _StandIn, "Crew": _StandIn, "Task": _StandIn,
+                   "Process": types.SimpleNamespace(sequential="sequential")},
+        "crewai.tools": {"BaseTool": type("BaseTool", (_StandIn,), {})},
+        "pinecone": {"Pinecone": _StandIn, "ServerlessSpec": _StandIn},
+        "protonx": {"ProtonX": _StandIn},
+        "langchain.text_splitter": {"RecursiveCharacterTextSplitter": _StandIn},
+    }
+    installed = []
+    for name, attrs in stand_ins.items():
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            module = types.ModuleType(name)
+            module.__dict__.update(attrs)
+            sys.modules[name] = module
+            parent, _, child = name.rpartition(".")
+            if parent:
+                sys.modules.setdefault(parent, types.ModuleType(parent))
+                setattr(sys.modules[parent], child, module)
+            installed.append(name)
+    return installed
+
+
+def run_benchmark(requests: int):
+    from crewai import Crew, Process
+    from app.agentics.registry import registry
+    from app.agentics.financial_manager import crew as crew_module
+    from app.agentics.financial_manager.agents import FinancialManagerAgents
+    from app.agentics.financial_manager.tasks import FinancialManagerTasks
+    from app.utils.progress import crew_step_callback
+
+    # construction only: no LLM call, no memory lookup
+    Crew.kickoff = lambda self, inputs=None: "ok"
+    crew_module.get_session_context = lambda *args, **kwargs: ""
+    inputs = {"user_query": "Tôi lương 15 triệu, lập ngân sách giúp tôi", "history": "(none)"}
+
+    def before():
+        agents = FinancialManagerAgents()
+        tasks = FinancialManagerTasks()
+        agent = agents.create_budget_agent()
+        task = tasks.create_budget_task(agent)
+        crew = Crew(agents=[agent], tasks=[task], process=Process.sequential, verbose=True,
+                    step_callback=crew_step_callback)
+        return crew.kickoff(inputs=inputs)
+
+    def after():
+        return crew_module.FinancialManagerCrew().manage_budget(inputs["user_query"], chat_id="bench")
+
+    results = {}
+    for name, fn in (("before", before), ("after", after)):
+        registry.clear()
+        # create_agent prints the resolved model on every call; keep it out of the timing
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()  # warm-up: imports, and the registry's first build for "after"
+            started = time.perf_counter()
+            for _ in range(requests):
+                fn()
+            elapsed = time.perf_counter() - started
+        results[name] = elapsed / requests
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-request crew construction cost, before vs after the registry")
+    parser.add_argument("--requests", type=int, default=2000, help="simulated requests per variant")
+    args = parser.parse_args()
+
+    stand_ins = _install_stand_ins()
+    if stand_ins:
+        print(f"stand-ins for missing packages: {', '.join(stand_ins)}")
+    r = run_benchmark(args.requests)
+    print(f"{args.requests} requests")
+    print(f"before (build agents, task and crew per request): {r['before'] * 1e6:9.1f} us/request")
+    print(f"after  (registry, reused per-thread crew):       {r['after'] * 1e6:9.1f} us/request")
+    print(f"speed-up: {r['before'] / r['after']:.1f}x")
@@ -1,19 +1,49 @@
-from app.utils.intent_classifier import classify_intent
+from app.utils.intent_classifier import classify_intent, is_debt_query
 from app.agentics.financial_manager.crew import FinancialManagerCrew
-# from app.agentics.investment_advisor.crew import InvestmentAdvisorCrew # Placeholder
-# from app.agentics.financial_analyst.crew import FinancialAnalystCrew # Placeholder
-from app.utils.pinecone import upsert_history
+from app.agentics.investment_advisor.crew import InvestmentAdvisorCrew
+from app.agentics.financial_analyst.crew import FinancialAnalystCrew
+from app.config import settings
+from app.utils.pinecone import embed_texts, upsert_history
+from app.utils.semantic_cache import semantic_cache
+from app.utils.single_flight import single_flight
+from app.utils.memory_context import current_chat_id, remember_turn
+from app.utils.progress import progress_sink, report_progress
+from app.utils.tracing import span
 import re
+import unicodedata
 
-def dispatcher(query: str, user_id: str, agent_key: str = None):
+_KNOWN_AGENTS = ("financial_manager", "investment_advisor", "financial_analyst")
+_RE_PUNCT = re.compile(r"[^\w\s]")
+_RE_SPACES = re.compile(r"\s+")
+
+def _flight_query(query: str) -> str:
+    """Case-, spacing- and punctuation-insensitive form of a query; accents are kept
+    because they change the meaning of Vietnamese words (vay / vậy)."""
+    text = _RE_PUNCT.sub(" ", unicodedata.normalize("NFC", query).lower())
+    return _RE_SPACES.sub(" ", text).strip()
+
+def dispatcher(query: str, user_id: str, agent_key: str = None, on_progress=None):
     """
     Dispatches a user query to the appropriate agent crew, executes the task,
     and saves the conversation history to Pinecone.
+    If given, on_progress(text) is called with short status updates during the run.
     """
+    # Make the chat id and progress callback visible to tools for the duration of this request
+    chat_token = current_chat_id.set(user_id)
+    progress_token = progress_sink.set(on_progress)
+    try:
+        return _dispatch(query, user_id, agent_key)
+    finally:
+        progress_sink.reset(progress_token)
+        current_chat_id.reset(chat_token)
+
+def _dispatch(query: str, user_id: str, agent_key: str = None):
     if not agent_key:
         # If no command, use LLM to classify intent
+        report_progress("Đang phân loại yêu cầu...")
         try:
-            agent_key = classify_intent(query)
+            with span("intent_classification"):
+                agent_key = classify_intent(query)
         except Exception as e:
             print(f"Intent classification failed: {e}. Defaulting to financial_manager.")
             agent_key = "financial_manager"
@@ -21,37 +51,61 @@ def dispatcher(query: str, user_id: str, agent_key: str = None):
     # Extract the core query text without the command
     text_only_query = re.sub(r'/\w+\s*', '', query).strip()
 
-    # Initialize result variable
-    result = None
-
-    # Route to the correct crew
-    if agent_key == "financial_manager":
-        crew = FinancialManagerCrew()
-        result = crew.manage_budget(text_only_query)
-    elif agent_key == "investment_advisor":
-        # crew = InvestmentAdvisorCrew() # Placeholder for future implementation
-        # result = crew.provide_advice(text_only_query)
-        print(f"Investment advisor not implemented. Defaulting to financial manager.")
-        crew = FinancialManagerCrew()
-        result = crew.manage_budget(text_only_query)
-    elif agent_key == "financial_analyst":
-        # crew = FinancialAnalystCrew() # Placeholder for future implementation
-        # result = crew.analyze_market(text_only_query)
-        print(f"Financial analyst not implemented. Defaulting to financial manager.")
-        crew = FinancialManagerCrew()
-        result = crew.manage_budget(text_only_query)
-    else:
+    if agent_key not in _KNOWN_AGENTS:
         # Fallback to a default or general-purpose crew if classification is unclear
         agent_key = "financial_manager"
-        crew = FinancialManagerCrew()
-        result = crew.manage_budget(text_only_query)
+
+    report_progress("Chuyên gia đang phân tích yêu cầu của bạn...")
+    if settings.SINGLE_FLIGHT_ENABLED:
+        # Identical questions from the same chat in flight at the same moment (double
+        # sends, client retries) share one crew run. The key includes the chat because
+        # the crew's answer is built from that user's own history.
+        flight_key = (agent_key, user_id, _flight_query(text_only_query))
+        result, shared = single_flight.do(flight_key, lambda: _answer(agent_key, text_only_query, user_id))
+        if shared:
+            print(f"[SingleFlight] Shared an in-flight {agent_key} run for user {user_id}")
+    else:
+        result = _answer(agent_key, text_only_query, user_id)
 
     # Save the interaction to Pinecone
     if result:
         try:
             upsert_history(chat_id=user_id, query=text_only_query, response=result, namespace=agent_key)
+            remember_turn(chat_id=user_id, namespace=agent_key, query=text_only_query, response=str(result))
         except Exception as e:
             # Log the error but don't block the response to the user
             print(f"Error upserting to Pinecone: {e}")
 
-    return result
\ No newline at end of file
+    return result
+
+def _answer(agent_key: str, query: str, user_id: str):
+    """Answer ``query`` with the agent's crew, reusing a cached answer when allowed."""
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return _run_crew(agent_key, query, user_id)
+    try:
+        vector = embed_texts([query])[0]
+    except Exception as e:
+        print(f"Semantic cache lookup skipped, embedding failed: {e}")
+        return _run_crew(agent_key, query, user_id)
+    # scoped to the chat: the crew's answer draws on this user's own history
+    cached, similarity = semantic_cache.get(agent_key, vector, scope=user_id)
+    if cached is not None:
+        print(f"[SemanticCache] {agent_key} hit (similarity {similarity:.3f})")
+        return cached
+    result = _run_crew(agent_key, query, user_id)
+    if result:
+        semantic_cache.put(agent_key, vector, result, scope=user_id)
+    return result
+
+def _run_crew(agent_key: str, query: str, user_id: str):
+    # Route to the correct crew
+    with span("crew_kickoff", agent=agent_key):
+        if agent_key == "investment_advisor":
+            return InvestmentAdvisorCrew().provide_advice(query, chat_id=user_id)
+        if agent_key == "financial_analyst":
+            return FinancialAnalystCrew().analyze_market(query, chat_id=user_id)
+        crew = FinancialManagerCrew()
+        if is_debt_query(query):
+            # Debt repayment questions get the debt specialist and the payoff simulator.
+            return crew.manage_debt(query, chat_id=user_id)
+        return crew.manage_budget(query, chat_id=user_id)
@@ -0,0 +1,118 @@
+"""Two-level cache for text embeddings.
+
+Keys are sha256(model, text), so the same chunk or query is embedded once no
+matter which call site asks for it. Lookups go to an in-memory LRU first and
+then to a SQLite file that survives restarts; the file is trimmed back to
+``max_disk_entries`` by least-recent access.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from app.config import settings
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, memory_size: int, max_disk_entries: int):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys that are cached."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.hits["memory"] += 1
+            if missing:
+                conn = self._connect()
+                placeholders = ",".join("?" * len(missing))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.hits["disk"] += 1
+                if rows:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+                    conn.commit()
+                self.misses += len(missing) - len(rows)
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs in both layers and evict from disk if over size."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, list(vector))
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items],
+            )
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_disk_entries:
+                # Trim an extra 10% so eviction doesn't run on every insert.
+                excess = count - int(self.max_disk_entries * 0.9)
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                )
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"memory_entries": len(self._memory), "hits": dict(self.hits), "misses": self.misses}
+
+
+embedding_cache = EmbeddingCache(
+    path=settings.EMBED_CACHE_PATH,
+    memory_size=settings.EMBED_CACHE_MEMORY_SIZE,
+    max_disk_entries=settings.EMBED_CACHE_DISK_MAX_ENTRIES,
+)
@@ -1,39 +1,265 @@
+import re
+import threading
+import unicodedata
+from cachetools import TTLCache
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from app.config import settings
 
+INTENTS = ("financial_manager", "investment_advisor", "financial_analyst")
+
+# Weighted keywords per intent. Stripping accents makes many short Vietnamese
+# words collide (vâng / vàng, vậy / vay, quy định / quỹ, quy mô / quỹ mở), so
+# accented queries are matched as written against _KEYWORDS, and accent-free
+# ones (users often type without accents) against _KEYWORDS_PLAIN, which only
+# keeps phrases that stay unambiguous without diacritics.
+_KEYWORDS = {
+    "financial_manager": {
+        3.0: ["ngân sách", "chi tiêu", "quản lý tài chính", "quản lí tài chính", "trả nợ", "khoản nợ", "khoản vay",
+              "thẻ tín dụng", "budget", "budgeting", "expense", "expenses", "debt", "debts", "loan", "credit card"],
+        2.0: ["tiết kiệm", "lương", "thu nhập", "vay", "lãi suất vay", "hóa đơn", "hoá đơn", "saving", "savings",
+              "salary", "income", "spending", "bills"],
+        1.0: ["triệu", "mỗi tháng", "hàng tháng", "monthly"],
+    },
+    "investment_advisor": {
+        3.0: ["đầu tư", "chứng chỉ quỹ", "quỹ mở", "quỹ etf", "người mới bắt đầu", "bắt đầu đầu tư", "lãi kép",
+              "invest", "investing", "investment", "mutual fund", "etf", "beginner", "compound interest"],
+        2.0: ["quỹ", "ccq", "trái phiếu", "vàng", "danh mục", "rủi ro", "sinh lời", "fund", "funds", "bond",
+              "bonds", "gold", "portfolio", "risk"],
+    },
+    "financial_analyst": {
+        3.0: ["cổ phiếu", "chứng khoán", "mã cổ phiếu", "báo cáo tài chính", "bctc", "phân tích kỹ thuật",
+              "phân tích kĩ thuật", "định giá", "vn-index", "vnindex", "vn30", "stock", "stocks", "ticker",
+              "technical analysis", "valuation", "financial statement"],
+        2.0: ["phân tích", "thị trường", "xu hướng", "p/e", "eps", "roe", "rsi", "macd", "analysis", "market",
+              "trend", "earnings"],
+    },
+}
+
+_KEYWORDS_PLAIN = {
+    "financial_manager": {
+        3.0: ["ngan sach", "chi tieu", "quan ly tai chinh", "tra no", "khoan no", "khoan vay", "the tin dung",
+              "budget", "budgeting", "expense", "expenses", "debt", "debts", "loan", "credit card"],
+        2.0: ["tiet kiem", "tien luong", "muc luong", "thu nhap", "vay tien", "di vay", "lai suat vay", "hoa don",
+              "saving", "savings", "salary", "income", "spending", "bills"],
+        1.0: ["trieu", "moi thang", "hang thang", "monthly"],
+    },
+    "investment_advisor": {
+        3.0: ["dau tu", "chung chi quy", "quy etf", "quy dau tu", "nguoi moi bat dau", "bat dau dau tu", "lai kep",
+              "invest", "investing", "investment", "mutual fund", "etf", "beginner", "compound interest"],
+        2.0: ["ccq", "trai phieu", "gia vang", "mua vang", "danh muc", "rui ro", "sinh loi", "fund", "funds",
+              "bond", "bonds", "gold", "portfolio", "risk"],
+    },
+    "financial_analyst": {
+        3.0: ["co phieu", "chung khoan", "ma co phieu", "bao cao tai chinh", "bctc", "phan tich ky thuat",
+              "dinh gia", "vn-index", "vnindex", "vn30", "stock", "stocks", "ticker", "technical analysis",
+              "valuation", "financial statement"],
+        2.0: ["phan tich", "thi truong", "xu huong", "p/e", "eps", "roe", "rsi", "macd", "analysis", "market",
+              "trend", "earnings"],
+    },
+}
+
+# Upper-case 3-letter tokens such as VNM or FPT are usually HOSE/HNX tickers;
+# currency codes and common acronyms are not.
+_RE_TICKER = re.compile(r"\b[A-Z]{3}\b")
+_NOT_TICKERS = {"VND", "USD", "EUR", "JPY", "CNY", "GBP", "AUD", "SGD", "KRW", "THB", "HKD", "CAD", "CHF",
+                "ETF", "CCQ", "EPS", "ROE", "ROA", "RSI", "GDP", "CPI", "CEO", "ATM", "APR", "APY", "IPO", "NAV"}
+_RE_SPACES = re.compile(r"\s+")
+
+
+def _strip_accents(text: str) -> str:
+    text = text.replace("đ", "d").replace("Đ", "D")
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def _compile_keywords(keywords):
+    compiled = {}
+    for intent, tiers in keywords.items():
+        compiled[intent] = [
+            (weight, re.compile(r"(?<!\w)(?:" + "|".join(re.escape(k) for k in words) + r")(?!\w)"))
+            for weight, words in tiers.items()
+        ]
+    return compiled
+
+
+_COMPILED_KEYWORDS = _compile_keywords(_KEYWORDS)
+_COMPILED_KEYWORDS_PLAIN = _compile_keywords(_KEYWORDS_PLAIN)
+
+# Financial-manager requests that are about paying debts down go to the debt crew.
+# Same split as the keyword tables: short debt words are ambiguous without
+# accents (vay / vậy, nợ / nó).
+_DEBT_EN = r"|snowball|avalanche|debt|debts|loan|loans|credit card|payoff|pay off"
+_RE_DEBT_ACCENTED = re.compile(
+    r"(?<!\w)(?:nợ|vay|thẻ tín dụng|trả góp" + _DEBT_EN + r")(?!\w)"
+)
+_RE_DEBT_PLAIN = re.compile(
+    r"(?<!\w)(?:tra no|khoan no|du no|no xau|khoan vay|vay tien|di vay|vay ngan hang|vay tin chap"
+    r"|the tin dung|tra gop" + _DEBT_EN + r")(?!\w)"
+)
+
+def normalize_query(query: str) -> str:
+    """Lower-case, whitespace-collapsed NFC form used for scoring and caching.
+
+    Accents are kept: "vâng" and "vàng" must not share a score or a cache entry.
+    """
+    return _RE_SPACES.sub(" ", unicodedata.normalize("NFC", query or "").lower()).strip()
+
+
+def _has_accents(text: str) -> bool:
+    return _strip_accents(text) != text
+
+
+def is_debt_query(query: str) -> bool:
+    """True when a financial-manager query is about repaying debts.
+
+    >>> is_debt_query("Tôi nợ thẻ tín dụng 20 triệu, trả sao cho nhanh?")
+    True
+    >>> is_debt_query("toi co khoan vay 50 trieu lai 12%")
+    True
+    >>> is_debt_query("Tôi lương 10 triệu, vậy nên chi tiêu thế nào?")
+    False
+    >>> is_debt_query("Vậy tôi nên lập ngân sách ra sao")
+    False
+    >>> is_debt_query("Như vậy tôi tiết kiệm được bao nhiêu mỗi tháng?")
+    False
+    >>> is_debt_query("Nó thế nào nếu tôi tiết kiệm 30%?")
+    False
+    """
+    text = normalize_query(query)
+    if _has_accents(text):
+        return bool(_RE_DEBT_ACCENTED.search(text))
+    return bool(_RE_DEBT_PLAIN.search(text))
+
+
+def score_intent(query: str, normalized: str = None):
+    """Score the query against the keyword tables.
+
+    Returns (best_intent, confidence, scores). Confidence is the best intent's
+    share of the total score, or 0.0 when nothing matched.
+
+    >>> score_intent("Vâng, cảm ơn bạn")[0] is None
+    True
+    >>> score_intent("Vậy còn gì nữa không?")[0] is None
+    True
+    >>> score_intent("Quy định về quy mô chi phí là gì?")[2]["investment_advisor"]
+    0.0
+    >>> score_intent("Tôi muốn đổi 100 USD sang VND")[2]["financial_analyst"]
+    0.0
+    >>> score_intent("Nên mua vàng hay gửi tiết kiệm?")[2]["investment_advisor"]
+    2.0
+    >>> score_intent("phan tich co phieu FPT")[0]
+    'financial_analyst'
+    """
+    normalized = normalize_query(query) if normalized is None else normalized
+    compiled = _COMPILED_KEYWORDS if _has_accents(normalized) else _COMPILED_KEYWORDS_PLAIN
+    scores = {intent: 0.0 for intent in INTENTS}
+    for intent, patterns in compiled.items():
+        for weight, pattern in patterns:
+            scores[intent] += weight * len(pattern.findall(normalized))
+    if any(t not in _NOT_TICKERS for t in _RE_TICKER.findall(query or "")):
+        scores["financial_analyst"] += 2.0
+
+    total = sum(scores.values())
+    if total <= 0:
+        return None, 0.0, scores
+    best = max(scores, key=scores.get)
+    return best, scores[best] / total, scores
+
+
+class _IntentStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"rule": 0, "cache": 0, "llm": 0}
+
+    def hit(self, tier: str):
+        with self._lock:
+            self.counts[tier] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {
+            "total": total,
+            "counts": counts,
+            "hit_rates": {tier: (n / total if total else 0.0) for tier, n in counts.items()},
+        }
+
+
+_stats = _IntentStats()
+_cache = TTLCache(maxsize=settings.INTENT_CACHE_SIZE, ttl=settings.INTENT_CACHE_TTL)
+_cache_lock = threading.Lock()
+_runnable = None
+_runnable_lock = threading.Lock()
+
+
+def _get_runnable():
+    """Build the prompt | llm | parser pipeline once per process."""
+    global _runnable
+    if _runnable is None:
+        with _runnable_lock:
+            if _runnable is None:
+                llm = ChatGoogleGenerativeAI(
+                    model=settings.GEMINI_MODEL,
+                    google_api_key=settings.GOOGLE_API_KEY,
+                    temperature=0,
+                    verbose=settings.VERBOSE,
+                )
+
+                prompt = PromptTemplate(
+                    input_variables=["user_input"],
+                    template=(
+                        """
+                        Analyze the user's request and determine which specialist should handle it.
+
+                        Available specialists:
+                        - financial_manager: personal finance management, budgeting, debt management
+                        - investment_advisor: beginner investment advice, fund recommendations for Gen Z
+                        - financial_analyst: advanced market analysis, stock research, in-depth financial questions
+
+                        User request: {user_input}
+
+                        Respond with ONLY one of these options exactly:
+                        financial_manager | investment_advisor | financial_analyst
+                        """
+                    ).strip(),
+                )
+
+                # Build runnable pipeline: prompt | llm | output parser
+                _runnable = prompt | llm | StrOutputParser()
+    return _runnable
+
+
 def classify_intent(query: str) -> str:
-    """Classify the user's intent using Gemini with modern LangChain runnables."""
-    llm = ChatGoogleGenerativeAI(
-        model=settings.GEMINI_MODEL,
-        google_api_key=settings.GOOGLE_API_KEY,
-        temperature=0.7,
-        verbose=settings.VERBOSE,
-    )
-
-    prompt = PromptTemplate(
-        input_variables=["user_input"],
-        template=(
-            """
-            Analyze the user's request and determine which specialist should handle it.
-
-            Available specialists:
-            - financial_manager: personal finance management, budgeting, debt management
-            - investment_advisor: beginner investment advice, fund recommendations for Gen Z
-            - financial_analyst: advanced market analysis, stock research, in-depth financial questions
-
-            User request: {user_input}
-
-            Respond with ONLY one of these options exactly:
-            financial_manager | investment_advisor | financial_analyst
-            """
-        ).strip(),
-    )
-
-    # Build runnable pipeline: prompt | llm | output parser
-    runnable = prompt | llm | StrOutputParser()
-
-    # Use invoke() instead of deprecated .run
-    response = runnable.invoke({"user_input": query})
-    return str(response).strip().lower()
+    """Classify the user's intent, calling Gemini only when the keyword rules are unsure.
+
+    Tiers: keyword scoring -> LRU+TTL cache of earlier LLM answers -> LLM.
+    """
+    normalized = normalize_query(query)
+    best, confidence, scores = score_intent(query, normalized)
+    # a lone weak keyword wins with a 100% share, so the score itself must be high enough too
+    if best and confidence >= settings.INTENT_RULE_CONFIDENCE and scores[best] >= settings.INTENT_RULE_MIN_SCORE:
+        _stats.hit("rule")
+        return best
+
+    with _cache_lock:
+        cached = _cache.get(normalized)
+    if cached:
+        _stats.hit("cache")
+        return cached
+
+    response = str(_get_runnable().invoke({"user_input": query})).strip().lower()
+    _stats.hit("llm")
+    intent = next((label for label in INTENTS if label in response), None)
+    if intent is None:
+        # Unparseable answer: trust the weak keyword guess before the default.
+        return best or "financial_manager"
+
+    with _cache_lock:
+        _cache[normalized] = intent
+    return intent
+
+
+def get_intent_stats() -> dict:
+    return _stats.snapshot()
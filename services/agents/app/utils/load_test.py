@@ -0,0 +1,82 @@
+"""Load test for the crew worker pool behind /api/respond.
+
+Simulates ``--users`` Telegram users who each send ``--requests`` messages
+back to back. Every request goes through ``CrewWorkerPool.run`` exactly as
+``process_query`` does, but with a stub dispatcher that blocks for
+``--latency`` seconds instead of running a crew (a real kickoff is mostly
+waiting on the LLM and Pinecone, which releases the GIL the same way).
+Requests the pool rejects (the 503 path) are retried after a short pause.
+
+The test runs once per pool size and prints throughput, so scaling with the
+number of workers is visible directly:
+
+    python -m app.utils.load_test --workers 1 4 8 --users 16 --requests 5 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+from app.config import settings
+from app.utils.worker_pool import CrewWorkerPool, PoolSaturatedError
+
+
+def _stub_dispatcher(latency: float):
+    def dispatcher(query: str, user_id: str, agent_key: str = None) -> str:
+        time.sleep(latency)
+        return f"reply to {user_id}: {query}"
+    return dispatcher
+
+
+async def run_load(workers: int, users: int, requests: int, latency: float, queue_depth: int) -> dict:
+    """Push ``users * requests`` stub dispatches through a pool of ``workers`` threads."""
+    pool = CrewWorkerPool(max_workers=workers, max_queue=queue_depth)
+    pool.start()
+    dispatcher = _stub_dispatcher(latency)
+    latencies = []
+    rejected = 0
+
+    async def user(user_id: str):
+        nonlocal rejected
+        for i in range(requests):
+            started = time.perf_counter()
+            while True:
+                try:
+                    await pool.run(dispatcher, query=f"message {i}", user_id=user_id, agent_key=None)
+                    break
+                except PoolSaturatedError:
+                    rejected += 1
+                    await asyncio.sleep(latency)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(f"user-{u}") for u in range(users)))
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "rejected": rejected,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker-pool load test with a stub dispatcher")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, settings.CREW_WORKERS], help="pool sizes to compare")
+    parser.add_argument("--users", type=int, default=16, help="simultaneous users")
+    parser.add_argument("--requests", type=int, default=5, help="messages per user")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds each stub crew run blocks")
+    parser.add_argument("--queue-depth", type=int, default=settings.CREW_QUEUE_DEPTH, help="waiting calls the pool accepts")
+    args = parser.parse_args()
+
+    print(f"{args.users} users x {args.requests} requests, {args.latency:.3f}s per crew run, queue depth {args.queue_depth}")
+    baseline = None
+    for workers in args.workers:
+        r = asyncio.run(run_load(workers, args.users, args.requests, args.latency, args.queue_depth))
+        baseline = baseline or r["throughput"]
+        print(f"workers={r['workers']:>3}  {r['throughput']:8.2f} req/s  ({r['throughput'] / baseline:5.2f}x)  "
+              f"p50 {r['p50']:.2f}s  p95 {r['p95']:.2f}s  rejected {r['rejected']}  total {r['seconds']:.2f}s")
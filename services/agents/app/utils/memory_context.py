@@ -0,0 +1,139 @@
+"""Conversation-memory context for agent prompts.
+
+``get_session_context`` retrieves a user's earlier turns once per
+(chat_id, namespace) session and keeps them in a TTL cache, so follow-up
+messages don't repeat the embedding and vector query. Turns saved during the
+session are prepended to the cached snippets so the context stays current.
+The result is trimmed to RAG_CONTEXT_TOKEN_BUDGET tokens before it reaches a
+prompt.
+"""
+import contextvars
+import threading
+import time
+from cachetools import TTLCache
+from app.config import settings
+from app.utils.pinecone import rag_search
+
+# Chat whose request is being handled; lets tools look up memory without the
+# LLM having to pass user ids around.
+current_chat_id = contextvars.ContextVar("current_chat_id", default=None)
+
+_sessions = TTLCache(maxsize=settings.RAG_SESSION_CACHE_SIZE, ttl=settings.RAG_SESSION_TTL)
+_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def trim_to_budget(snippets, token_budget: int):
+    """Keep snippets in order until the budget is spent, cutting the last one short."""
+    kept, used = [], 0
+    for snippet in snippets:
+        cost = estimate_tokens(snippet)
+        if used + cost <= token_budget:
+            kept.append(snippet)
+            used += cost
+            continue
+        remaining_chars = (token_budget - used) * 4
+        if remaining_chars > 40:
+            kept.append(snippet[:remaining_chars].rstrip() + "…")
+            used = token_budget
+        break
+    return kept, used
+
+
+class _RetrievalStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.cache_hits = 0
+        self.total_latency_ms = 0.0
+        self.total_tokens = 0
+
+    def record(self, cache_hit: bool, latency_ms: float, tokens: int):
+        with self._lock:
+            self.requests += 1
+            self.cache_hits += int(cache_hit)
+            self.total_latency_ms += latency_ms
+            self.total_tokens += tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            n = self.requests or 1
+            return {
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "avg_latency_ms": round(self.total_latency_ms / n, 3),
+                "avg_context_tokens": round(self.total_tokens / n, 1),
+            }
+
+
+_stats = _RetrievalStats()
+
+
+def get_session_context(query: str, chat_id: str, namespace: str, token_budget: int = None) -> str:
+    """Return earlier conversation text for ``chat_id`` trimmed to the token budget.
+
+    The snippets are retrieved once per (chat_id, namespace) session, using the
+    first query of the session; ``search_memory`` serves lookups for other
+    queries. Retrieval failures are logged and yield an empty context rather
+    than failing the request; they are not cached, so the next message retries.
+    """
+    if not chat_id:
+        return ""
+    token_budget = settings.RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    started = time.perf_counter()
+    key = (str(chat_id), namespace)
+    with _lock:
+        snippets = _sessions.get(key)
+    cache_hit = snippets is not None
+    if not cache_hit:
+        try:
+            snippets = rag_search(query, namespace, str(chat_id), top_k=settings.RAG_TOP_K)
+            with _lock:
+                _sessions[key] = snippets
+        except Exception as e:
+            print(f"Conversation memory lookup failed: {e}")
+            snippets = []
+
+    kept, tokens = trim_to_budget(snippets, token_budget)
+    latency_ms = (time.perf_counter() - started) * 1000
+    _stats.record(cache_hit, latency_ms, tokens)
+    print(f"[RAG] chat={chat_id} namespace={namespace} cache_hit={cache_hit} "
+          f"latency={latency_ms:.1f}ms context_tokens={tokens}")
+    return "\n".join(kept)
+
+
+def search_memory(query: str, chat_id: str, namespace: str, token_budget: int = None) -> str:
+    """Look up ``query`` itself in the chat's memory (for agent tools).
+
+    Snippets already in the session context, which the prompt carries as
+    {history}, are left out so a tool call only adds new information.
+    """
+    if not chat_id:
+        return ""
+    token_budget = settings.RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    try:
+        snippets = rag_search(query, namespace, str(chat_id), top_k=settings.RAG_TOP_K)
+    except Exception as e:
+        print(f"Conversation memory lookup failed: {e}")
+        return ""
+    with _lock:
+        known = set(_sessions.get((str(chat_id), namespace)) or ())
+    kept, _ = trim_to_budget([s for s in snippets if s not in known], token_budget)
+    return "\n".join(kept)
+
+
+def remember_turn(chat_id: str, namespace: str, query: str, response: str):
+    """Prepend a just-finished turn to the cached session context, if there is one."""
+    key = (str(chat_id), namespace)
+    with _lock:
+        snippets = _sessions.get(key)
+        if snippets is not None:
+            _sessions[key] = [f"Query: {query} | Response: {response}"] + snippets
+
+
+def get_retrieval_stats() -> dict:
+    return _stats.snapshot()
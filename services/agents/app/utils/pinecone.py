@@ -3,54 +3,313 @@ from pinecone import Pinecone, ServerlessSpec
 from app.config import settings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from protonx import ProtonX
+from app.utils.embedding_cache import embedding_cache, embedding_key
+from app.utils.vector_store import LocalVectorStore, hash_embedding
+from app.utils.tracing import correlation_id, span
+import contextvars
+import queue
+import threading
 import time
 
-if not settings.PROTONX_API_KEY:
-    raise ValueError("PROTONX_API_KEY is not set. Please check your .env file in the 'app' directory.")
-client = ProtonX(api_key=settings.PROTONX_API_KEY)
-
-# Add a check to ensure the API key is loaded before initializing Pinecone
-if not settings.PINECONE_API_KEY:
-    raise ValueError("PINECONE_API_KEY is not set. Please check your .env file in the 'app' directory.")
-
-pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-index_name = "chat-history"
-if index_name not in pc.list_indexes().names():
-    # Check embedding dimension from ProtonX before creating index
-    try:
-        sample_embedding = client.embeddings.create("sample text")["data"][0]["embedding"]
-        dimension = len(sample_embedding)
-    except Exception as e:
-        print(f"Could not determine embedding dimension from ProtonX, defaulting to 1024. Error: {e}")
-        dimension = 1024 # Fallback dimension
-    
-    pc.create_index(
-        name=index_name, 
-        dimension=dimension, 
-        metric="cosine", 
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-
-index = pc.Index(index_name)
+class VectorStoreHandle:
+    """Lazily created, thread-safe handle to the ProtonX client and vector index.
+
+    Nothing touches the network at import time. The first call to ``client`` or
+    ``index`` validates the API keys, creates the index if it is missing and
+    caches the handle and its dimension; ``warm_up`` does the same on a
+    background thread so the first request doesn't pay for it.
+
+    With VECTOR_STORE_BACKEND=local, ``index`` is a ``LocalVectorStore`` and
+    Pinecone is never contacted.
+    """
+
+    def __init__(self, index_name: str):
+        self.index_name = index_name
+        # Re-entrant: opening the index embeds a sample text through ``client``.
+        self._lock = threading.RLock()
+        self._client = None
+        self._index = None
+        self._dimension = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if not settings.PROTONX_API_KEY:
+                        raise ValueError("PROTONX_API_KEY is not set. Please check your .env file in the 'app' directory.")
+                    self._client = ProtonX(api_key=settings.PROTONX_API_KEY)
+        return self._client
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._open_index()
+        return self._index
+
+    @property
+    def dimension(self):
+        """Embedding dimension of the index, or None when the local store learns it from the first write."""
+        self.index
+        return self._dimension
+
+    def _open_index(self):
+        if settings.VECTOR_STORE_BACKEND == "local":
+            # Local partitions take their dimension from the first vector written to them.
+            # It is only known up front for the hashing embedder; ProtonX decides it otherwise.
+            self._dimension = settings.HASH_EMBEDDING_DIM if settings.EMBEDDING_BACKEND == "hashing" else None
+            return LocalVectorStore(settings.LOCAL_VECTOR_DIR)
+
+        # Add a check to ensure the API key is loaded before initializing Pinecone
+        if not settings.PINECONE_API_KEY:
+            raise ValueError("PINECONE_API_KEY is not set. Please check your .env file in the 'app' directory.")
+
+        pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+        if self.index_name not in pc.list_indexes().names():
+            # Check embedding dimension from ProtonX before creating index
+            try:
+                self._dimension = len(embed_texts(["sample text"])[0])
+            except Exception as e:
+                print(f"Could not determine embedding dimension from ProtonX, defaulting to 1024. Error: {e}")
+                self._dimension = 1024 # Fallback dimension
+
+            pc.create_index(
+                name=self.index_name,
+                dimension=self._dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+        else:
+            self._dimension = pc.describe_index(self.index_name).dimension
+        return pc.Index(self.index_name)
+
+    def warm_up(self, background: bool = True):
+        """Open the index ahead of the first request. Failures are logged, not raised."""
+        def _warm():
+            started = time.perf_counter()
+            try:
+                if settings.EMBEDDING_BACKEND != "hashing":
+                    self.client
+                self.index
+                dimension = self._dimension or "set by the first embedding"
+                print(f"Vector store ready in {time.perf_counter() - started:.2f}s (dimension {dimension})")
+            except Exception as e:
+                print(f"Vector store warm-up failed, will retry on first use: {e}")
+
+        if background:
+            threading.Thread(target=_warm, name="vector-store-warmup", daemon=True).start()
+        else:
+            _warm()
+
+
+vector_store = VectorStoreHandle("chat-history")
 # embedder = SentenceTransformer('dangvantuan/vietnamese-embedding')  # Free HF model
 
-def upsert_history(chat_id: str, query: str, response: str, namespace: str):
+def _embed_uncached(texts):
+    """Embed a list of texts with as few ProtonX calls as possible.
+
+    Texts are sent EMBED_BATCH_SIZE at a time; if the batch call fails (e.g. the
+    provider rejects list input) or does not return one embedding per input,
+    that batch is embedded one text at a time.
+    """
+    client = vector_store.client
+    vectors = []
+    batch_size = max(1, settings.EMBED_BATCH_SIZE)
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        data = []
+        if len(batch) > 1:
+            try:
+                data = client.embeddings.create(batch)["data"]
+            except Exception as e:
+                print(f"Batch embedding of {len(batch)} texts failed, embedding one at a time: {e}")
+        if len(data) != len(batch):
+            data = [client.embeddings.create(text)["data"][0] for text in batch]
+        vectors.extend(item["embedding"] for item in data)
+    return vectors
+
+
+def embed_texts(texts):
+    """Embed texts through the embedding cache; only cache misses reach ProtonX."""
+    if settings.EMBEDDING_BACKEND == "hashing":
+        # Local hashing is cheaper than a cache lookup.
+        return [hash_embedding(text, settings.HASH_EMBEDDING_DIM) for text in texts]
+
+    with span("embedding", texts=len(texts)) as attrs:
+        keys = [embedding_key(settings.EMBEDDING_MODEL, text) for text in texts]
+        found = embedding_cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        attrs["cache_misses"] = len(missing)
+        if missing:
+            vectors = _embed_uncached(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            embedding_cache.put_many(new_items)
+            found.update(new_items)
+        return [found[key] for key in keys]
+
+
+def _build_history_records(chat_id: str, query: str, response: str, namespace: str):
     text = f"Query: {query} | Response: {response}"
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=50)
     chunks = text_splitter.split_text(text=text)
-    for i, chunk_text in enumerate(chunks):
-        # Embed with ProtonX
-        embeddings_response = client.embeddings.create(chunk_text)
-        vector = embeddings_response["data"][0]["embedding"]  # Extract vector list
-        vector_id = f"{chat_id}_{int(time.time())}_{i}"
-        index.upsert(vectors=[(vector_id, vector, {"text": chunk_text, "chat_id": chat_id})], namespace=namespace)
+    stamp = time.time_ns()
+    return [
+        (namespace, f"{chat_id}_{stamp}_{i}", chunk_text, {"text": chunk_text, "chat_id": chat_id})
+        for i, chunk_text in enumerate(chunks)
+    ]
+
+
+def _write_records(records, correlation_ids=None):
+    """Embed all records in batched calls and upsert them grouped by namespace.
+
+    ``correlation_ids`` names the requests a background batch was built from,
+    since the writer thread has no request context of its own.
+    """
+    if not records:
+        return
+    vectors = embed_texts([text for _, _, text, _ in records])
+    by_namespace = {}
+    for (namespace, vector_id, _, metadata), vector in zip(records, vectors):
+        by_namespace.setdefault(namespace, []).append((vector_id, vector, metadata))
+    batch_size = max(1, settings.UPSERT_BATCH_SIZE)
+    with span("pinecone_upsert", records=len(records), correlation_ids=correlation_ids):
+        for namespace, items in by_namespace.items():
+            for start in range(0, len(items), batch_size):
+                vector_store.index.upsert(vectors=items[start:start + batch_size], namespace=namespace)
+
+
+class HistoryWriter:
+    """Background writer that batches conversation-memory writes.
+
+    Interactions are queued by ``submit`` and a daemon thread drains whatever
+    has accumulated, embedding and upserting it together, so the request path
+    only pays for a queue put.
+
+    The queue holds at most HISTORY_QUEUE_SIZE submissions; beyond that new
+    ones are dropped rather than growing memory while Pinecone is down. A
+    failed batch is retried HISTORY_WRITE_RETRIES times with backoff before
+    its records are dropped. Dropped records are counted in ``stats``.
+    """
+
+    def __init__(self, max_batch_records: int = 256, max_queued: int = 1000, retries: int = 2, retry_backoff: float = 1.0):
+        self.max_batch_records = max_batch_records
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue(maxsize=max(1, max_queued))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self.counters = {"written": 0, "retried": 0, "dropped_full": 0, "dropped_failed": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self._counts_lock:
+            self.counters[name] += n
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name="history-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, records):
+        self._ensure_started()
+        try:
+            # the writer thread has no request context; carry the submitter's along
+            self._queue.put_nowait((records, contextvars.copy_context()))
+        except queue.Full:
+            self._count("dropped_full", len(records))
+            print(f"History writer queue full, dropped {len(records)} records")
+
+    def flush(self, timeout: float = None):
+        """Block until everything submitted so far has been written."""
+        if self._thread is not None:
+            done = threading.Event()
+            try:
+                self._queue.put(done, timeout=timeout)
+            except queue.Full:
+                return
+            done.wait(timeout)
+
+    def stats(self) -> dict:
+        with self._counts_lock:
+            return {"queued": self._queue.qsize(), **self.counters}
+
+    def _write(self, records, correlation_ids):
+        for attempt in range(self.retries + 1):
+            try:
+                _write_records(records, correlation_ids)
+                self._count("written", len(records))
+                return
+            except Exception as e:
+                if attempt < self.retries:
+                    print(f"Error writing {len(records)} history records to Pinecone, retrying: {e}")
+                    self._count("retried")
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+                else:
+                    print(f"Error writing {len(records)} history records to Pinecone, dropped: {e}")
+                    self._count("dropped_failed", len(records))
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            records, waiters, correlation_ids, context = [], [], [], None
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    records.extend(item[0])
+                    if context is None:
+                        context = item[1]
+                    cid = item[1].get(correlation_id)
+                    if cid:
+                        correlation_ids.append(cid)
+                if len(records) >= self.max_batch_records:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            # spans inside (embedding, upsert) carry the first request's correlation id;
+            # pinecone_upsert lists every request in the batch
+            if context is not None:
+                context.run(self._write, records, correlation_ids)
+            for waiter in waiters:
+                waiter.set()
+
+
+history_writer = HistoryWriter(max_queued=settings.HISTORY_QUEUE_SIZE, retries=settings.HISTORY_WRITE_RETRIES)
+
+
+def upsert_history(chat_id: str, query: str, response: str, namespace: str, background: bool = None):
+    """Save one interaction to conversation memory.
+
+    With background=None the HISTORY_WRITE_MODE setting decides whether the
+    write is queued for the history writer or done inline.
+    """
+    records = _build_history_records(chat_id, query, str(response), namespace)
+    if background is None:
+        background = settings.HISTORY_WRITE_MODE == "background"
+    if background:
+        history_writer.submit(records)
+    else:
+        _write_records(records)
+
+def rag_search(query: str, agent_context: str, chat_id: str, top_k: int = 5):
+    """Return the stored chunk texts most similar to ``query``, best first."""
+    # Embed query with ProtonX (served from the embedding cache when possible)
+    vector = embed_texts([query])[0]
+    with span("pinecone_query", top_k=top_k):
+        results = vector_store.index.query(vector=vector, top_k=top_k, namespace=agent_context, filter={"chat_id": chat_id})
+    return [match['metadata']['text'] for match in results['matches']]
 
 def rag_query(query: str, agent_context: str, chat_id: str):
-    # Embed query with ProtonX
-    embeddings_response = client.embeddings.create(query)
-    vector = embeddings_response["data"][0]["embedding"]
-    results = index.query(vector=vector, top_k=5, namespace=agent_context, filter={"chat_id": chat_id})
-    return " ".join([match['metadata']['text'] for match in results['matches']]) if results['matches'] else ""
+    return " ".join(rag_search(query, agent_context, chat_id))
 
 # def upsert_history(chat_id: str, query: str, response: str, namespace: str):
 #     text = f"Query: {query} | Response: {response}"
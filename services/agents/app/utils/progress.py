@@ -0,0 +1,32 @@
+"""Progress reporting from crew runs to streaming clients.
+
+A streaming request installs a callback in ``progress_sink`` for the thread
+running its crew. Dispatcher stages and CrewAI step callbacks call
+``report_progress``, which is a no-op when nobody is listening, so cached
+crews can always be built with ``crew_step_callback``.
+"""
+import contextvars
+
+progress_sink = contextvars.ContextVar("progress_sink", default=None)
+
+_MAX_PROGRESS_CHARS = 300
+
+
+def report_progress(text: str):
+    sink = progress_sink.get()
+    if sink is None or not text:
+        return
+    try:
+        sink(text[:_MAX_PROGRESS_CHARS])
+    except Exception as e:
+        print(f"Progress callback failed: {e}")
+
+
+def crew_step_callback(step):
+    """CrewAI ``step_callback``: forward the agent's latest thought or tool use."""
+    thought = (getattr(step, "thought", "") or "").strip()
+    tool = getattr(step, "tool", None)
+    if tool:
+        report_progress(f"Đang dùng công cụ: {tool}")
+    elif thought:
+        report_progress(thought)
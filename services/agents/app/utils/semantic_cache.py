@@ -0,0 +1,117 @@
+"""Semantic response cache: reuse an answer when a new query means the same thing.
+
+Answers are stored per agent with the embedding of the query that produced
+them and the chat they were produced for. A lookup scores the query against
+every live entry of that agent with one NumPy matrix-vector product, ignores
+other chats' entries, and returns the best answer whose cosine similarity
+reaches SEMANTIC_CACHE_THRESHOLD. Entries expire after SEMANTIC_CACHE_TTL
+seconds; when the cache is full the least recently used entry is replaced.
+
+Answers are scoped to a chat because crews build them from the asking user's
+history (salary, debts, portfolio), which must never reach another user.
+Opt-in (SEMANTIC_CACHE_ENABLED).
+
+>>> cache = SemanticCache(max_entries=4, ttl=60, threshold=0.9)
+>>> cache.put("financial_manager", [1.0, 0.0], "With your 20M salary...", scope="chat-1")
+>>> cache.get("financial_manager", [1.0, 0.05], scope="chat-1")[0]
+'With your 20M salary...'
+>>> cache.get("financial_manager", [1.0, 0.05], scope="chat-2")[0] is None
+True
+"""
+import threading
+import time
+import numpy as np
+from app.config import settings
+
+
+class _AgentEntries:
+    """Fixed-capacity matrix of unit vectors plus per-row answer and timestamps."""
+
+    def __init__(self, capacity: int, dim: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.answers = [None] * capacity
+        self.scopes = np.full(capacity, None, dtype=object)
+        self.created = np.full(capacity, -np.inf)
+        self.last_used = np.full(capacity, -np.inf)
+
+
+class SemanticCache:
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.threshold = threshold
+        self._agents = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def _unit(vector):
+        v = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def get(self, agent_key: str, vector, scope):
+        """Return (answer, similarity) of the closest live entry of ``scope``, or (None, best_similarity)."""
+        q = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            entries = self._agents.get(agent_key)
+            if entries is None or entries.vectors.shape[1] != q.shape[0]:
+                self.counters["misses"] += 1
+                return None, 0.0
+            scores = entries.vectors @ q
+            scores[(entries.created < now - self.ttl) | (entries.scopes != scope)] = -np.inf
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self.counters["misses"] += 1
+                return None, max(similarity, 0.0)
+            entries.last_used[best] = now
+            self.counters["hits"] += 1
+            return entries.answers[best], similarity
+
+    def put(self, agent_key: str, vector, answer, scope):
+        q = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            entries = self._agents.get(agent_key)
+            if entries is None or entries.vectors.shape[1] != q.shape[0]:
+                # first entry, or the embedding model changed dimension
+                entries = self._agents[agent_key] = _AgentEntries(self.max_entries, q.shape[0])
+            # expired and never-used rows have the oldest timestamps
+            stale = np.where(entries.created < now - self.ttl, -np.inf, entries.last_used)
+            slot = int(np.argmin(stale))
+            if entries.answers[slot] is not None and np.isfinite(stale[slot]):
+                self.counters["evictions"] += 1
+            entries.vectors[slot] = q
+            entries.answers[slot] = answer
+            entries.scopes[slot] = scope
+            entries.created[slot] = now
+            entries.last_used[slot] = now
+            self.counters["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._agents.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            now = time.time()
+            live = sum(int(np.count_nonzero(e.created >= now - self.ttl)) for e in self._agents.values())
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": settings.SEMANTIC_CACHE_ENABLED,
+            "entries": live,
+            "max_entries_per_agent": self.max_entries,
+            "threshold": self.threshold,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            **counters,
+        }
+
+
+semantic_cache = SemanticCache(
+    max_entries=settings.SEMANTIC_CACHE_SIZE,
+    ttl=settings.SEMANTIC_CACHE_TTL,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+)
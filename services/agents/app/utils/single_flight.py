@@ -0,0 +1,58 @@
+"""Request coalescing for identical concurrent work.
+
+``SingleFlight.do(key, fn)`` runs ``fn`` once per key at a time: the first
+caller (the leader) runs it, and callers that arrive with the same key while
+it is in flight wait for the leader's result (or exception) instead of
+repeating the work. Nothing is kept once the call finishes; caching finished
+answers is the semantic cache's job.
+
+Followers block their worker thread while they wait, which is still far
+cheaper than each of them running a crew.
+"""
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Run ``fn()`` or join the identical call already in flight.
+
+        Returns (result, shared) where ``shared`` is True for followers.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"in_flight": in_flight, "leaders": self.leaders, "shared": self.shared}
+
+
+single_flight = SingleFlight()
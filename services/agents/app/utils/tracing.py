@@ -0,0 +1,135 @@
+"""Correlation ids and span timing for request stages.
+
+The messaging service sends its correlation id in the ``X-Correlation-Id``
+header; the HTTP middleware stores it in ``correlation_id`` and the worker
+pool copies the context into its threads, so spans recorded anywhere in a
+crew run carry the id of the Telegram update that caused it.
+
+Spans are appended as JSON lines to TRACE_EXPORT_PATH by a background thread,
+in the same format as the messaging service's, so the two files can be joined
+on correlation_id to see where a slow reply spent its time. Export is off
+unless TRACE_EXPORT_PATH is set; the file is rotated at TRACE_MAX_BYTES,
+keeping TRACE_BACKUPS old files. The exporter is the same in both services.
+"""
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from app.config import settings
+
+SERVICE_NAME = "agents"
+CORRELATION_HEADER = "X-Correlation-Id"
+
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+
+class JsonlSpanExporter:
+    def __init__(self, path: str, max_bytes: int = 0, backups: int = 0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, record: dict):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(record)
+
+    def _open(self):
+        f = open(self.path, "a", encoding="utf-8")
+        return f, f.tell()
+
+    def _rotate(self):
+        # traces.jsonl -> traces.jsonl.1 -> ... -> traces.jsonl.<backups>; the oldest is dropped
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _run(self):
+        f, size = self._open()
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                lines = [record]
+                # Write whatever else is already waiting in one go.
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        self._queue.put(None)
+                        break
+                    lines.append(record)
+                data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in lines)
+                f.write(data)
+                f.flush()
+                size += len(data.encode("utf-8"))
+                if self.max_bytes and size >= self.max_bytes:
+                    f.close()
+                    self._rotate()
+                    f, size = self._open()
+        finally:
+            f.close()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_exporter = (
+    JsonlSpanExporter(settings.TRACE_EXPORT_PATH, settings.TRACE_MAX_BYTES, settings.TRACE_BACKUPS)
+    if settings.TRACE_EXPORT_PATH else None
+)
+
+
+def record_span(name: str, start: float, duration: float, **attrs):
+    """Record a finished span; ``start`` is epoch seconds, ``duration`` seconds."""
+    if _exporter is None:
+        return
+    record = {
+        "ts": round(start, 6),
+        "service": SERVICE_NAME,
+        "name": name,
+        "duration_ms": round(duration * 1000, 3),
+        "correlation_id": correlation_id.get(),
+    }
+    if attrs:
+        record["attrs"] = attrs
+    _exporter.export(record)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as a span; errors are recorded and re-raised."""
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        record_span(name, start, time.perf_counter() - started, **attrs)
+
+
+def shutdown():
+    if _exporter is not None:
+        _exporter.close()
@@ -0,0 +1,205 @@
+"""Vector-store backends for conversation memory.
+
+``VectorStore`` is the small interface ``upsert_history``/``rag_query`` rely
+on; it deliberately mirrors the Pinecone ``Index`` calls (``upsert`` with
+``(id, values, metadata)`` tuples, ``query`` returning ``{"matches": [...]}``)
+so a Pinecone index can be used as-is.
+
+``LocalVectorStore`` is an in-process flat index for offline runs and small
+tenants. Vectors are partitioned per namespace and per ``chat_id`` and stored
+L2-normalized in append-only float32 files that are memory-mapped for search,
+so a query only scans the caller's own history.
+"""
+from abc import ABC, abstractmethod
+import hashlib
+import json
+import os
+import re
+import threading
+import numpy as np
+
+_RE_UNSAFE = re.compile(r"[^\w.-]")
+_NO_CHAT = "_shared"
+
+
+class VectorStore(ABC):
+    @abstractmethod
+    def upsert(self, vectors, namespace: str = ""):
+        """Insert or replace ``(id, values, metadata)`` tuples in ``namespace``."""
+
+    @abstractmethod
+    def query(self, vector, top_k: int = 5, namespace: str = "", filter: dict = None):
+        """Return ``{"matches": [{"id", "score", "metadata"}, ...]}`` by cosine similarity."""
+
+
+class _Partition:
+    """Append-only vectors plus metadata for one (namespace, chat_id) pair."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.meta_path = os.path.join(path, "meta.jsonl")
+        self.dim = None
+        self.ids = []
+        self.metadata = []
+        self.row_by_id = {}
+        self._live = None
+        self._matrix = None
+        self._load()
+
+    def _load(self):
+        # append() writes vectors before metadata, so metadata rows are the commit
+        # record: anything a crash left beyond them is cut off here.
+        if not os.path.exists(self.meta_path):
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+            return
+        committed = 0
+        with open(self.meta_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written last record
+                if line.strip():
+                    record = json.loads(line)
+                    self.dim = record.get("dim", self.dim)
+                    self._add_row(record["id"], record.get("metadata") or {})
+                committed += len(line)
+        if committed < os.path.getsize(self.meta_path):
+            os.truncate(self.meta_path, committed)
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        expected = len(self.ids) * 4 * (self.dim or 0)
+        if vector_bytes > expected:
+            # vectors written, metadata not: drop the orphan rows so later rows stay aligned with their ids
+            os.truncate(self.vectors_path, expected)
+        elif vector_bytes < expected:
+            # metadata without its vectors (vectors file lost or cut short): keep only complete rows
+            rows_on_disk = vector_bytes // (4 * self.dim)
+            del self.ids[rows_on_disk:], self.metadata[rows_on_disk:]
+            self.row_by_id = {vector_id: row for row, vector_id in enumerate(self.ids)}
+            if vector_bytes:
+                os.truncate(self.vectors_path, rows_on_disk * 4 * self.dim)
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                for vector_id, metadata in zip(self.ids, self.metadata):
+                    f.write(json.dumps({"id": vector_id, "dim": self.dim, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+    def _add_row(self, vector_id, metadata):
+        self.row_by_id[vector_id] = len(self.ids)
+        self.ids.append(vector_id)
+        self.metadata.append(metadata)
+
+    def append(self, items):
+        matrix = np.asarray([values for _, values, _ in items], dtype=np.float32)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match partition dimension {self.dim}")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.vectors_path, "ab") as f:
+            f.write(matrix.tobytes())
+        with open(self.meta_path, "a", encoding="utf-8") as f:
+            for vector_id, _, metadata in items:
+                f.write(json.dumps({"id": vector_id, "dim": self.dim, "metadata": metadata or {}}, ensure_ascii=False) + "\n")
+        for vector_id, _, metadata in items:
+            self._add_row(vector_id, metadata or {})
+        self._matrix = None
+        self._live = None
+
+    def search(self, query: np.ndarray, top_k: int, metadata_filter: dict):
+        if not self.ids:
+            return []
+        if self._matrix is None:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+            live = np.zeros(len(self.ids), dtype=bool)
+            live[list(self.row_by_id.values())] = True
+            self._live = live
+        scores = self._matrix @ query
+        mask = self._live.copy()
+        if metadata_filter:
+            for row in np.flatnonzero(mask):
+                meta = self.metadata[row]
+                if any(meta.get(key) != value for key, value in metadata_filter.items()):
+                    mask[row] = False
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+        k = min(top_k, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": self.ids[row], "score": float(scores[row]), "metadata": self.metadata[row]} for row in top]
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, root: str):
+        self.root = root
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _safe(name) -> str:
+        name = str(name) if name not in (None, "") else "_default"
+        safe = _RE_UNSAFE.sub("_", name)
+        if safe != name:
+            safe = f"{safe}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+        return safe
+
+    def _partition_at(self, path: str) -> _Partition:
+        partition = self._partitions.get(path)
+        if partition is None:
+            partition = self._partitions[path] = _Partition(path)
+        return partition
+
+    def _partition(self, namespace, chat_id) -> _Partition:
+        return self._partition_at(os.path.join(self.root, self._safe(namespace), self._safe(chat_id)))
+
+    def _namespace_partitions(self, namespace):
+        ns_dir = os.path.join(self.root, self._safe(namespace))
+        if not os.path.isdir(ns_dir):
+            return []
+        return [self._partition_at(os.path.join(ns_dir, name)) for name in sorted(os.listdir(ns_dir))]
+
+    def upsert(self, vectors, namespace: str = ""):
+        grouped = {}
+        for vector_id, values, metadata in vectors:
+            chat_id = (metadata or {}).get("chat_id", _NO_CHAT)
+            grouped.setdefault(chat_id, []).append((vector_id, values, metadata))
+        with self._lock:
+            for chat_id, items in grouped.items():
+                self._partition(namespace, chat_id).append(items)
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k: int = 5, namespace: str = "", filter: dict = None):
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        filter = dict(filter or {})
+        with self._lock:
+            if "chat_id" in filter:
+                partitions = [self._partition(namespace, filter.pop("chat_id"))]
+            else:
+                partitions = self._namespace_partitions(namespace)
+            matches = []
+            for partition in partitions:
+                if partition.dim is not None and partition.dim == query.shape[0]:
+                    matches.extend(partition.search(query, top_k, filter))
+        matches.sort(key=lambda m: m["score"], reverse=True)
+        return {"matches": matches[:top_k]}
+
+
+def hash_embedding(text: str, dim: int) -> list:
+    """Deterministic feature-hashing embedding of word unigrams and bigrams.
+
+    Much weaker than a learned model, but it needs no network, which makes the
+    whole RAG path runnable and benchmarkable offline.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    words = re.findall(r"\w+", text.lower())
+    for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
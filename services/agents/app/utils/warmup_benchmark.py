@@ -0,0 +1,56 @@
+"""Cold-start timing for the vector store: first request with and without ``warm_up``.
+
+Each run starts from a fresh ``VectorStoreHandle``:
+
+- cold: the first memory lookup opens the client and index itself, on the
+  request path (what every first message paid before the warm-up);
+- warm: ``warm_up`` runs first, as it does at service startup, and the first
+  lookup only embeds and queries.
+
+It uses whatever backends the environment configures, so with Pinecone and
+ProtonX keys set it measures the real cold start:
+
+    python -m app.utils.warmup_benchmark --runs 5
+"""
+import argparse
+import statistics
+import time
+from app.utils import pinecone
+
+
+def _first_lookup(handle, run: int) -> float:
+    pinecone.vector_store = handle
+    started = time.perf_counter()
+    # a new text each run, so the embedding cache can't serve it
+    pinecone.rag_search(f"ngân sách tháng này lần {run} {time.time_ns()}", "financial_manager", "warmup-benchmark")
+    return time.perf_counter() - started
+
+
+def run_benchmark(runs: int):
+    original = pinecone.vector_store
+    cold, warm_up, warm = [], [], []
+    try:
+        for run in range(runs):
+            cold.append(_first_lookup(pinecone.VectorStoreHandle(original.index_name), run))
+
+            handle = pinecone.VectorStoreHandle(original.index_name)
+            started = time.perf_counter()
+            handle.warm_up(background=False)
+            warm_up.append(time.perf_counter() - started)
+            warm.append(_first_lookup(handle, run))
+    finally:
+        pinecone.vector_store = original
+    return {"cold": cold, "warm_up": warm_up, "warm": warm}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="First-request latency with and without the vector-store warm-up")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.config import settings
+    print(f"vector store {settings.VECTOR_STORE_BACKEND}, embeddings {settings.EMBEDDING_BACKEND}, {args.runs} runs")
+    r = run_benchmark(args.runs)
+    for label, key in (("first request, cold", "cold"), ("warm_up (at startup)", "warm_up"), ("first request, warm", "warm")):
+        values = r[key]
+        print(f"{label:<22} median {statistics.median(values) * 1000:8.1f} ms  max {max(values) * 1000:8.1f} ms")
@@ -0,0 +1,90 @@
+"""Bounded worker pool used to run blocking crew work off the event loop.
+
+CrewAI kickoffs, LLM calls and Pinecone writes are all synchronous, so running
+them directly inside an ``async def`` endpoint blocks uvicorn's event loop.
+``CrewWorkerPool`` offloads them to a fixed number of threads and refuses new
+work once the number of running plus waiting calls reaches its limit.
+
+Each call runs in a copy of the submitting context, so context variables such
+as the request's correlation id are visible inside the worker thread.
+
+``python -m app.utils.load_test`` compares throughput across pool sizes.
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.utils.tracing import record_span
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the pool already holds as many calls as it accepts."""
+
+
+class CrewWorkerPool:
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        # Only touched from the event loop thread, so a plain counter is enough.
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew-worker")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        """Schedule ``fn`` in the pool and return an awaitable future.
+
+        Raises PoolSaturatedError without queuing anything if the pool is full.
+        Must be called from the event loop thread.
+        """
+        if self._pending >= self.capacity:
+            raise PoolSaturatedError(f"{self._pending} calls pending (capacity {self.capacity})")
+        self.start()
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        call = functools.partial(self._timed, time.time(), functools.partial(fn, *args, **kwargs))
+        future = loop.run_in_executor(self._executor, context.run, call)
+        future.add_done_callback(self._release)
+        return future
+
+    @staticmethod
+    def _timed(submitted_at, call):
+        record_span("pool_wait", submitted_at, max(0.0, time.time() - submitted_at))
+        return call()
+
+    def _release(self, _future):
+        self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn`` in the pool and await its result."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self.max_queue,
+            "pending": self._pending,
+            "running": min(self._pending, self.max_workers),
+            "waiting": max(0, self._pending - self.max_workers),
+        }
+
+
+crew_pool = CrewWorkerPool(max_workers=settings.CREW_WORKERS, max_queue=settings.CREW_QUEUE_DEPTH)
@@ -1,65 +1,127 @@
 """Client to call Agent service (AI) and return a string reply.
 
+Replies are returned as the agent's Markdown source; ``telegram_client.send_reply``
+renders them for Telegram.
 If AGENT_SERVICE_BASE not configured, fall back to simple echo logic.
 """
-from typing import Dict, Any
-from app import http_client
-from app.markdown_utils import md_to_text
+from typing import Dict, Any, AsyncIterator, Tuple
+from app import http_client, tracing, utils
 from app.config import settings
 from app.logger import get_logger
 import httpx
+import json
+import time
 
 logger = get_logger("messaging.agent_client")
 
 
-async def ask_agent(user_id: str, query: str) -> str:
-    # simple fallback
-    if not settings.AGENT_SERVICE_BASE:
-        logger.info("AGENT_SERVICE_BASE not configured, using fallback")
-        # echo with hint
-        return f"Tạm thời không có agent; bạn nói: {query}\n(Thử lại sau hoặc dùng lệnh /help)"
+def _trace_headers() -> Dict[str, str]:
+    cid = utils.get_correlation_id()
+    return {utils.CORRELATION_HEADER: cid} if cid else {}
+
+
+def _fallback_reply(query: str) -> str:
+    # echo with hint
+    return f"Tạm thời không có agent; bạn nói: {query}\n(Thử lại sau hoặc dùng lệnh /help)"
 
-    # Use the shared httpx client
-    client = http_client.get_httpx_client()
-    try:
-        resp = await client.post(
-            f"{settings.AGENT_SERVICE_BASE}/api/respond",
-            json={"user_id": user_id, "query": query} # FIX: Changed 'message' to 'query'
-        )
-        resp.raise_for_status()
-    except httpx.HTTPStatusError as exc:
-        logger.error(f"Agent API request failed: Status {exc.response.status_code} - {exc.response.text}")
-        raise
-    except httpx.RequestError as exc:
-        logger.error(f"Agent API request failed: {exc}")
-        raise
 
-    body = resp.json()
+def extract_reply_markdown(body: Dict[str, Any]) -> str:
+    """Pick the Markdown reply out of an agent-service response body."""
     reply = body.get("reply")
 
     if isinstance(reply, dict):
         # Prioritize 'raw', then 'text'/'content', then from 'tasks_output'
         if reply.get("raw"):
-            return md_to_text(reply["raw"])  # convert markdown -> text
+            return reply["raw"]
         if reply.get("text"):
-            return md_to_text(reply["text"])  # convert markdown -> text
+            return reply["text"]
         if reply.get("content"):
-            return md_to_text(reply["content"])  # convert markdown -> text
-        
+            return reply["content"]
+
         tasks = reply.get("tasks_output")
         if isinstance(tasks, list) and len(tasks) > 0:
             first_task = tasks[0]
             if isinstance(first_task, dict):
                 if first_task.get("raw"):
-                    return md_to_text(first_task["raw"])  # convert markdown -> text
+                    return first_task["raw"]
                 if first_task.get("summary"):
-                    return md_to_text(first_task["summary"])  # convert markdown -> text
-        
+                    return first_task["summary"]
+
         # Fallback to stringifying the whole reply object if no specific field is found
-    return md_to_text(str(reply))
-    
-    if isinstance(reply, str):
-        return md_to_text(reply)
+    return str(reply)
+
 
-    # if structured differently, try to stringify the whole body
-    return md_to_text(str(body))
+async def ask_agent(user_id: str, query: str) -> str:
+    # simple fallback
+    if not settings.AGENT_SERVICE_BASE:
+        logger.info("AGENT_SERVICE_BASE not configured, using fallback")
+        return _fallback_reply(query)
+
+    # Use the shared httpx client
+    client = http_client.get_httpx_client()
+    try:
+        with tracing.span("agent_call"):
+            resp = await client.post(
+                f"{settings.AGENT_SERVICE_BASE}/api/respond",
+                json={"user_id": user_id, "query": query}, # FIX: Changed 'message' to 'query'
+                headers=_trace_headers(),
+            )
+            resp.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        logger.error(f"Agent API request failed: Status {exc.response.status_code} - {exc.response.text}")
+        raise
+    except httpx.RequestError as exc:
+        logger.error(f"Agent API request failed: {exc}")
+        raise
+
+    return extract_reply_markdown(resp.json())
+
+
+async def ask_agent_stream(user_id: str, query: str) -> AsyncIterator[Tuple[str, str]]:
+    """Call the streaming endpoint and yield ("progress", text) events, then ("reply", text).
+
+    Raises like ask_agent if the request fails or the agent reports an error.
+    """
+    if not settings.AGENT_SERVICE_BASE:
+        logger.info("AGENT_SERVICE_BASE not configured, using fallback")
+        yield "reply", _fallback_reply(query)
+        return
+
+    client = http_client.get_httpx_client()
+    # the span covers the whole stream, up to the final reply
+    start, started = time.time(), time.perf_counter()
+    try:
+        async with client.stream(
+            "POST",
+            f"{settings.AGENT_SERVICE_BASE}/api/respond/stream",
+            json={"user_id": user_id, "query": query},
+            headers=_trace_headers(),
+        ) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                resp.raise_for_status()
+            event, data_lines = "message", []
+            async for line in resp.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:"):].strip())
+                elif not line and data_lines:
+                    data = json.loads("\n".join(data_lines))
+                    if event == "progress":
+                        yield "progress", data.get("text", "")
+                    elif event == "result":
+                        yield "reply", extract_reply_markdown(data)
+                        return
+                    elif event == "error":
+                        raise RuntimeError(f"Agent stream error: {data.get('detail')}")
+                    event, data_lines = "message", []
+    except httpx.HTTPStatusError as exc:
+        logger.error(f"Agent API request failed: Status {exc.response.status_code} - {exc.response.text}")
+        raise
+    except httpx.RequestError as exc:
+        logger.error(f"Agent API request failed: {exc}")
+        raise
+    finally:
+        tracing.record_span("agent_call", start, time.perf_counter() - started, streaming=True)
+    raise RuntimeError("Agent stream ended without a result")
@@ -1,33 +1,134 @@
 """Background processing for message flow.
 
-Runs in FastAPI BackgroundTasks to keep webhook responses fast.
+Runs as a job on the durable job queue to keep webhook responses fast.
 """
 
+import time
+from app.config import settings
 from app.logger import get_logger
-from app import agent_client, telegram_client
+from app import agent_client, telegram_client, tracing, utils
+from app.chat_actions import typing_heartbeats
+from app.scheduler import scheduler
 
 logger = get_logger("messaging.background_tasks")
 
+BUSY_REPLY = "Agent tạm thời bận, vui lòng thử lại sau."
 
-from fastapi import HTTPException
-# ... (existing imports)
 
-async def process_message_flow(user_id: str, chat_id: int, message_text: str):
+async def process_message_flow(user_id: str, chat_id: int, message_text: str, final_attempt: bool = True):
 	"""Orchestrates agent call and reply sending.
 
 	- ask agent
 	- send message via telegram
+
+	If the agent call fails and this is not the final attempt, the error is
+	re-raised so the job queue retries it instead of replying "busy".
 	"""
+	if settings.AGENT_STREAMING:
+		await _process_streaming(user_id, chat_id, message_text, final_attempt)
+		return
+
 	try:
-		# get a reply from agent (or fallback)
-		reply_text = await agent_client.ask_agent(user_id, message_text)
+		# get a reply from agent (or fallback), showing "typing..." meanwhile
+		async with typing_heartbeats.keep_typing(chat_id):
+			reply_text = await agent_client.ask_agent(user_id, message_text)
 	except Exception as exc:
-		logger.exception("agent processing failed", {"error": str(exc)})
-		reply_text = "Agent tạm thời bận, vui lòng thử lại sau."
+		logger.exception("agent processing failed", extra={"error": str(exc)})
+		if not final_attempt:
+			raise
+		reply_text = BUSY_REPLY
 
-	# try to send message
+	# try to send message, rendered in REPLY_FORMAT
 	try:
-		await telegram_client.send_message(chat_id, reply_text)
+		await telegram_client.send_reply(chat_id, reply_text)
 	except Exception:
 		logger.exception("failed to send message to telegram");
-		# optionally we could retry/send later; for now we log
+		# not retried: a retry would re-run the whole agent call
+
+
+async def _process_streaming(user_id: str, chat_id: int, message_text: str, final_attempt: bool = True):
+	"""Send a placeholder right away, edit it with throttled progress, then with the reply.
+
+	Like the non-streaming path, a failed agent call is re-raised for a retry
+	unless this is the final attempt; the placeholder is removed first so the
+	retry doesn't leave a stale one behind.
+	"""
+	message_id = None
+	try:
+		sent = await telegram_client.send_message(chat_id, "⏳ Đang xử lý yêu cầu của bạn...")
+		message_id = sent.get("result", {}).get("message_id")
+	except Exception:
+		logger.exception("failed to send placeholder message to telegram")
+
+	reply_text = None
+	last_edit = time.monotonic()
+	try:
+		async with typing_heartbeats.keep_typing(chat_id):
+			async for kind, text in agent_client.ask_agent_stream(user_id, message_text):
+				if kind == "reply":
+					reply_text = text
+				elif message_id and time.monotonic() - last_edit >= settings.STREAM_EDIT_INTERVAL:
+					last_edit = time.monotonic()
+					try:
+						await telegram_client.edit_message_text(chat_id, message_id, f"⏳ {text}"[:telegram_client.TELEGRAM_MESSAGE_LIMIT])
+					except Exception:
+						# progress is best effort; the final reply still goes out
+						logger.exception("failed to edit progress message")
+		if not reply_text:
+			raise RuntimeError("agent stream ended without a reply")
+	except Exception as exc:
+		logger.exception("agent processing failed", extra={"error": str(exc)})
+		if not final_attempt:
+			if message_id:
+				try:
+					await telegram_client.delete_message(chat_id, message_id)
+				except Exception:
+					logger.exception("failed to delete progress message")
+			raise
+		reply_text = BUSY_REPLY
+
+	try:
+		# long replies continue in ordered follow-up messages
+		await telegram_client.send_reply(chat_id, reply_text, message_id=message_id)
+	except Exception:
+		logger.exception("failed to send message to telegram")
+
+
+async def run_message_job(payload: dict, attempt: int, final: bool):
+	"""Job-queue handler for an incoming Telegram message.
+
+	Waits for the chat's and user's turn in the fair scheduler before running.
+	Restores the webhook's correlation id and records how long the job sat in
+	the queue (debounce included) and in the scheduler.
+	"""
+	cid = payload.get("correlation_id") or utils.new_correlation_id()
+	utils.set_correlation_id(cid)
+	enqueued_at = payload.get("enqueued_at")
+	if enqueued_at:
+		tracing.record_span(
+			"queue_wait", enqueued_at, max(0.0, time.time() - enqueued_at),
+			attempt=attempt, merged=payload.get("merged", 1), linked_ids=payload.get("linked_ids"),
+		)
+	scheduled_at = time.time()
+
+	async def _run():
+		# the scheduler may start this from another job's task, so set the id again
+		utils.set_correlation_id(cid)
+		tracing.record_span("scheduler_wait", scheduled_at, time.time() - scheduled_at)
+		with tracing.span("message_flow", attempt=attempt):
+			await process_message_flow(payload["user_id"], payload["chat_id"], payload["text"], final_attempt=final)
+
+	await scheduler.run(payload["chat_id"], payload["user_id"], _run)
+
+
+def merge_message_jobs(queued: dict, new: dict):
+	"""Fold a follow-up message into a still-queued one from the same user."""
+	if queued.get("user_id") != new.get("user_id") or queued.get("chat_id") != new.get("chat_id"):
+		return None
+	merged = dict(queued)
+	merged["text"] = f"{queued.get('text') or ''}\n{new.get('text') or ''}".strip()
+	merged["merged"] = queued.get("merged", 1) + 1
+	# the job keeps the first message's correlation id; the others stay linked
+	if new.get("correlation_id"):
+		merged["linked_ids"] = (queued.get("linked_ids") or []) + [new["correlation_id"]]
+	return merged
@@ -0,0 +1,59 @@
+"""Typing indicator heartbeat for long agent runs.
+
+Telegram shows "typing..." for about five seconds per ``sendChatAction``, so
+the heartbeat re-sends it every TYPING_INTERVAL seconds while a reply is
+being prepared. Heartbeats are shared per chat: concurrent requests for the
+same chat reuse one loop instead of multiplying API calls.
+"""
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Dict
+from app.config import settings
+from app.logger import get_logger
+from app import telegram_client
+
+logger = get_logger("messaging.chat_actions")
+
+
+class _Heartbeat:
+	def __init__(self, task: asyncio.Task):
+		self.task = task
+		self.users = 0
+
+
+class TypingHeartbeats:
+	def __init__(self, interval: float):
+		self.interval = interval
+		self._chats: Dict[int, _Heartbeat] = {}
+
+	async def _loop(self, chat_id: int) -> None:
+		while True:
+			try:
+				await telegram_client.send_typing(chat_id)
+			except Exception:
+				# a missed indicator is harmless; keep the heartbeat going
+				logger.warning("typing indicator failed", extra={"chat_id": chat_id})
+			await asyncio.sleep(self.interval)
+
+	@asynccontextmanager
+	async def keep_typing(self, chat_id: int):
+		"""Keep the typing indicator alive for ``chat_id`` while the block runs."""
+		beat = self._chats.get(chat_id)
+		if beat is None:
+			beat = self._chats[chat_id] = _Heartbeat(asyncio.create_task(self._loop(chat_id)))
+		beat.users += 1
+		try:
+			yield
+		finally:
+			beat.users -= 1
+			if beat.users == 0:
+				self._chats.pop(chat_id, None)
+				beat.task.cancel()
+				with suppress(asyncio.CancelledError):
+					await beat.task
+
+	def active_chats(self) -> int:
+		return len(self._chats)
+
+
+typing_heartbeats = TypingHeartbeats(settings.TYPING_INTERVAL)
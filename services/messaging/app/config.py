@@ -4,12 +4,67 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Local runtime state (job queue, dedup store) lives under this directory
+_DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(__file__), "data"))
+
 class Settings():
     BOT_TOKEN: str = os.getenv("BOT_TOKEN")
     WEBHOOK_SECRET_TOKEN: str | None = os.getenv("WEBHOOK_SECRET_TOKEN")
     USER_SERVICE_BASE: str = os.getenv("USER_SERVICE_BASE")
     AGENT_SERVICE_BASE: str | None = os.getenv("AGENT_SERVICE_BASE")
     REQUEST_TIMEOUT: int = 60
-    LOG_LEVEL: str = "INFO"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Fraction of INFO/DEBUG records kept (warnings and errors are never sampled)
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    # Records waiting for the log writer thread; beyond this they are dropped
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # How agent replies are rendered for Telegram: "text", "html" or "markdownv2"
+    REPLY_FORMAT: str = os.getenv("REPLY_FORMAT", "text").lower()
+    # Stream agent progress into an early Telegram message that is edited in place
+    AGENT_STREAMING: bool = os.getenv("AGENT_STREAMING", "false").lower() in ("1", "true", "yes")
+    # Minimum seconds between edits of the streamed message
+    STREAM_EDIT_INTERVAL: float = float(os.getenv("STREAM_EDIT_INTERVAL", "1.5"))
+    # Seconds between "typing..." chat actions while an agent call is in flight
+    TYPING_INTERVAL: float = float(os.getenv("TYPING_INTERVAL", "4"))
+    # Bot API root; point it at a local fake server for tests
+    TELEGRAM_API_BASE: str = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+    # "webhook" (Telegram pushes updates) or "polling" (long-poll getUpdates, no public ingress needed)
+    INGESTION_MODE: str = os.getenv("INGESTION_MODE", "webhook").lower()
+    # getUpdates batch size (Telegram allows at most 100) and long-poll timeout in seconds
+    POLL_LIMIT: int = int(os.getenv("POLL_LIMIT", "100"))
+    POLL_TIMEOUT: int = int(os.getenv("POLL_TIMEOUT", "30"))
+    # Durable job queue for incoming messages
+    DATA_DIR: str = _DATA_DIR
+    JOB_QUEUE_PATH: str = os.getenv("JOB_QUEUE_PATH", os.path.join(_DATA_DIR, "jobs.sqlite3"))
+    # jobs claimed at once; a chat never has more than one claimed job
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "32"))
+    JOB_MAX_QUEUED: int = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF: float = float(os.getenv("JOB_RETRY_BACKOFF", "2"))
+    # a running job whose process stops renewing its lease for this long is queued again
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    # Messages from one chat arriving within this window (0 = no wait), or while
+    # an earlier message of the chat is still waiting, are merged into one agent query
+    COALESCE_WINDOW_MS: int = int(os.getenv("COALESCE_WINDOW_MS", "1500"))
+    # upper bound on how long coalescing may hold back the first message
+    COALESCE_MAX_WAIT_MS: int = int(os.getenv("COALESCE_MAX_WAIT_MS", "5000"))
+    # Stage timings are appended as JSON lines here; empty (the default) disables tracing.
+    # The file is rotated at TRACE_MAX_BYTES, keeping TRACE_BACKUPS older files.
+    TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH", "")
+    TRACE_MAX_BYTES: int = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+    TRACE_BACKUPS: int = int(os.getenv("TRACE_BACKUPS", "3"))
+    # Agent calls in flight, overall and per user
+    SCHED_MAX_CONCURRENT: int = int(os.getenv("SCHED_MAX_CONCURRENT", "8"))
+    SCHED_MAX_PER_USER: int = int(os.getenv("SCHED_MAX_PER_USER", "2"))
+    # Outbound Telegram pacing (messages per second) and retries
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+    TELEGRAM_PER_CHAT_RATE: float = float(os.getenv("TELEGRAM_PER_CHAT_RATE", "1"))
+    TELEGRAM_PER_CHAT_BURST: float = float(os.getenv("TELEGRAM_PER_CHAT_BURST", "3"))
+    TELEGRAM_MAX_RETRIES: int = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+    # Update deduplication: "memory" (single worker), "sqlite" (shared file) or "redis"
+    DEDUP_BACKEND: str = os.getenv("DEDUP_BACKEND", "memory")
+    DEDUP_TTL: float = float(os.getenv("DEDUP_TTL", "300"))
+    DEDUP_SQLITE_PATH: str = os.getenv("DEDUP_SQLITE_PATH", os.path.join(_DATA_DIR, "dedup.sqlite3"))
+    DEDUP_REDIS_URL: str = os.getenv("DEDUP_REDIS_URL", "redis://localhost:6379/0")
 
 settings = Settings()
@@ -0,0 +1,194 @@
+("""Deduplication of incoming Telegram updates.
+
+Telegram redelivers updates it considers unacknowledged, and message ids are
+only unique within a chat, so updates are keyed on ``update_id`` (falling
+back to ``chat_id:message_id``). ``check_and_set`` is a single O(1) atomic
+step on every backend:
+
+- ``memory``: per-process TTL cache (single worker only).
+- ``sqlite``: a shared file; all workers/processes on one host see the same keys.
+- ``redis``: any server speaking the Redis protocol (``SET key 1 NX EX ttl``),
+  for multiple hosts.
+""")
+from abc import ABC, abstractmethod
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+import cachetools
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger("messaging.dedup")
+
+
+def dedup_key(parsed: Dict[str, Any]) -> Optional[str]:
+	raw = parsed.get("raw") or {}
+	if raw.get("update_id") is not None:
+		return f"u:{raw['update_id']}"
+	if parsed.get("chat_id") is not None and parsed.get("message_id") is not None:
+		return f"m:{parsed['chat_id']}:{parsed['message_id']}"
+	return None
+
+
+class DedupStore(ABC):
+	@abstractmethod
+	async def check_and_set(self, key: str) -> bool:
+		"""Mark ``key`` as seen. Returns True if it was not seen within the TTL."""
+
+	@abstractmethod
+	async def discard(self, key: str) -> None:
+		"""Forget ``key`` so a redelivery is processed again."""
+
+	async def close(self) -> None:
+		pass
+
+
+class MemoryDedupStore(DedupStore):
+	def __init__(self, ttl: float, maxsize: int = 100000):
+		self._seen = cachetools.TTLCache(maxsize=maxsize, ttl=ttl)
+
+	async def check_and_set(self, key: str) -> bool:
+		if key in self._seen:
+			return False
+		self._seen[key] = True
+		return True
+
+	async def discard(self, key: str) -> None:
+		self._seen.pop(key, None)
+
+
+class SQLiteDedupStore(DedupStore):
+	# expired rows are purged every this many inserts
+	PURGE_EVERY = 1000
+
+	def __init__(self, path: str, ttl: float):
+		self.path = path
+		self.ttl = ttl
+		self._conn: Optional[sqlite3.Connection] = None
+		self._inserts = 0
+
+	def _connect(self) -> sqlite3.Connection:
+		if self._conn is None:
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+			self._conn = conn
+		return self._conn
+
+	async def check_and_set(self, key: str) -> bool:
+		conn = self._connect()
+		now = time.time()
+		# inserts a new key, or revives an expired one; a live key is left alone
+		cur = conn.execute(
+			"INSERT INTO seen (key, expires_at) VALUES (?, ?) "
+			"ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at WHERE seen.expires_at < ?",
+			(key, now + self.ttl, now),
+		)
+		fresh = cur.rowcount == 1
+		if fresh:
+			self._inserts += 1
+			if self._inserts % self.PURGE_EVERY == 0:
+				conn.execute("DELETE FROM seen WHERE expires_at < ?", (now,))
+		return fresh
+
+	async def discard(self, key: str) -> None:
+		self._connect().execute("DELETE FROM seen WHERE key = ?", (key,))
+
+	async def close(self) -> None:
+		if self._conn is not None:
+			self._conn.close()
+			self._conn = None
+
+
+class RedisDedupStore(DedupStore):
+	"""Minimal Redis-protocol (RESP) client; needs only SET NX EX and DEL."""
+
+	def __init__(self, url: str, ttl: float):
+		parsed = urlparse(url)
+		self.host = parsed.hostname or "localhost"
+		self.port = parsed.port or 6379
+		self.password = parsed.password
+		self.db = int((parsed.path or "/0").lstrip("/") or 0)
+		self.ttl = max(1, int(ttl))
+		self._reader: Optional[asyncio.StreamReader] = None
+		self._writer: Optional[asyncio.StreamWriter] = None
+		self._lock = asyncio.Lock()
+
+	@staticmethod
+	def _encode(*parts: Any) -> bytes:
+		out = [f"*{len(parts)}\r\n".encode()]
+		for part in parts:
+			data = str(part).encode("utf-8")
+			out.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+		return b"".join(out)
+
+	async def _read_reply(self) -> Any:
+		line = await self._reader.readline()
+		if not line:
+			raise ConnectionError("redis connection closed")
+		kind, rest = line[:1], line[1:-2].decode("utf-8")
+		if kind == b"+":
+			return rest
+		if kind == b"-":
+			raise RuntimeError(f"redis error: {rest}")
+		if kind == b":":
+			return int(rest)
+		if kind == b"$":
+			size = int(rest)
+			if size < 0:
+				return None
+			data = await self._reader.readexactly(size + 2)
+			return data[:-2].decode("utf-8")
+		raise RuntimeError(f"unexpected redis reply: {line!r}")
+
+	async def _command(self, *parts: Any) -> Any:
+		async with self._lock:
+			for attempt in (1, 2):
+				try:
+					if self._writer is None:
+						self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+						if self.password:
+							self._writer.write(self._encode("AUTH", self.password))
+							await self._read_reply()
+						if self.db:
+							self._writer.write(self._encode("SELECT", self.db))
+							await self._read_reply()
+					self._writer.write(self._encode(*parts))
+					await self._writer.drain()
+					return await self._read_reply()
+				except (ConnectionError, OSError, asyncio.IncompleteReadError):
+					# reconnect once on a dropped connection
+					await self._reset()
+					if attempt == 2:
+						raise
+
+	async def _reset(self) -> None:
+		if self._writer is not None:
+			self._writer.close()
+		self._reader = self._writer = None
+
+	async def check_and_set(self, key: str) -> bool:
+		return await self._command("SET", f"dedup:{key}", 1, "NX", "EX", self.ttl) == "OK"
+
+	async def discard(self, key: str) -> None:
+		await self._command("DEL", f"dedup:{key}")
+
+	async def close(self) -> None:
+		await self._reset()
+
+
+def create_dedup_store() -> DedupStore:
+	backend = settings.DEDUP_BACKEND.lower()
+	if backend == "sqlite":
+		return SQLiteDedupStore(settings.DEDUP_SQLITE_PATH, settings.DEDUP_TTL)
+	if backend == "redis":
+		return RedisDedupStore(settings.DEDUP_REDIS_URL, settings.DEDUP_TTL)
+	return MemoryDedupStore(settings.DEDUP_TTL)
+
+
+dedup_store = create_dedup_store()
@@ -0,0 +1,127 @@
+"""Shared ingestion pipeline for incoming Telegram updates.
+
+The webhook and the getUpdates poller feed updates through the same steps:
+``parse_update`` -> dedup -> enqueue on the durable job queue. Each update
+gets its own correlation id. ``ingest_batch`` commits a whole batch with a
+single SQLite transaction.
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.logger import get_logger
+from app import tracing, utils
+from app.dedup import dedup_store, dedup_key
+from app.job_queue import job_queue, QueueFullError
+
+logger = get_logger("messaging.ingest")
+
+# ingest_update outcomes
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+IGNORED = "ignored"
+
+
+async def _admit(data: Dict[str, Any], source: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+	"""Parse and deduplicate one update: (outcome, job), where job holds the
+	dedup key and payload of an accepted update, ready for ``_enqueue``."""
+	utils.new_correlation_id()
+	with tracing.span("update_parse", source=source):
+		parsed = utils.parse_update(data)
+	chat_id = parsed.get("chat_id")
+	telegram_id = parsed.get("telegram_id")
+	text = parsed.get("text")
+	message_id = parsed.get("message_id")
+
+	if not telegram_id or not chat_id or not message_id:
+		# nothing to do
+		return IGNORED, None
+
+	# Deduplication check, shared across workers depending on DEDUP_BACKEND
+	key = dedup_key(parsed)
+	try:
+		fresh = await dedup_store.check_and_set(key)
+	except Exception as exc:
+		# fail open: a rare double run beats dropping the message
+		logger.warning("dedup store unavailable", extra={"error": str(exc)})
+		fresh = True
+	if not fresh:
+		logger.info("duplicate update ignored", extra={"dedup_key": key, "source": source})
+		return DUPLICATE, None
+
+	return ACCEPTED, {
+		"dedup_key": key,
+		"payload": {
+			"user_id": str(telegram_id),
+			"chat_id": chat_id,
+			"text": text,
+			"correlation_id": utils.get_correlation_id(),
+			"enqueued_at": time.time(),
+		},
+	}
+
+
+def _enqueue(job: Dict[str, Any]) -> None:
+	"""Persist an admitted update; workers pick it up from the job queue. Raises QueueFullError."""
+	# a short debounce lets quick follow-up messages join this one
+	job_queue.enqueue(
+		"message",
+		job["payload"],
+		delay=settings.COALESCE_WINDOW_MS / 1000,
+		partition_key=str(job["payload"]["chat_id"]),
+		max_wait=settings.COALESCE_MAX_WAIT_MS / 1000,
+	)
+
+
+async def _release(job: Dict[str, Any]) -> None:
+	# let Telegram redeliver this update later instead of dropping it
+	await dedup_store.discard(job["dedup_key"])
+
+
+async def ingest_update(data: Dict[str, Any], source: str = "webhook") -> str:
+	"""Parse, deduplicate and enqueue one update.
+
+	Raises QueueFullError when the job queue is saturated; the update's dedup
+	key is released first so a redelivery is processed again.
+	"""
+	outcome, job = await _admit(data, source)
+	if outcome != ACCEPTED:
+		return outcome
+	try:
+		_enqueue(job)
+	except QueueFullError as exc:
+		await _release(job)
+		logger.warning("job queue full, rejecting update", extra={"error": str(exc), "source": source})
+		raise
+	return ACCEPTED
+
+
+async def ingest_batch(updates: List[Dict[str, Any]], source: str = "polling") -> int:
+	"""Ingest updates in order and return how many were handled.
+
+	Stops at the first update the saturated job queue rejects, so the caller
+	can fetch it again later; updates before it are committed.
+
+	All dedup checks (network round trips with the redis backend) happen
+	first. The enqueues then run in one SQLite transaction with no await
+	inside, so queue workers sharing the connection never run their
+	statements inside it and the write lock is held only briefly.
+	"""
+	admitted = [await _admit(update, source) for update in updates]
+	handled = 0
+	rejected = None
+	with job_queue.transaction():
+		for outcome, job in admitted:
+			if outcome == ACCEPTED:
+				try:
+					_enqueue(job)
+				except QueueFullError as exc:
+					rejected = exc
+					break
+			handled += 1
+	if rejected is not None:
+		for outcome, job in admitted[handled:]:
+			if outcome == ACCEPTED:
+				await _release(job)
+		rest = len(updates) - handled
+		logger.warning("job queue full, rejecting updates", extra={"error": str(rejected), "source": source, "rejected": rest})
+	return handled
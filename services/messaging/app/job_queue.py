@@ -0,0 +1,309 @@
+("""Durable local job queue with an async worker pool.
+
+Jobs are rows in a SQLite file, so accepted work survives restarts and
+redeploys without an external broker. A fixed number of worker tasks claim
+ready jobs in FIFO order. Jobs that share a partition key (the chat id for
+messages) run one at a time and in order: a partition's next job is only
+claimed once the previous one has finished. A job kind registered with a
+``merge`` function can coalesce: a new job folds into the partition's job
+that is still queued and has never run (a job waiting out a retry backoff
+is left alone) instead of adding another row. Failed jobs are retried with exponential backoff
+and jitter, and kept with status 'failed' once they run out of attempts.
+``enqueue`` refuses new work once JOB_MAX_QUEUED jobs are waiting, which lets
+the webhook push back on Telegram instead of piling up tasks in memory.
+
+Several processes may share one queue file (``uvicorn --workers N``). A job
+is claimed with a single conditional UPDATE, so only one process gets it, and
+the claim records the owning process and a lease it renews every few seconds
+while the job runs. Delivery is at-least-once: a running job whose lease has
+expired (its process died or hung) is queued again by whichever process
+notices first.
+""")
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger("messaging.job_queue")
+
+# handler(payload, attempt, final) -> None; raising schedules a retry unless final
+JobHandler = Callable[[Dict[str, Any], int, bool], Awaitable[None]]
+# merge(queued_payload, new_payload) -> merged payload, or None to keep them separate
+JobMerger = Callable[[Dict[str, Any], Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class QueueFullError(Exception):
+	pass
+
+
+class JobQueue:
+	def __init__(self, path: str, workers: int, max_queued: int, max_attempts: int, retry_backoff: float, poll_interval: float = 1.0,
+				 lease: float = 60.0):
+		self.path = path
+		self.workers = max(1, workers)
+		self.max_queued = max_queued
+		self.max_attempts = max(1, max_attempts)
+		self.retry_backoff = retry_backoff
+		self.poll_interval = poll_interval
+		self.lease = max(1.0, lease)
+		# identifies this process's claims; a fresh one per instance, so a restart never adopts old ones
+		self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+		self._handlers: Dict[str, JobHandler] = {}
+		self._mergers: Dict[str, JobMerger] = {}
+		self._conn: Optional[sqlite3.Connection] = None
+		self._tasks = []
+		self._heartbeat: Optional[asyncio.Task] = None
+		self._wakeup: Optional[asyncio.Event] = None
+		self._running = 0
+		self.counters = {"enqueued": 0, "coalesced": 0, "completed": 0, "retried": 0, "failed": 0, "rejected": 0,
+						 "recovered": 0, "lost": 0}
+
+	# -- storage -----------------------------------------------------------
+	# All statements run on the event loop thread. With WAL and
+	# synchronous=NORMAL a commit doesn't fsync, so they take microseconds.
+
+	def _connect(self) -> sqlite3.Connection:
+		if self._conn is None:
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			conn = sqlite3.connect(self.path, isolation_level=None)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			conn.execute(
+				"CREATE TABLE IF NOT EXISTS jobs ("
+				"id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+				"status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+				"available_at REAL NOT NULL, created_at REAL NOT NULL, last_error TEXT)"
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, available_at, id)")
+			columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+			if "partition_key" not in columns:
+				conn.execute("ALTER TABLE jobs ADD COLUMN partition_key TEXT")
+			if "owner" not in columns:
+				conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+				conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+			conn.execute("CREATE INDEX IF NOT EXISTS jobs_partition ON jobs(partition_key, status, id)")
+			self._conn = conn
+		return self._conn
+
+	def register(self, kind: str, handler: JobHandler, merge: Optional[JobMerger] = None) -> None:
+		self._handlers[kind] = handler
+		if merge is not None:
+			self._mergers[kind] = merge
+
+	def _coalesce(self, kind: str, payload: Dict[str, Any], partition_key: str, delay: float, max_wait: float) -> Optional[int]:
+		"""Fold ``payload`` into the partition's queued job of the same kind, if the merger agrees.
+
+		Only jobs that have not been attempted yet qualify: merging into one
+		that is waiting to be retried would re-run part of a failed attempt
+		and push its backoff around.
+		"""
+		conn = self._connect()
+		row = conn.execute(
+			"SELECT id, payload, created_at, available_at FROM jobs "
+			"WHERE partition_key = ? AND kind = ? AND status = 'queued' AND attempts = 0 ORDER BY id DESC LIMIT 1",
+			(partition_key, kind),
+		).fetchone()
+		if row is None:
+			return None
+		merged = self._mergers[kind](json.loads(row[1]), payload)
+		if merged is None:
+			return None
+		# slide the debounce window, but never past created_at + max_wait
+		available_at = max(row[3], min(time.time() + delay, row[2] + max_wait))
+		cur = conn.execute(
+			"UPDATE jobs SET payload = ?, available_at = ? WHERE id = ? AND status = 'queued' AND attempts = 0",
+			(json.dumps(merged, ensure_ascii=False), available_at, row[0]),
+		)
+		if cur.rowcount == 0:
+			# another process claimed it in the meantime
+			return None
+		self.counters["coalesced"] += 1
+		return row[0]
+
+	def enqueue(self, kind: str, payload: Dict[str, Any], delay: float = 0.0, partition_key: Optional[str] = None, max_wait: Optional[float] = None) -> int:
+		"""Persist a job and wake a worker. Raises QueueFullError when saturated.
+
+		For kinds registered with a merger, a job that can be merged into the
+		partition's queued job is folded into it (its id is returned); ``delay``
+		then acts as a debounce window bounded by ``max_wait``.
+		"""
+		conn = self._connect()
+		if partition_key is not None and kind in self._mergers:
+			job_id = self._coalesce(kind, payload, partition_key, delay, delay if max_wait is None else max_wait)
+			if job_id is not None:
+				return job_id
+		queued = self._count_queued()
+		if queued >= self.max_queued:
+			self.counters["rejected"] += 1
+			raise QueueFullError(f"{queued} jobs queued (limit {self.max_queued})")
+		now = time.time()
+		cur = conn.execute(
+			"INSERT INTO jobs (kind, payload, available_at, created_at, partition_key) VALUES (?, ?, ?, ?, ?)",
+			(kind, json.dumps(payload, ensure_ascii=False), now + delay, now, partition_key),
+		)
+		self.counters["enqueued"] += 1
+		if self._wakeup is not None:
+			self._wakeup.set()
+		return cur.lastrowid
+
+	@contextmanager
+	def transaction(self):
+		"""Group several enqueues into one SQLite transaction, i.e. a single commit.
+
+		Whatever was enqueued is committed even if the block raises (e.g.
+		QueueFullError part-way through a batch), keeping counters in step.
+		"""
+		conn = self._connect()
+		conn.execute("BEGIN")
+		try:
+			yield
+		finally:
+			conn.execute("COMMIT")
+
+	def _count_queued(self) -> int:
+		# counted in the file, not per process: every process sharing it enqueues and claims
+		return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+	def _claim(self) -> Optional[sqlite3.Row]:
+		"""Atomically claim the next ready job for this process; returns (id, kind, payload, attempts)."""
+		now = time.time()
+		# one statement, so picking the job and marking it running can't interleave with another
+		# process; only the oldest job of a partition is eligible, and only while none of its jobs runs
+		return self._connect().execute(
+			"UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_until = ? "
+			"WHERE status = 'queued' AND id = ("
+			"SELECT id FROM jobs AS j WHERE status = 'queued' AND available_at <= ? "
+			"AND (partition_key IS NULL OR NOT EXISTS ("
+			"SELECT 1 FROM jobs AS o WHERE o.partition_key = j.partition_key "
+			"AND (o.status = 'running' OR (o.status = 'queued' AND o.id < j.id)))) "
+			"ORDER BY available_at, id LIMIT 1) "
+			"RETURNING id, kind, payload, attempts",
+			(self.owner, now + self.lease, now),
+		).fetchone()
+
+	def _complete(self, job_id: int) -> None:
+		cur = self._connect().execute("DELETE FROM jobs WHERE id = ? AND owner = ?", (job_id, self.owner))
+		self._count_outcome(cur, "completed", job_id)
+
+	def _fail(self, job_id: int, attempts: int, error: str) -> None:
+		conn = self._connect()
+		if attempts >= self.max_attempts:
+			cur = conn.execute(
+				"UPDATE jobs SET status = 'failed', owner = NULL, last_error = ? WHERE id = ? AND owner = ?",
+				(error, job_id, self.owner),
+			)
+			self._count_outcome(cur, "failed", job_id)
+			return
+		delay = self.retry_backoff * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+		cur = conn.execute(
+			"UPDATE jobs SET status = 'queued', owner = NULL, available_at = ?, last_error = ? WHERE id = ? AND owner = ?",
+			(time.time() + delay, error, job_id, self.owner),
+		)
+		self._count_outcome(cur, "retried", job_id)
+
+	def _count_outcome(self, cur: sqlite3.Cursor, counter: str, job_id: int) -> None:
+		if cur.rowcount:
+			self.counters[counter] += 1
+		else:
+			# the lease ran out and another process took the job over; its outcome is theirs
+			self.counters["lost"] += 1
+			logger.warning("job lease lost", extra={"job_id": job_id, "owner": self.owner})
+
+	def _renew_leases(self) -> None:
+		now = time.time()
+		conn = self._connect()
+		conn.execute("UPDATE jobs SET lease_until = ? WHERE status = 'running' AND owner = ?", (now + self.lease, self.owner))
+		# jobs of processes that died or hung (rows from before leases existed have none)
+		cur = conn.execute(
+			"UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+			(now,),
+		)
+		if cur.rowcount:
+			self.counters["recovered"] += cur.rowcount
+			logger.info("requeued jobs with expired leases", extra={"jobs": cur.rowcount})
+			self._wakeup.set()
+
+	async def _heartbeat_loop(self) -> None:
+		while True:
+			await asyncio.sleep(self.lease / 3)
+			try:
+				self._renew_leases()
+			except sqlite3.Error as exc:
+				logger.warning("job lease renewal failed", extra={"error": str(exc)})
+
+	# -- workers -----------------------------------------------------------
+
+	async def start(self) -> None:
+		self._connect()
+		self._wakeup = asyncio.Event()
+		# jobs interrupted by a stopped process run again once their lease runs out;
+		# jobs other live processes are running keep renewing theirs and are left alone
+		self._renew_leases()
+		self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+		self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+		logger.info("job queue started", extra={"workers": self.workers, "queued": self._count_queued(), "owner": self.owner})
+
+	async def stop(self) -> None:
+		# a cancelled handler must cancel whatever it started (the scheduler's run()
+		# does), so nothing outlives the connection closed below
+		tasks = self._tasks + ([self._heartbeat] if self._heartbeat else [])
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		self._tasks = []
+		self._heartbeat = None
+		if self._conn is not None:
+			# the cancelled jobs are ours alone, so hand them back without waiting for the lease
+			self._conn.execute("UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' AND owner = ?", (self.owner,))
+			self._conn.close()
+			self._conn = None
+
+	async def _worker(self, worker_id: int) -> None:
+		while True:
+			row = self._claim()
+			if row is None:
+				self._wakeup.clear()
+				try:
+					await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+				except asyncio.TimeoutError:
+					pass
+				continue
+
+			job_id, kind, payload, attempts = row[0], row[1], json.loads(row[2]), row[3]
+			handler = self._handlers.get(kind)
+			self._running += 1
+			try:
+				if handler is None:
+					raise RuntimeError(f"no handler registered for job kind {kind!r}")
+				await handler(payload, attempts, attempts >= self.max_attempts)
+			except asyncio.CancelledError:
+				# left as 'running'; requeued once the lease expires
+				raise
+			except Exception as exc:
+				logger.exception("job failed", extra={"job_id": job_id, "kind": kind, "attempt": attempts, "error": str(exc)})
+				self._fail(job_id, attempts, str(exc))
+			else:
+				self._complete(job_id)
+			finally:
+				self._running -= 1
+
+	def stats(self) -> Dict[str, Any]:
+		return {"workers": self.workers, "queued": self._count_queued(), "running": self._running, **self.counters}
+
+
+job_queue = JobQueue(
+	path=settings.JOB_QUEUE_PATH,
+	workers=settings.JOB_WORKERS,
+	max_queued=settings.JOB_MAX_QUEUED,
+	max_attempts=settings.JOB_MAX_ATTEMPTS,
+	retry_backoff=settings.JOB_RETRY_BACKOFF,
+	lease=settings.JOB_LEASE_SECONDS,
+)
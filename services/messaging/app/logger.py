@@ -1,13 +1,42 @@
-("""Simple logger factory that returns preconfigured logging.Logger.
+("""Logger factory that returns preconfigured logging.Logger.
 
-It reads LOG_LEVEL from config and emits a compact JSON-like message to console.
+It reads LOG_LEVEL from config and emits one JSON object per record to the
+console. Records are only captured on the calling thread (message, correlation
+id, ``extra=`` fields); serialization and the blocking write happen on a
+single listener thread behind a bounded queue, so a slow stdout never stalls
+the event loop. When the queue is full, records are dropped and counted.
+
+Structured fields are passed with the standard ``extra=`` argument::
+
+	logger.warning("telegram rate limited", extra={"chat_id": chat_id, "retry_after": 3})
+
+INFO and DEBUG records are kept with probability LOG_SAMPLE_RATE; pass
+``extra={"sample": False}`` to always keep one.
 """)
+import atexit
 import logging
-import json
-from typing import Any
+import logging.handlers
+import queue
+import random
+import sys
+from typing import Any, Dict
 from app.config import settings
 from app import utils
 
+try:  # optional, much faster than the stdlib encoder
+	import orjson
+
+	def _dumps(payload: Dict[str, Any]) -> str:
+		return orjson.dumps(payload, default=str).decode("utf-8")
+except ImportError:  # pragma: no cover - depends on the environment
+	import json
+
+	def _dumps(payload: Dict[str, Any]) -> str:
+		return json.dumps(payload, default=str, ensure_ascii=False)
+
+# attributes every LogRecord has; anything else on a record came from extra=
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "correlation_id", "sample"}
+
 
 class SimpleJSONFormatter(logging.Formatter):
 	def format(self, record: logging.LogRecord) -> str:
@@ -16,14 +45,86 @@ class SimpleJSONFormatter(logging.Formatter):
 			"name": record.name,
 			"message": record.getMessage(),
 		}
-		# include correlation id if present in record
+		# correlation id is captured when the record is queued
 		cid = getattr(record, "correlation_id", None) or utils.get_correlation_id()
 		if cid:
 			payload["correlation_id"] = cid
-		# include extra fields if any
-		if record.args and isinstance(record.args, dict):
-			payload.update(record.args)
-		return json.dumps(payload, default=str)
+		# include extra= fields if any
+		for key, value in record.__dict__.items():
+			if key not in _RESERVED and not key.startswith("_"):
+				payload[key] = value
+		if record.exc_info:
+			payload["exc_info"] = self.formatException(record.exc_info)
+		elif record.exc_text:
+			payload["exc_info"] = record.exc_text
+		return _dumps(payload)
+
+
+class _SamplingFilter(logging.Filter):
+	def __init__(self, rate: float):
+		super().__init__()
+		self.rate = rate
+		self.sampled_out = 0
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		if self.rate >= 1 or record.levelno > logging.INFO or getattr(record, "sample", True) is False:
+			return True
+		if random.random() < self.rate:
+			return True
+		self.sampled_out += 1
+		return False
+
+
+class _CaptureQueueHandler(logging.handlers.QueueHandler):
+	"""Queues records without formatting them; drops records when the queue is full."""
+
+	def __init__(self, log_queue: queue.Queue):
+		super().__init__(log_queue)
+		self.dropped = 0
+
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		# resolve everything that depends on the calling context or on
+		# mutable arguments now; the listener thread does the rest
+		record.correlation_id = utils.get_correlation_id()
+		record.msg = record.getMessage()
+		record.args = None
+		if record.exc_info and not record.exc_text:
+			record.exc_text = logging.Formatter().formatException(record.exc_info)
+		record.exc_info = None
+		return record
+
+	def enqueue(self, record: logging.LogRecord) -> None:
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped += 1
+
+
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max(1, settings.LOG_QUEUE_SIZE))
+_stream_handler = logging.StreamHandler(sys.stderr)
+_stream_handler.setFormatter(SimpleJSONFormatter())
+_listener = logging.handlers.QueueListener(_queue, _stream_handler, respect_handler_level=False)
+_sampler = _SamplingFilter(settings.LOG_SAMPLE_RATE)
+_queue_handler = _CaptureQueueHandler(_queue)
+_queue_handler.addFilter(_sampler)
+_listener.start()
+
+
+def stop_logging() -> None:
+	"""Flush queued records and stop the listener thread (safe to call twice)."""
+	if _listener._thread is not None:
+		_listener.stop()
+
+
+atexit.register(stop_logging)
+
+
+def logging_stats() -> Dict[str, int]:
+	return {
+		"queued": _queue.qsize(),
+		"dropped": _queue_handler.dropped,
+		"sampled_out": _sampler.sampled_out,
+	}
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -31,9 +132,6 @@ def get_logger(name: str) -> logging.Logger:
 	logger = logging.getLogger(name)
 	logger.setLevel(level)
 	if not logger.handlers:
-		ch = logging.StreamHandler()
-		ch.setLevel(level)
-		ch.setFormatter(SimpleJSONFormatter())
-		logger.addHandler(ch)
+		logger.addHandler(_queue_handler)
+		logger.propagate = False
 	return logger
-
@@ -1,58 +1,59 @@
-from fastapi import FastAPI, Header, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from app.config import settings
-from app.logger import get_logger
-from app import utils, http_client
-from app.background_tasks import process_message_flow
-import time
-import cachetools
+from app.logger import get_logger, logging_stats, stop_logging
+from app import http_client, tracing
+from app.background_tasks import run_message_job, merge_message_jobs
+from app.job_queue import job_queue, QueueFullError
+from app.scheduler import scheduler
+from app.dedup import dedup_store
+from app.ingest import ingest_update
+from app.poller import update_poller
 
 logger = get_logger("messaging.main")
 
 app = FastAPI(title="Messaging Service")
 
-# Simple in-memory cache for message deduplication
-processed_messages = cachetools.TTLCache(maxsize=10000, ttl=300)
-
 @app.on_event("startup")
 async def startup():
 	# init shared httpx client
 	http_client.init_httpx_client(timeout=settings.REQUEST_TIMEOUT)
+	job_queue.register("message", run_message_job, merge=merge_message_jobs)
+	await job_queue.start()
+	if settings.INGESTION_MODE == "polling":
+		await update_poller.start()
 
 @app.on_event("shutdown")
 async def shutdown():
+	await update_poller.stop()
+	await job_queue.stop()
+	await scheduler.stop()
+	await dedup_store.close()
 	await http_client.close_httpx_client()
+	tracing.shutdown()
+	stop_logging()
 
 @app.get("/health")
 async def health():
 	return {"ok": True}
 
+@app.get("/stats")
+async def stats():
+	result = {"job_queue": job_queue.stats(), "scheduler": scheduler.stats(), "logging": logging_stats()}
+	if settings.INGESTION_MODE == "polling":
+		result["poller"] = update_poller.stats()
+	return result
+
 @app.post("/webhook/telegram")
-async def telegram_webhook(request: Request, background_tasks: BackgroundTasks, x_telegram_bot_api_secret_token: str | None = Header(None)):
+async def telegram_webhook(request: Request, x_telegram_bot_api_secret_token: str | None = Header(None)):
 	# optional security: validate secret token
 	if settings.WEBHOOK_SECRET_TOKEN and settings.WEBHOOK_SECRET_TOKEN != x_telegram_bot_api_secret_token:
 		raise HTTPException(status_code=403, detail="Invalid secret token")
 
 	data = await request.json()
-	# set correlation id for logs
-	utils.new_correlation_id()
-	parsed = utils.parse_update(data)
-	chat_id = parsed.get("chat_id")
-	telegram_id = parsed.get("telegram_id")
-	text = parsed.get("text")
-	message_id = parsed.get("message_id")
-
-	if not telegram_id or not chat_id or not message_id:
-		# nothing to do
-		return {"ok": True}
-
-	# Deduplication check
-	if message_id in processed_messages:
-		logger.info(f"Duplicate message_id received: {message_id}. Ignoring.")
-		return {"ok": True}
-	
-	processed_messages[message_id] = time.time()
-
-	# schedule background processing
-	background_tasks.add_task(process_message_flow, str(telegram_id), chat_id, text)
+	try:
+		# sets the correlation id used for logs, spans and the agent call
+		await ingest_update(data, source="webhook")
+	except QueueFullError:
+		raise HTTPException(status_code=503, detail="Busy, retry later")
 
 	return {"ok": True}
@@ -1,71 +1,474 @@
-"""Lightweight Markdown -> plain text converter for Telegram output.
+"""Lightweight Markdown renderer for Telegram output.
 
-This avoids adding heavy dependencies and handles common Markdown features:
-- headings, bold/italic, inline/code blocks, links/images, blockquotes,
-- basic strikethrough, and removes most formatting tokens (**, __, ##, `, ```).
+Agent replies are Markdown. They are rendered in a single pass, with no heavy
+dependencies, to one of these formats:
+
+- ``text``: plain text with the formatting tokens removed (``md_to_text``).
+- ``html``: Telegram's HTML parse mode.
+- ``markdownv2``: Telegram's MarkdownV2 parse mode.
+
+Lines are scanned once for block structure: headings, lists, blockquotes,
+fenced code, tables and rules. A left-to-right tokenizer then handles the
+inline spans within each line: bold, italic, strikethrough, code, links and
+images. It uses a delimiter stack, so unmatched markers come out literally
+instead of breaking the output. Every piece of text is escaped for the target
+format.
+
+``render_chunks`` only splits between lines or code-block lines. A tag or
+entity is therefore never cut in half by Telegram's message-size limit.
 """
 from __future__ import annotations
+import html
 import re
+from typing import List, Tuple
 
+FORMATS = ("text", "html", "markdownv2")
+# Telegram ``parse_mode`` for each output format
+PARSE_MODES = {"text": None, "html": "HTML", "markdownv2": "MarkdownV2"}
 
-_RE_CODE_FENCE = re.compile(r"```[\s\S]*?```", re.MULTILINE)
-_RE_INLINE_CODE = re.compile(r"`([^`]*)`")
-_RE_BOLD = re.compile(r"\*\*(.*?)\*\*|__(.*?)__", re.DOTALL)
-_RE_ITALIC = re.compile(r"(?<!\*)\*(?!\*)([^\n*]+?)\*(?!\*)|_([^\n_]+?)_", re.DOTALL)
-_RE_H = re.compile(r"^\s{0,3}#+\s*", re.MULTILINE)
-_RE_LINK = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
-_RE_IMG = re.compile(r"!\[([^\]]*)\]\(([^)]+)\)")
-_RE_BLOCKQUOTE = re.compile(r"^\s*>\s?", re.MULTILINE)
-_RE_STRIKE = re.compile(r"~~(.*?)~~", re.DOTALL)
+_RE_FENCE = re.compile(r"^\s{0,3}(`{3,}|~{3,})\s*([\w+#-]*)")
+_RE_HEADING = re.compile(r"^\s{0,3}#{1,6}(?:\s+|$)(.*?)(?:\s+#+)?\s*$")
+_RE_HR = re.compile(r"^\s{0,3}([-*_])(?:\s*\1){2,}\s*$")
+_RE_QUOTE = re.compile(r"^\s*>\s?(.*)$")
+_RE_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_RE_ORDERED = re.compile(r"^(\s*)(\d+)[.)]\s+(.*)$")
+_RE_TABLE_SEP = re.compile(r"^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)+\|?\s*$")
+_RE_TABLE_CELL_SPLIT = re.compile(r"(?<!\\)\|")
 
+# escapes, code spans, emphasis markers and link/image openers
+_RE_INLINE = re.compile(r"\\([!-/:-@\[-`{-~])|(`+)|(\*\*\*|___|\*\*|__|~~|\*|_)|(!?\[)")
+# url may contain one level of balanced parentheses, e.g. wiki links
+_RE_LINK_TAIL = re.compile(r"\[([^\]\n]{0,500})\]\(\s*<?((?:[^()\s<>]|\([^()\s]*\)){1,2048})>?(?:\s+\"[^\"\n]*\")?\s*\)")
+_RE_MDV2_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+_RE_MDV2_CODE = re.compile(r"([`\\])")
+_RE_MDV2_URL = re.compile(r"([)\\])")
+_RE_HTML_TAG = re.compile(r"<[^>]*>")
+_RE_MDV2_MARKUP = re.compile(r"\\(.)|[*_~`]")
 
-def md_to_text(md: str) -> str:
+_STYLE_OF = {"***": "bi", "___": "bi", "**": "b", "__": "b", "*": "i", "_": "i", "~~": "s"}
+_STYLE_TAGS = {
+    "text": {"b": ("", ""), "i": ("", ""), "s": ("", "")},
+    "html": {"b": ("<b>", "</b>"), "i": ("<i>", "</i>"), "s": ("<s>", "</s>")},
+    "markdownv2": {"b": ("*", "*"), "i": ("_", "_"), "s": ("~", "~")},
+}
+for _tags in _STYLE_TAGS.values():
+    # ***x*** is bold and italic at once
+    _tags["bi"] = (_tags["b"][0] + _tags["i"][0], _tags["i"][1] + _tags["b"][1])
+_RULE = "──────────"
+_BACKSLASH_ESCAPE = r"\\\1"
+
+
+def _escape(text: str, fmt: str) -> str:
+    if fmt == "html":
+        return html.escape(text, quote=False)
+    if fmt == "markdownv2":
+        return _RE_MDV2_SPECIAL.sub(r"\\\1", text)
+    return text
+
+
+def _escape_code(text: str, fmt: str) -> str:
+    if fmt == "html":
+        return html.escape(text, quote=False)
+    if fmt == "markdownv2":
+        return _RE_MDV2_CODE.sub(r"\\\1", text)
+    return text
+
+
+# ---------------------------------------------------------------- inline ---
+
+def _tokenize(line: str) -> List[list]:
+    """Split one line into [kind, value(, extra)] tokens in a single scan.
+
+    Kinds: text, open, close (value is a style: b/i/s, or bi for ***), code, link and image
+    (value is the label's tokens, extra the url).
+    """
+    tokens: List[list] = []
+    stack: List[Tuple[str, int]] = []  # open emphasis: (marker, token index)
+    unclosed_ticks = set()  # backtick runs known to have no closer further on
+    label_end = line.find("](")  # next possible end of a link label
+    pos, n = 0, len(line)
+
+    def text(value: str):
+        # runs of text are collected as parts and joined once at the end
+        if tokens and tokens[-1][0] == "text":
+            tokens[-1][1].append(value)
+        else:
+            tokens.append(["text", [value]])
+
+    while pos < n:
+        m = _RE_INLINE.search(line, pos)
+        if m is None:
+            text(line[pos:])
+            break
+        start, end = m.span()
+        if start > pos:
+            text(line[pos:start])
+        pos = end
+        escaped, ticks, marker, bracket = m.groups()
+
+        if escaped is not None:
+            text(escaped)
+        elif ticks is not None:
+            close = -1 if len(ticks) in unclosed_ticks else line.find(ticks, end)
+            if close < 0:
+                unclosed_ticks.add(len(ticks))
+                text(ticks)
+            else:
+                code = line[end:close]
+                if len(code) > 1 and code[0] == " " and code[-1] == " ":
+                    code = code[1:-1]
+                tokens.append(["code", code])
+                pos = close + len(ticks)
+        elif marker is not None:
+            before = line[start - 1] if start else " "
+            after = line[end] if end < n else " "
+            can_open = not after.isspace()
+            can_close = not before.isspace()
+            if marker[0] == "_":
+                # snake_case and similar identifiers are not emphasis
+                can_open = can_open and not before.isalnum()
+                can_close = can_close and not after.isalnum()
+            closed = False
+            while can_close and marker:
+                # a triple marker pairs with a single or double one of the same character
+                depth = next((i for i in range(len(stack) - 1, -1, -1) if stack[i][0][0] == marker[0]
+                              and (stack[i][0] == marker or 3 in (len(stack[i][0]), len(marker)))), -1)
+                if depth < 0:
+                    break
+                opener, index = stack[depth]
+                # markers opened inside this span and never closed are literal
+                for inner, inner_index in stack[depth + 1:]:
+                    tokens[inner_index] = ["text", [inner]]
+                del stack[depth + 1:]
+                if len(opener) > len(marker):
+                    # ***x** y*: the opener splits; its outer part stays open
+                    rest = opener[len(marker):]
+                    tokens[index] = ["open", _STYLE_OF[rest]]
+                    tokens.insert(index + 1, ["open", _STYLE_OF[marker]])
+                    stack[depth] = (rest, index)
+                    tokens.append(["close", _STYLE_OF[marker]])
+                    marker = ""
+                else:
+                    # *a **b***: close this opener, the rest of the closer looks further out
+                    del stack[depth]
+                    tokens.append(["close", _STYLE_OF[opener]])
+                    marker = marker[len(opener):]
+                closed = True
+            if not marker:
+                pass
+            elif can_open and not closed:
+                stack.append((marker, len(tokens)))
+                tokens.append(["open", _STYLE_OF[marker]])
+            else:
+                text(marker)
+        else:
+            if 0 <= label_end < end:
+                label_end = line.find("](", end)
+            # only try the link pattern when a label end is within reach
+            link = _RE_LINK_TAIL.match(line, end - 1) if 0 <= label_end - end <= 500 else None
+            if link is None:
+                text(bracket)
+            else:
+                kind = "image" if bracket == "![" else "link"
+                tokens.append([kind, _tokenize(link.group(1)), link.group(2)])
+                pos = link.end()
+
+    for marker, index in stack:
+        tokens[index] = ["text", [marker]]
+    for token in tokens:
+        if token[0] == "text":
+            token[1] = "".join(token[1])
+    return tokens
+
+
+def _render_inline(tokens: List[list], fmt: str, plain_styles: bool = False) -> str:
+    tags = _STYLE_TAGS["text" if plain_styles else fmt]
+    out = []
+    for token in tokens:
+        kind = token[0]
+        if kind == "text":
+            out.append(_escape(token[1], fmt))
+        elif kind == "open":
+            out.append(tags[token[1]][0])
+        elif kind == "close":
+            out.append(tags[token[1]][1])
+        elif kind == "code":
+            code = _escape_code(token[1], fmt)
+            out.append(f"<code>{code}</code>" if fmt == "html" else f"`{code}`" if fmt == "markdownv2" else code)
+        else:
+            label = _render_inline(token[1], fmt, plain_styles).strip()
+            url = token[2]
+            if fmt == "html":
+                out.append(f'<a href="{html.escape(url)}">{label or html.escape(url, quote=False)}</a>')
+            elif fmt == "markdownv2":
+                out.append(f"[{label or _escape(url, fmt)}]({_RE_MDV2_URL.sub(_BACKSLASH_ESCAPE, url)})")
+            else:
+                out.append(f"{label} ({url})" if label else url)
+    return "".join(out)
+
+
+def _inline(text: str, fmt: str, plain_styles: bool = False) -> str:
+    return _render_inline(_tokenize(text), fmt, plain_styles)
+
+
+# ----------------------------------------------------------------- blocks ---
+
+class _Unit:
+    """An indivisible piece of output: one line, a code block or a quote group."""
+
+    __slots__ = ("kind", "lines", "lang", "sep")
+
+    def __init__(self, kind: str, lines: List[str], sep: str, lang: str = ""):
+        self.kind = kind
+        self.lines = lines
+        self.sep = sep
+        self.lang = lang
+
+    def render(self, fmt: str) -> str:
+        if self.kind == "code":
+            return _render_code(self.lines, self.lang, fmt)
+        if self.kind == "quote":
+            body = "\n".join(_inline(line, fmt) for line in self.lines)
+            if fmt == "html":
+                return f"<blockquote>{body}</blockquote>"
+            if fmt == "markdownv2":
+                return "\n".join(">" + _inline(line, fmt) for line in self.lines)
+            return body
+        return _render_line(self.lines[0], fmt)
+
+
+def _render_code(lines: List[str], lang: str, fmt: str) -> str:
+    return _wrap_code(_escape_code("\n".join(lines), fmt), lang, fmt)
+
+
+def _wrap_code(body: str, lang: str, fmt: str) -> str:
+    if fmt == "html":
+        attr = f' class="language-{html.escape(lang)}"' if lang else ""
+        return f"<pre><code{attr}>{body}</code></pre>"
+    if fmt == "markdownv2":
+        return f"```{lang}\n{body}\n```"
+    return body
+
+
+def _render_line(line: str, fmt: str) -> str:
+    if _RE_HR.match(line):
+        return _RULE
+    m = _RE_HEADING.match(line)
+    if m:
+        if fmt == "text":
+            return _inline(m.group(1), fmt)
+        # the heading is bold already; styles inside it are dropped
+        open_tag, close_tag = _STYLE_TAGS[fmt]["b"]
+        return f"{open_tag}{_inline(m.group(1), fmt, plain_styles=True)}{close_tag}"
+    m = _RE_BULLET.match(line)
+    if m:
+        indent = " " * (len(m.group(1).expandtabs(4)) // 2 * 2)
+        bullet = "- " if fmt == "text" else "• "
+        return f"{indent}{bullet}{_inline(m.group(2), fmt)}"
+    m = _RE_ORDERED.match(line)
+    if m:
+        indent = " " * (len(m.group(1).expandtabs(4)) // 2 * 2)
+        number = {"text": "{})", "html": "{}.", "markdownv2": "{}\\."}[fmt].format(m.group(2))
+        return f"{indent}{number} {_inline(m.group(3), fmt)}"
+    stripped = line.strip()
+    if stripped.startswith("|"):
+        cells = [cell.strip() for cell in _RE_TABLE_CELL_SPLIT.split(stripped.strip("|"))]
+        joiner = " " if fmt == "text" else _escape(" | ", fmt)
+        return joiner.join(_inline(cell, fmt) for cell in cells if cell)
+    return _inline(stripped, fmt)
+
+
+def _units(md: str, fmt: str) -> List[_Unit]:
+    """Scan the source once into output units; ``sep`` is the break before each."""
+    units: List[_Unit] = []
+    lines = md.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    blank = False
+    i, n = 0, len(lines)
+    while i < n:
+        line = lines[i]
+        sep = "\n\n" if blank and units else "\n"
+        if not line.strip():
+            blank = True
+            i += 1
+            continue
+        blank = False
+        fence = _RE_FENCE.match(line)
+        if fence:
+            marker = fence.group(1)
+            body = []
+            i += 1
+            # an unclosed fence runs to the end of the reply
+            while i < n and not lines[i].strip().startswith(marker):
+                body.append(lines[i])
+                i += 1
+            i += 1
+            units.append(_Unit("code", body, sep, fence.group(2)))
+            continue
+        if _RE_TABLE_SEP.match(line) and "|" in line:
+            i += 1
+            continue
+        quote = _RE_QUOTE.match(line)
+        if quote and fmt != "text":
+            group = []
+            while i < n and _RE_QUOTE.match(lines[i]) and lines[i].strip():
+                group.append(_RE_QUOTE.match(lines[i]).group(1))
+                i += 1
+            units.append(_Unit("quote", group, sep))
+            continue
+        units.append(_Unit("line", [quote.group(1) if quote else line], sep))
+        i += 1
+    return units
+
+
+def _finish(text: str, fmt: str) -> str:
+    if fmt == "text":
+        # trim trailing spaces per line
+        text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return text.strip()
+
+
+def render_markdown(md: str, fmt: str = "text") -> str:
+    """Render Markdown ``md`` to ``fmt`` (one of FORMATS).
+
+    >>> render_markdown("***x*** and **b** *i*", "html")
+    '<b><i>x</i></b> and <b>b</b> <i>i</i>'
+    >>> render_markdown("***x***", "text")
+    'x'
+    >>> render_markdown("___x___", "markdownv2")
+    '*_x_*'
+    >>> render_markdown("a *** b", "text")
+    'a *** b'
+    >>> render_markdown("***x** y* and *a **b***", "html")
+    '<i><b>x</b> y</i> and <i>a <b>b</b></i>'
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
     if not isinstance(md, str) or not md:
         return "" if md is None else str(md)
+    out = []
+    for unit in _units(md, fmt):
+        if out:
+            out.append(unit.sep)
+        out.append(unit.render(fmt))
+    return _finish("".join(out), fmt)
 
-    text = md
 
-    # Remove fenced code blocks but keep inner content
-    def _unfence(m: re.Match) -> str:
-        block = m.group(0)
-        # strip the ``` fences
-        inner = re.sub(r"^```[a-zA-Z0-9_-]*\n?|```$", "", block, flags=re.MULTILINE)
-        return inner
+def md_to_text(md: str) -> str:
+    return render_markdown(md, "text")
 
-    text = _RE_CODE_FENCE.sub(_unfence, text)
 
-    # Inline code -> content only
-    text = _RE_INLINE_CODE.sub(lambda m: m.group(1), text)
+# --------------------------------------------------------------- chunking ---
 
-    # Images: keep alt and url
-    text = _RE_IMG.sub(lambda m: f"{m.group(1).strip()} ({m.group(2).strip()})".strip(), text)
+def split_plain_text(text: str, limit: int) -> List[str]:
+    """Split text into chunks of at most ``limit`` characters.
 
-    # Links: text (url)
-    text = _RE_LINK.sub(lambda m: f"{m.group(1).strip()} ({m.group(2).strip()})", text)
+    Cuts at the last paragraph break that fits, else the last line break, else
+    the last space, and only cuts mid-word as a last resort.
+    """
+    chunks = []
+    while len(text) > limit:
+        window = text[:limit + 1]
+        cut = -1
+        for sep in ("\n\n", "\n", " "):
+            cut = window.rfind(sep)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+        chunk = text[:cut].rstrip()
+        if chunk:
+            chunks.append(chunk)
+        text = text[cut:].lstrip()
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
 
-    # Headings: remove leading #+
-    text = _RE_H.sub("", text)
 
-    # Blockquotes: remove >
-    text = _RE_BLOCKQUOTE.sub("", text)
+def _split_escaped(text: str, escape, limit: int) -> List[str]:
+    """Split plain text so that every piece stays within ``limit`` once escaped."""
+    pieces = []
+    for piece in split_plain_text(text, limit):
+        escaped = escape(piece)
+        if len(escaped) <= limit or len(piece) <= 1:
+            pieces.append(escaped)
+        else:
+            # escaping grew the piece; retry it with a proportionally smaller limit
+            pieces.extend(_split_escaped(piece, escape, max(1, limit * len(piece) // len(escaped) - 1)))
+    return pieces
 
-    # Bold / Italic / Strikethrough -> plain
-    text = _RE_BOLD.sub(lambda m: (m.group(1) or m.group(2) or ""), text)
-    text = _RE_ITALIC.sub(lambda m: (m.group(1) or m.group(2) or ""), text)
-    text = _RE_STRIKE.sub(lambda m: m.group(1) or "", text)
 
-    # Replace table pipes with spaces (basic)
-    text = re.sub(r"\s*\|\s*", " ", text)
+def _split_unit(unit: _Unit, fmt: str, limit: int) -> List[str]:
+    """Break a unit that is too long for one message into self-contained pieces."""
+    if unit.kind == "code":
+        # pack escaped lines into as few blocks as fit, cutting long lines
+        room = max(1, limit - len(_wrap_code("", unit.lang, fmt)))
+        pieces, current, size = [], [], 0
+        for line in unit.lines:
+            for part in _split_escaped(line, lambda t: _escape_code(t, fmt), room) if line else [""]:
+                if current and size + 1 + len(part) > room:
+                    pieces.append(_wrap_code("\n".join(current), unit.lang, fmt))
+                    current, size = [], 0
+                size += len(part) + (1 if current else 0)
+                current.append(part)
+        if current:
+            pieces.append(_wrap_code("\n".join(current), unit.lang, fmt))
+        return pieces
+    # a single enormous line or quote: keep the words, drop its formatting
+    return _split_escaped(unit.render("text"), lambda t: _escape(t, fmt), limit)
 
-    # Normalize list bullets spacing
-    text = re.sub(r"^\s*[-*+]\s+", "- ", text, flags=re.MULTILINE)
-    # Numbered lists: '1. ' -> '1) '
-    text = re.sub(r"^\s*(\d+)\.\s+", r"\1) ", text, flags=re.MULTILINE)
 
-    # Collapse excessive blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
+def strip_markup(chunk: str, fmt: str) -> str:
+    """Best-effort plain text of a rendered chunk, for resending one Telegram rejected."""
+    if fmt == "html":
+        return html.unescape(_RE_HTML_TAG.sub("", chunk))
+    if fmt == "markdownv2":
+        return _RE_MDV2_MARKUP.sub(lambda m: m.group(1) or "", chunk)
+    return chunk
 
-    # Trim trailing spaces per line
-    text = re.sub(r"[ \t]+\n", "\n", text)
 
-    return text.strip()
+def render_chunks(md: str, fmt: str = "text", limit: int = 4096) -> List[str]:
+    """Render ``md`` to ``fmt`` as messages of at most ``limit`` characters.
+
+    Messages are cut only between units, so every chunk is valid markup on
+    its own. Oversized code blocks are split line by line, each part in its
+    own block; other oversized units lose their formatting and are split on
+    whitespace. Empty or blank input gives no chunks, since Telegram rejects
+    an empty message text.
+
+    >>> render_chunks("")
+    []
+    >>> render_chunks("   ")
+    []
+    >>> render_chunks("**hi**", "html")
+    ['<b>hi</b>']
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
+    if md is None:
+        return []
+    if not isinstance(md, str):
+        md = str(md)
+    if not md.strip():
+        return []
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for unit in _units(md, fmt):
+        rendered = unit.render(fmt)
+        if fmt == "text":
+            rendered = _finish(rendered, fmt)
+        parts = [rendered] if len(rendered) <= limit else _split_unit(unit, fmt, limit)
+        for index, part in enumerate(parts):
+            sep = unit.sep if index == 0 else "\n"
+            if current and size + len(sep) + len(part) <= limit:
+                current.append(sep)
+                current.append(part)
+                size += len(sep) + len(part)
+            else:
+                if current:
+                    chunks.append("".join(current).strip())
+                current, size = [part], len(part)
+    if current:
+        chunks.append("".join(current).strip())
+    return [chunk for chunk in chunks if chunk]
+
@@ -0,0 +1,62 @@
+"""Small in-process metrics: fixed-bucket histograms and labelled families.
+
+Good enough for a /stats endpoint; nothing here is exported to an external
+metrics system.
+"""
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence
+
+# seconds; covers webhook-fast paths up to multi-minute crew runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "avg": (self.sum / self.count) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(b): n for b, n in zip(list(self.buckets) + ["+Inf"], self.counts)},
+        }
+
+
+class HistogramFamily:
+    """Histograms keyed by a single label value, created on first use."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._children: Dict[str, Histogram] = {}
+
+    def labels(self, value: str) -> Histogram:
+        hist = self._children.get(value)
+        if hist is None:
+            hist = self._children[value] = Histogram(self.buckets)
+        return hist
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {label: hist.snapshot() for label, hist in sorted(self._children.items())}
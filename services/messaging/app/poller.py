@@ -0,0 +1,86 @@
+"""Long-polling ingestion: an alternative to the webhook.
+
+With INGESTION_MODE=polling the service removes any webhook at startup and
+calls ``getUpdates`` in a loop, pulling up to POLL_LIMIT updates per call and
+feeding them through ``ingest_batch``. The offset only moves past updates that
+were ingested, so updates rejected by a full job queue are fetched again.
+Nothing needs to reach the service from outside, so it runs on hosts without
+public ingress.
+
+Telegram keeps unconfirmed updates for 24 hours, so after a restart the first
+poll resumes where the last confirmed offset left off; anything ingested but
+not yet confirmed comes back once and is caught by the dedup store.
+"""
+import asyncio
+import random
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.logger import get_logger
+from app import telegram_client
+from app.ingest import ingest_batch
+
+logger = get_logger("messaging.poller")
+
+
+class UpdatePoller:
+	def __init__(self, limit: int, timeout: int, busy_delay: float = 1.0):
+		self.limit = max(1, min(100, limit))
+		self.timeout = max(0, timeout)
+		# pause after the job queue pushed back, before fetching the rest again
+		self.busy_delay = busy_delay
+		self.offset: Optional[int] = None
+		self._task: Optional[asyncio.Task] = None
+		self.counters = {"polls": 0, "updates": 0, "ingested": 0, "errors": 0, "backpressure": 0}
+
+	async def start(self) -> None:
+		if self._task is not None:
+			return
+		# getUpdates is refused while a webhook is set
+		try:
+			await telegram_client.delete_webhook()
+		except telegram_client.TelegramClientError:
+			logger.warning("could not delete webhook before polling")
+		self._task = asyncio.create_task(self._run())
+		logger.info("update poller started", extra={"limit": self.limit, "timeout": self.timeout})
+
+	async def stop(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			await asyncio.gather(self._task, return_exceptions=True)
+			self._task = None
+
+	async def _run(self) -> None:
+		failures = 0
+		while True:
+			try:
+				updates = await telegram_client.get_updates(self.offset, self.limit, self.timeout)
+			except telegram_client.TelegramClientError:
+				self.counters["errors"] += 1
+				failures += 1
+				await asyncio.sleep(min(30.0, 2 ** failures) + random.uniform(0, 1))
+				continue
+			failures = 0
+			self.counters["polls"] += 1
+			if not updates:
+				continue
+			self.counters["updates"] += len(updates)
+			try:
+				handled = await ingest_batch(updates, source="polling")
+			except Exception:
+				# keep polling; the offset stays put so the batch is fetched again
+				logger.exception("failed to ingest polled updates")
+				self.counters["errors"] += 1
+				await asyncio.sleep(self.busy_delay)
+				continue
+			self.counters["ingested"] += handled
+			if handled:
+				self.offset = updates[handled - 1]["update_id"] + 1
+			if handled < len(updates):
+				self.counters["backpressure"] += 1
+				await asyncio.sleep(self.busy_delay)
+
+	def stats(self) -> Dict[str, Any]:
+		return {"offset": self.offset, "limit": self.limit, "timeout": self.timeout, "running": self._task is not None, **self.counters}
+
+
+update_poller = UpdatePoller(settings.POLL_LIMIT, settings.POLL_TIMEOUT)
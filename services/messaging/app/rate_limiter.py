@@ -0,0 +1,79 @@
+("""Token-bucket pacing for outbound Telegram Bot API calls.
+
+Telegram allows roughly 30 messages per second per bot and about one per
+second per chat (with short bursts). ``TelegramRateLimiter`` keeps one global
+bucket and one bucket per chat and makes callers wait for a token from both,
+so bursts are smoothed to the API ceiling instead of being answered with 429.
+When Telegram does answer 429, ``pause`` holds a chat (or everything) back for
+the advertised ``retry_after``.
+""")
+import asyncio
+import time
+from typing import Optional
+import cachetools
+from app.config import settings
+
+
+class TokenBucket:
+	def __init__(self, rate: float, capacity: float):
+		self.rate = rate
+		self.capacity = capacity
+		self.tokens = capacity
+		self.updated = time.monotonic()
+		self.blocked_until = 0.0
+
+	def _refill(self, now: float) -> None:
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def reserve(self) -> float:
+		"""Take a token now (possibly going negative) and return how long to wait for it."""
+		now = time.monotonic()
+		self._refill(now)
+		self.tokens -= 1
+		wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+		return max(wait, self.blocked_until - now)
+
+	def pause(self, seconds: float) -> None:
+		self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class TelegramRateLimiter:
+	def __init__(self, global_rate: float, per_chat_rate: float, per_chat_burst: float):
+		self.global_bucket = TokenBucket(global_rate, global_rate)
+		self.per_chat_rate = per_chat_rate
+		self.per_chat_burst = per_chat_burst
+		# idle chats fall out after ten minutes
+		self._chats = cachetools.TTLCache(maxsize=100000, ttl=600)
+		self.waited_seconds = 0.0
+
+	def _chat_bucket(self, chat_id) -> TokenBucket:
+		bucket = self._chats.get(chat_id)
+		if bucket is None:
+			bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+		# re-set on every use to keep active chats in the cache
+		self._chats[chat_id] = bucket
+		return bucket
+
+	async def acquire(self, chat_id: Optional[int] = None) -> None:
+		"""Wait until a call for ``chat_id`` (or a chat-less call) may be sent."""
+		wait = self.global_bucket.reserve()
+		if chat_id is not None:
+			wait = max(wait, self._chat_bucket(chat_id).reserve())
+		if wait > 0:
+			self.waited_seconds += wait
+			await asyncio.sleep(wait)
+
+	def pause(self, seconds: float, chat_id: Optional[int] = None) -> None:
+		"""Honor a 429 retry_after for one chat, or for all calls when chat_id is None."""
+		if chat_id is None:
+			self.global_bucket.pause(seconds)
+		else:
+			self._chat_bucket(chat_id).pause(seconds)
+
+
+rate_limiter = TelegramRateLimiter(
+	settings.TELEGRAM_GLOBAL_RATE,
+	settings.TELEGRAM_PER_CHAT_RATE,
+	settings.TELEGRAM_PER_CHAT_BURST,
+)
@@ -0,0 +1,173 @@
+("""Fair scheduler for agent calls.
+
+Work for one chat runs strictly one at a time in FIFO order. On top of that,
+at most SCHED_MAX_CONCURRENT calls run overall and SCHED_MAX_PER_USER per
+user, and users take turns round-robin, so one heavy user cannot starve
+the others.
+
+Queue-wait and run-time histograms are kept per tier, where the tier is the
+limit that held the work back when it arrived: "chat" (an earlier message of
+the same chat was still running), "user" (the per-user cap), "global" (the
+overall cap) or "none" (it started straight away).
+""")
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Set
+from app.config import settings
+from app.logger import get_logger
+from app.metrics import HistogramFamily
+
+logger = get_logger("messaging.scheduler")
+
+
+class _Entry:
+	__slots__ = ("chat_id", "user_id", "fn", "future", "enqueued_at", "tier", "task")
+
+	def __init__(self, chat_id, user_id, fn, future, tier):
+		self.chat_id = chat_id
+		self.user_id = user_id
+		self.fn = fn
+		self.future = future
+		self.enqueued_at = time.monotonic()
+		self.tier = tier
+		self.task = None
+
+
+class FairScheduler:
+	def __init__(self, max_concurrent: int, max_per_user: int):
+		self.max_concurrent = max(1, max_concurrent)
+		self.max_per_user = max(1, max_per_user)
+		self._chat_queues: Dict[Any, Deque[_Entry]] = {}
+		self._busy_chats: Set[Any] = set()
+		# users with waiting work, in round-robin order, and their chats with waiting work
+		self._users: Deque[Any] = deque()
+		self._user_chats: Dict[Any, Deque[Any]] = {}
+		self._running = 0
+		self._running_per_user: Dict[Any, int] = defaultdict(int)
+		# in-flight _execute tasks, so stop() can cancel and await them
+		self._tasks: Set[asyncio.Task] = set()
+		self._stopping = False
+		self.queue_wait = HistogramFamily()
+		self.run_time = HistogramFamily()
+
+	def _blocking_tier(self, chat_id, user_id) -> str:
+		if chat_id in self._busy_chats or self._chat_queues.get(chat_id):
+			return "chat"
+		if self._running_per_user[user_id] >= self.max_per_user:
+			return "user"
+		if self._running >= self.max_concurrent:
+			return "global"
+		return "none"
+
+	async def run(self, chat_id, user_id, fn: Callable[[], Awaitable[Any]]) -> Any:
+		"""Wait for this chat's and user's turn, then await ``fn()`` and return its result."""
+		future = asyncio.get_running_loop().create_future()
+		entry = _Entry(chat_id, user_id, fn, future, self._blocking_tier(chat_id, user_id))
+		queue = self._chat_queues.get(chat_id)
+		if queue is None:
+			queue = self._chat_queues[chat_id] = deque()
+			chats = self._user_chats.get(user_id)
+			if chats is None:
+				chats = self._user_chats[user_id] = deque()
+				self._users.append(user_id)
+			chats.append(chat_id)
+		queue.append(entry)
+		self._pump()
+		try:
+			return await future
+		except asyncio.CancelledError:
+			# the caller is gone (e.g. the job queue is stopping): stop its work too
+			if entry.task is not None and not entry.task.done():
+				entry.task.cancel()
+				await asyncio.gather(entry.task, return_exceptions=True)
+			raise
+
+	def _next_for_user(self, user_id):
+		"""Pop the first runnable entry among the user's chats, rotating them fairly."""
+		chats = self._user_chats[user_id]
+		for _ in range(len(chats)):
+			chat_id = chats[0]
+			chats.rotate(-1)
+			if chat_id in self._busy_chats:
+				continue
+			queue = self._chat_queues[chat_id]
+			entry = queue.popleft()
+			if not queue:
+				del self._chat_queues[chat_id]
+				chats.remove(chat_id)
+			if not chats:
+				del self._user_chats[user_id]
+				self._users.remove(user_id)
+			return entry
+		return None
+
+	def _pump(self) -> None:
+		while not self._stopping and self._running < self.max_concurrent and self._users:
+			started = False
+			for _ in range(len(self._users)):
+				user_id = self._users[0]
+				self._users.rotate(-1)
+				if self._running_per_user[user_id] >= self.max_per_user:
+					continue
+				entry = self._next_for_user(user_id)
+				if entry is not None:
+					self._start(entry)
+					started = True
+					break
+			if not started:
+				return
+
+	def _start(self, entry: _Entry) -> None:
+		if entry.future.cancelled():
+			return
+		self._running += 1
+		self._running_per_user[entry.user_id] += 1
+		self._busy_chats.add(entry.chat_id)
+		self.queue_wait.labels(entry.tier).observe(time.monotonic() - entry.enqueued_at)
+		entry.task = asyncio.create_task(self._execute(entry))
+		self._tasks.add(entry.task)
+		entry.task.add_done_callback(self._tasks.discard)
+
+	async def _execute(self, entry: _Entry) -> None:
+		started = time.monotonic()
+		try:
+			result = await entry.fn()
+		except BaseException as exc:
+			if not entry.future.done():
+				entry.future.set_exception(exc)
+			if isinstance(exc, asyncio.CancelledError):
+				raise
+		else:
+			if not entry.future.done():
+				entry.future.set_result(result)
+		finally:
+			self.run_time.labels(entry.tier).observe(time.monotonic() - started)
+			self._running -= 1
+			self._running_per_user[entry.user_id] -= 1
+			if not self._running_per_user[entry.user_id]:
+				del self._running_per_user[entry.user_id]
+			self._busy_chats.discard(entry.chat_id)
+			self._pump()
+
+	async def stop(self) -> None:
+		"""Start nothing new, then cancel in-flight calls and wait for them to unwind."""
+		self._stopping = True
+		tasks = list(self._tasks)
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+
+	def stats(self) -> Dict[str, Any]:
+		return {
+			"running": self._running,
+			"waiting": sum(len(q) for q in self._chat_queues.values()),
+			"waiting_users": len(self._users),
+			"max_concurrent": self.max_concurrent,
+			"max_per_user": self.max_per_user,
+			"queue_wait_seconds": self.queue_wait.snapshot(),
+			"run_seconds": self.run_time.snapshot(),
+		}
+
+
+scheduler = FairScheduler(settings.SCHED_MAX_CONCURRENT, settings.SCHED_MAX_PER_USER)
@@ -1,52 +1,194 @@
 ("""Simple wrapper over Telegram Bot API using httpx AsyncClient.
 
+Outgoing calls are paced by the shared rate limiter and retried on 429/5xx;
+long texts are split into ordered chunks.
 Raises TelegramClientError on network or HTTP errors.
 """)
-from typing import Optional, Dict, Any
-from app import http_client
+from typing import Optional, Dict, Any, List
+from app import http_client, tracing
 from app.config import settings
 from app.logger import get_logger
+from app.markdown_utils import PARSE_MODES, render_chunks, split_plain_text, strip_markup
+from app.rate_limiter import rate_limiter
+import asyncio
+import random
+import weakref
 import httpx
 
 logger = get_logger("messaging.telegram_client")
 
+# Telegram rejects message texts longer than this
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+_chat_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
 
 class TelegramClientError(Exception):
 	pass
 
 
 def _make_url(method: str) -> str:
-	return f"https://api.telegram.org/bot{settings.BOT_TOKEN}/{method}"
+	return f"{settings.TELEGRAM_API_BASE}/bot{settings.BOT_TOKEN}/{method}"
 
 
-async def send_message(chat_id: int, text: str, parse_mode: Optional[str] = None) -> Dict[str, Any]:
+def _retry_after(resp: httpx.Response) -> float:
+	try:
+		return float(resp.json().get("parameters", {}).get("retry_after", 1))
+	except Exception:
+		return 1.0
+
+
+def _backoff(attempt: int) -> float:
+	return min(30.0, 0.5 * (2 ** (attempt - 1))) + random.uniform(0, 0.5)
+
+
+async def _call(method: str, payload: Dict[str, Any], chat_id: Optional[int] = None, ignore_error: Optional[str] = None,
+		pace_chat: bool = True, attempts: Optional[int] = None) -> Dict[str, Any]:
+	"""POST a Bot API method with pacing and retries.
+
+	Waits on the rate limiter (per chat when chat_id is given and pace_chat is
+	set), honors 429 ``retry_after``, and retries 5xx/network errors with
+	jittered backoff up to TELEGRAM_MAX_RETRIES attempts. Other 4xx errors are
+	not retried; a 400 whose description contains ``ignore_error`` counts as
+	success.
+	"""
 	client = http_client.get_httpx_client()
-	url = _make_url("sendMessage")
-	payload = {"chat_id": chat_id, "text": text}
+	url = _make_url(method)
+	attempts = max(1, attempts or settings.TELEGRAM_MAX_RETRIES)
+	for attempt in range(1, attempts + 1):
+		await rate_limiter.acquire(chat_id if pace_chat else None)
+		try:
+			resp = await client.post(url, json=payload)
+		except httpx.HTTPError as exc:
+			if attempt == attempts:
+				logger.exception("telegram http error", extra={"method": method, "error": str(exc)})
+				raise TelegramClientError(str(exc))
+			await asyncio.sleep(_backoff(attempt))
+			continue
+
+		if resp.status_code == 429:
+			retry_after = _retry_after(resp)
+			# the limiter holds every later call for this chat back as well
+			rate_limiter.pause(retry_after, chat_id)
+			logger.warning("telegram rate limited", extra={"method": method, "chat_id": chat_id, "retry_after": retry_after})
+			if attempt == attempts:
+				raise TelegramClientError("Telegram error 429")
+			await asyncio.sleep(random.uniform(0, 0.5))
+			continue
+		if resp.status_code >= 500:
+			logger.error(f"telegram {method} server error", extra={"status": resp.status_code, "text": resp.text})
+			if attempt == attempts:
+				raise TelegramClientError(f"Telegram error {resp.status_code}")
+			await asyncio.sleep(_backoff(attempt))
+			continue
+		if resp.status_code == 400 and ignore_error and ignore_error in resp.text:
+			return resp.json()
+		try:
+			resp.raise_for_status()
+		except httpx.HTTPError as exc:
+			logger.exception("telegram http error", extra={"method": method, "error": str(exc), "text": resp.text})
+			raise TelegramClientError(str(exc))
+		return resp.json()
+	raise TelegramClientError(f"Telegram {method} failed")
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+	"""Split text into chunks of at most ``limit`` characters.
+
+	Cuts at the last paragraph break that fits, else the last line break, else
+	the last space, and only cuts mid-word as a last resort.
+	"""
+	return split_plain_text(text, limit)
+
+
+def _chat_lock(chat_id: int) -> asyncio.Lock:
+	lock = _chat_locks.get(chat_id)
+	if lock is None:
+		lock = _chat_locks[chat_id] = asyncio.Lock()
+	return lock
+
+
+async def send_message(chat_id: int, text: str, parse_mode: Optional[str] = None) -> Dict[str, Any]:
+	"""Send ``text``, split into ordered chunks if it exceeds Telegram's limit.
+
+	Returns the response for the first chunk.
+	"""
+	first = None
+	chunks = split_message(text)
+	# keep chunks of concurrent sends to the same chat from interleaving;
+	# the span includes lock and rate-limiter waits
+	with tracing.span("telegram_send", chunks=len(chunks)):
+		async with _chat_lock(chat_id):
+			for chunk in chunks:
+				payload = {"chat_id": chat_id, "text": chunk}
+				if parse_mode:
+					payload["parse_mode"] = parse_mode
+				result = await _call("sendMessage", payload, chat_id=chat_id)
+				first = first or result
+	return first
+
+
+async def edit_message_text(chat_id: int, message_id: int, text: str, parse_mode: Optional[str] = None) -> Dict[str, Any]:
+	"""Replace a message's text. Text beyond the limit is sent as follow-up messages."""
+	chunks = split_message(text)
+	payload = {"chat_id": chat_id, "message_id": message_id, "text": chunks[0]}
 	if parse_mode:
 		payload["parse_mode"] = parse_mode
-	try:
-		resp = await client.post(url, json=payload)
-		if resp.status_code >= 500 or resp.status_code == 429:
-			logger.error("telegram send_message server error", {"status": resp.status_code, "text": resp.text})
-			raise TelegramClientError(f"Telegram error {resp.status_code}")
-		resp.raise_for_status()
-		return resp.json()
-	except httpx.HTTPError as exc:
-		logger.exception("telegram http error", {"error": str(exc)})
-		raise TelegramClientError(str(exc))
+	# editing with identical text is harmless
+	with tracing.span("telegram_edit"):
+		result = await _call("editMessageText", payload, chat_id=chat_id, ignore_error="message is not modified")
+	if len(chunks) > 1:
+		await send_message(chat_id, "\n\n".join(chunks[1:]), parse_mode=parse_mode)
+	return result
+
+
+async def delete_message(chat_id: int, message_id: int) -> Dict[str, Any]:
+	return await _call("deleteMessage", {"chat_id": chat_id, "message_id": message_id}, chat_id=chat_id, ignore_error="message to delete not found")
+
+
+async def _post_chunk(chat_id: int, chunk: str, fmt: str, message_id: Optional[int] = None) -> Dict[str, Any]:
+	method = "editMessageText" if message_id else "sendMessage"
+	ignore_error = "message is not modified" if message_id else None
+	payload = {"chat_id": chat_id, "text": chunk}
+	if message_id:
+		payload["message_id"] = message_id
+	parse_mode = PARSE_MODES.get(fmt)
+	if parse_mode:
+		try:
+			return await _call(method, {**payload, "parse_mode": parse_mode}, chat_id=chat_id, ignore_error=ignore_error)
+		except TelegramClientError as exc:
+			# a reply is better delivered unformatted than not at all
+			logger.warning("formatted message rejected, resending as plain text", extra={"method": method, "chat_id": chat_id, "error": str(exc)})
+			payload["text"] = strip_markup(chunk, fmt)
+	return await _call(method, payload, chat_id=chat_id, ignore_error=ignore_error)
+
+
+async def send_reply(chat_id: int, markdown: str, message_id: Optional[int] = None) -> Dict[str, Any]:
+	"""Render an agent's Markdown reply in REPLY_FORMAT and send it.
+
+	Chunks are cut only at block boundaries, so each one is valid markup on its
+	own. With ``message_id`` the first chunk replaces that message's text.
+	Returns the response for the first chunk.
+	"""
+	fmt = settings.REPLY_FORMAT if settings.REPLY_FORMAT in PARSE_MODES else "text"
+	chunks = render_chunks(markdown, fmt, TELEGRAM_MESSAGE_LIMIT)
+	if not chunks:
+		# Telegram answers 400 to an empty text, so there is nothing to send
+		logger.warning("empty reply not sent", extra={"chat_id": chat_id})
+		return None
+	first = None
+	with tracing.span("telegram_send", chunks=len(chunks), format=fmt):
+		async with _chat_lock(chat_id):
+			for index, chunk in enumerate(chunks):
+				result = await _post_chunk(chat_id, chunk, fmt, message_id=message_id if index == 0 else None)
+				first = first or result
+	return first
 
 
 async def send_typing(chat_id: int) -> Dict[str, Any]:
-	client = http_client.get_httpx_client()
-	url = _make_url("sendChatAction")
-	try:
-		resp = await client.post(url, json={"chat_id": chat_id, "action": "typing"})
-		resp.raise_for_status()
-		return resp.json()
-	except httpx.HTTPError as exc:
-		logger.exception("telegram typing error", {"error": str(exc)})
-		raise TelegramClientError(str(exc))
+	# chat actions don't count against the per-chat message limit, and the
+	# heartbeat re-sends them anyway, so a single attempt is enough
+	return await _call("sendChatAction", {"chat_id": chat_id, "action": "typing"}, chat_id=chat_id, pace_chat=False, attempts=1)
 
 
 async def set_webhook(url: str, secret_token: Optional[str] = None) -> Dict[str, Any]:
@@ -60,18 +202,36 @@ async def set_webhook(url: str, secret_token: Optional[str] = None) -> Dict[str,
 		resp.raise_for_status()
 		return resp.json()
 	except httpx.HTTPError as exc:
-		logger.exception("set_webhook error", {"error": str(exc)})
+		logger.exception("set_webhook error", extra={"error": str(exc)})
 		raise TelegramClientError(str(exc))
 
 
-async def delete_webhook() -> Dict[str, Any]:
+async def delete_webhook(drop_pending_updates: bool = False) -> Dict[str, Any]:
 	client = http_client.get_httpx_client()
 	url = _make_url("deleteWebhook")
 	try:
-		resp = await client.post(url)
+		resp = await client.post(url, json={"drop_pending_updates": drop_pending_updates})
 		resp.raise_for_status()
 		return resp.json()
 	except httpx.HTTPError as exc:
-		logger.exception("delete_webhook error", {"error": str(exc)})
+		logger.exception("delete_webhook error", extra={"error": str(exc)})
 		raise TelegramClientError(str(exc))
 
+
+async def get_updates(offset: Optional[int] = None, limit: int = 100, timeout: int = 30) -> List[Dict[str, Any]]:
+	"""Long-poll for updates; passing ``offset`` confirms every update before it.
+
+	Not paced by the rate limiter: getUpdates doesn't count against send limits.
+	"""
+	client = http_client.get_httpx_client()
+	payload: Dict[str, Any] = {"limit": max(1, min(100, limit)), "timeout": timeout}
+	if offset is not None:
+		payload["offset"] = offset
+	try:
+		# the server may hold the request for ``timeout`` seconds
+		resp = await client.post(_make_url("getUpdates"), json=payload, timeout=timeout + 10)
+		resp.raise_for_status()
+		return resp.json().get("result") or []
+	except (httpx.HTTPError, ValueError) as exc:
+		logger.error("get_updates error", extra={"error": str(exc)})
+		raise TelegramClientError(str(exc))
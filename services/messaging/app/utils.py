@@ -1,18 +1,22 @@
 ("""Utility helpers for parsing Telegram updates and small helpers used across the app.""")
 from typing import Dict, Any, Optional
 from uuid import uuid4
-import threading
+import contextvars
 
-# simple thread-local storage for correlation id
-_tls = threading.local()
+# correlation id of the current request/job; contextvars keep concurrent
+# asyncio tasks on one thread from overwriting each other's ids
+_correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+
+# header used to carry the id between services
+CORRELATION_HEADER = "X-Correlation-Id"
 
 
 def set_correlation_id(cid: Optional[str]) -> None:
-	_tls.correlation_id = cid
+	_correlation_id.set(cid)
 
 
 def get_correlation_id() -> Optional[str]:
-	return getattr(_tls, "correlation_id", None)
+	return _correlation_id.get()
 
 
 def new_correlation_id() -> str: